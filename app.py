@@ -1,14 +1,21 @@
 # app.py (lean)
 from __future__ import annotations
 import os
+import functools
+import tempfile
 from pathlib import Path
 from datetime import datetime
 from io import BytesIO
+import re
+import shutil
 import zipfile
+from urllib.parse import quote
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
 
 from flask import (
     Flask, render_template, request, redirect,
-    url_for, flash, send_file
+    url_for, flash, send_file, jsonify, Response, stream_with_context, g
 )
 
 # --- 프로젝트 루트 import 경로 ---
@@ -18,21 +25,23 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # --- 서비스 로직 ---
 from services.acen import run_acen_pipeline
 from services.aicc import (
-    combine_bghm_from_paths,
-    enrich_bghm_rows,
-    group_sum_by_name_title_H,
-    map_grouped_names,
+    FilePartial,
+    aggregate_bghm_file,
+    aggregate_bghm_stream,
+    merge_partials,
     write_to_excel,
 )
-from services.sum import (
-    find_latest_file_for_month,
-    extract_D_K_rows,
-    extract_company_aicc,
-    extract_company_acen,
-    merge_by_company,
-    apply_sum_name_mapping,
-    fill_sum_template,
-)
+from services.sum import build_sum_report
+from services.batch import batch_pool_size, plan_batch, run_batch
+from services.storage import COPY_CHUNK, SPOOL_MAX, ObjectInfo, StoredFile, get_storage
+from services.output_index import OUTPUT_KINDS, list_reports, output_kind, report_months
+from services.writebehind import WriteBehindStorage
+from services.preflight import PreflightError, preflight_acen, preflight_aicc, sniff_workbook
+from services.preview import preview_acen, preview_aicc
+from services.uploads import UploadError, UploadStore
+from services.progress import ProgressStore, valid_job_id
+from services.tracing import begin_trace, current_span, end_trace, set_attrs, span
+from services.admission import AdmissionController, AdmissionRejected
 
 # -----------------------------
 # Flask 기본 설정
@@ -43,9 +52,40 @@ app.config["MAX_CONTENT_LENGTH"] = 50 * 1024 * 1024  # 50MB 업로드 제한(필
 
 # 디렉토리 상수
 BASE_DIR = Path(__file__).parent
-TEMPLATES_DIR = BASE_DIR / "templates"
+# xlsx 템플릿 위치 (부하 테스트 등에서 KT_TEMPLATES_DIR로 교체 가능)
+TEMPLATES_DIR = Path(os.environ.get("KT_TEMPLATES_DIR") or BASE_DIR / "templates")
 OUTPUT_DIR = BASE_DIR / "output"
 
+# 산출물 저장소: 기본은 OUTPUT_DIR(로컬). 여러 노드가 공유하려면 s3://bucket/prefix
+# (S3 호환 서버 주소는 KT_S3_ENDPOINT_URL, 공유 잠금 디렉토리는 KT_S3_LOCK_DIR, 인증은 boto3 표준 AWS_* 환경변수)
+OUTPUT_TARGET = os.environ.get("KT_OUTPUT_STORAGE") or str(OUTPUT_DIR)
+
+# 분할 업로드 임시 저장소 (워커 간 공유되는 로컬 디렉토리)
+UPLOAD_DIR = Path(os.environ.get("KT_UPLOAD_DIR") or BASE_DIR / "uploads")
+UPLOADS = UploadStore(UPLOAD_DIR)
+
+# 산출물은 메모리에서 바로 응답하고 저장소 기록은 백그라운드로 (write-behind)
+# 저장 실패분은 저널(로컬 디렉토리)에 남겨 재시도. KT_WRITE_BEHIND=0 이면 응답 전에 저장
+OUTPUT_STORAGE = WriteBehindStorage(
+    get_storage(OUTPUT_TARGET),
+    Path(os.environ.get("KT_WRITE_BEHIND_JOURNAL") or UPLOAD_DIR / ".writebehind"),
+    synchronous=os.environ.get("KT_WRITE_BEHIND", "1") == "0",
+)
+OUTPUT_STORAGE.recover()
+
+# 진행 상황 기록 (SSE로 브라우저에 전달, 워커 간 공유되는 로컬 디렉토리)
+PROGRESS = ProgressStore(Path(os.environ.get("KT_PROGRESS_DIR") or UPLOAD_DIR / ".progress"))
+
+# 무거운 실행 요청 입장 제어 (워커/호스트 단위 동시 실행 수·예상 메모리 예산, services/admission.py)
+# 상태 파일은 같은 호스트의 워커끼리만 공유하면 되므로 기본은 로컬 임시 디렉토리. KT_ADMISSION=0 이면 끔
+ADMISSION = (
+    AdmissionController.from_env(Path(os.environ.get("KT_ADMIT_DIR") or Path(tempfile.gettempdir()) / "kt-admission"))
+    if os.environ.get("KT_ADMISSION", "1") != "0" else None
+)
+
+# 업로드가 끝난 파일은 나머지 파일을 기다리지 않고 바로 집계 시작
+_upload_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="upload-agg")
+
 # 템플릿 경로
 AICC_TEMPLATE = TEMPLATES_DIR / "AICC 매출결의서.xlsx"
 ACEN_TEMPLATE = TEMPLATES_DIR / "Acen 매출결의서.xlsx"
@@ -56,6 +96,146 @@ ALLOWED_EXTS = {".xlsx", ".xlsm"}
 def _is_allowed(filename: str) -> bool:
     return Path(filename).suffix.lower() in ALLOWED_EXTS
 
+def _fail(progress, *messages: str):
+    """flash + 홈으로 redirect. 진행 스트림에도 오류로 종료를 알림."""
+    for msg in messages:
+        flash(msg, "error")
+    progress.finish(error=" / ".join(messages))
+    current_span().error(" / ".join(messages))
+    return redirect(url_for("index"))
+
+XLSX_MIMETYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+def _send_stored(stored: StoredFile, mimetype: str = XLSX_MIMETYPE):
+    # 로컬 파일이면 경로 그대로, 아니면 저장소 스트림(저장 대기 중이면 메모리 사본)을 그대로 흘려보냄
+    local = stored.local_path()
+    return send_file(
+        local if local is not None else stored.open(),
+        as_attachment=True,
+        download_name=stored.name,
+        mimetype=mimetype,
+    )
+
+def _zip_stored(items, keep_dirs: bool = False) -> SpooledTemporaryFile:
+    # 산출물을 저장소 스트림에서 바로 압축 (큰 ZIP은 임시파일로 스풀)
+    # keep_dirs=True면 ZIP 안에서도 YYYY/MM/파일명 구조 유지 (여러 정산월 일괄 처리용)
+    buf = SpooledTemporaryFile(max_size=SPOOL_MAX)
+    with span("zip", files=len(items)) as sp:
+        with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+            for stored in items:
+                arcname = stored.key if keep_dirs else stored.name
+                with stored.open() as src, zf.open(arcname, "w") as dst:
+                    shutil.copyfileobj(src, dst, COPY_CHUNK)
+        sp.set(zip__size=buf.tell())
+    buf.seek(0)
+    return buf
+
+# -----------------------------
+# 입장 제어 (무거운 실행 요청)
+# -----------------------------
+# 입장 판단은 본문(multipart)을 읽기 전에 해야 함 (request.form/files를 건드리면 Werkzeug가 업로드 전체를 받아 스풀).
+# 그래서 비용/진행 ID는 Content-Length + 쿼리스트링/헤더로만 받음 (화면이 함께 보냄):
+#   upload_ids: ?upload_ids=… 또는 X-Upload-Ids (쉼표 구분)   파일 수: X-Upload-Files   진행 ID: ?job_id=… 또는 X-Job-Id
+def _hint_list(name: str, header: str) -> list:
+    values = [v for v in request.args.getlist(name) if v]
+    return values or [v.strip() for v in request.headers.get(header, "").split(",") if v.strip()]
+
+def _request_upload_size():
+    """(업로드 총 바이트, 파일 수 또는 None(모름)). 분할 업로드(upload_ids)는 세션 메타의 크기로."""
+    upload_ids = _hint_list("upload_ids", "X-Upload-Ids")
+    if upload_ids:
+        total = 0
+        for uid in upload_ids:
+            try:
+                total += UPLOADS.status(uid)["size"]
+            except UploadError:
+                pass                         # 잘못된 ID는 본 처리에서 오류로 응답
+        return total, len(upload_ids)
+    files = request.headers.get("X-Upload-Files", "").strip()
+    return request.content_length or 0, int(files) if files.isdigit() else None
+
+def _trace_job_id() -> None:
+    """트레이스가 켜져 있을 때만 (입장 후) 본문에서 job_id를 읽어 루트 span에 기록"""
+    root = g.get("trace_root")
+    if root is not None and root.sampled:
+        root.set(job_id=request.form.get("job_id"))
+
+def admitted(view=None, *, processes=None):
+    """
+    예산 안에서만 실행. 모자라면 대기열에서 기다리고(진행 스트림에 순번 표시),
+    대기열이 가득 찼거나 KT_ADMIT_MAX_WAIT 안에 못 들어가면 바로 503 + Retry-After.
+    processes: 파일 수(모르면 None) → 요청이 추가로 띄우는 프로세스 수 (일괄 처리 풀). 그만큼 비용에 더함.
+    """
+    if view is None:
+        return functools.partial(admitted, processes=processes)
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if ADMISSION is None:
+            _trace_job_id()
+            return view(*args, **kwargs)
+        total, files = _request_upload_size()
+        extra = processes(files) if processes else 0
+        cost = ADMISSION.estimate(total, files or 1, extra)
+        job_ids = _hint_list("job_id", "X-Job-Id")
+        progress = PROGRESS.job(job_ids[0] if job_ids else None)
+
+        def on_wait(ahead: int) -> None:
+            progress.stage("queue", f"처리 대기 중 (앞에 {ahead}건)", queue_ahead=ahead)
+
+        try:
+            with span("admission.wait", cost_mb=round(cost / 1048576, 1), upload__size=total, files=files,
+                      processes=extra) as sp:
+                ticket = ADMISSION.admit(cost, on_wait=on_wait)
+                sp.set(waited_ms=round(ticket.waited * 1000, 1))
+        except AdmissionRejected as e:
+            progress.finish(error=f"{e.reason} {e.retry_after}초 후 다시 시도해주세요.")
+            resp = jsonify(errors=[e.reason], retry_after=e.retry_after)
+            resp.status_code = 503
+            resp.headers["Retry-After"] = str(e.retry_after)
+            return resp
+        with ticket:
+            _trace_job_id()
+            return view(*args, **kwargs)
+    return wrapper
+
+# -----------------------------
+# 요청 트레이스 (KT_TRACE_EXPORT 설정 시, services/tracing.py)
+# -----------------------------
+UNTRACED_ENDPOINTS = {"static", "progress_stream"}   # SSE는 오래 열려 있어 제외
+
+def _b3_sampled():
+    v = request.headers.get("X-B3-Sampled")
+    return None if v is None else v in ("1", "true", "d")
+
+@app.before_request
+def _trace_begin():
+    if request.endpoint in UNTRACED_ENDPOINTS:
+        return
+    rule = request.url_rule.rule if request.url_rule else request.path
+    g.trace_root, g.trace_token = begin_trace(
+        f"{request.method} {rule}",
+        trace_id=request.headers.get("X-B3-TraceId"),
+        parent_id=request.headers.get("X-B3-SpanId"),
+        sampled=_b3_sampled(),
+        http__method=request.method,
+        http__path=request.path,
+        http__request_size=request.content_length,
+    )
+
+@app.after_request
+def _trace_status(resp):
+    root = g.get("trace_root")
+    if root is not None and root.sampled:
+        root.set(http__status_code=resp.status_code)
+        resp.headers["X-Trace-Id"] = root.trace_id
+    return resp
+
+@app.teardown_request
+def _trace_end(exc):
+    if "trace_root" in g:
+        end_trace(g.pop("trace_root"), g.pop("trace_token"), exc)
+
 # -----------------------------
 # Routes
 # -----------------------------
@@ -65,11 +245,12 @@ def index():
 
 # ACEN: 파일 업로드 → 바로 XLSX 응답
 @app.route("/run/acen", methods=["POST"])
+@admitted
 def run_acen():
+    progress = PROGRESS.job(request.form.get("job_id"))
     f = request.files.get("acen_file")
     if not f or f.filename == "" or not _is_allowed(f.filename):
-        flash("유효한 ACEN 파일을 선택해주세요.", "error")
-        return redirect(url_for("index"))
+        return _fail(progress, "유효한 ACEN 파일을 선택해주세요.")
     
     # ★ report_day 입력값 읽기
     rd_str = request.form.get("report_day", "").strip()
@@ -78,113 +259,417 @@ def run_acen():
         report_day = int(rd_str)
         
     data = f.read()
+
+    # 본 처리 전 형식/정산월 사전 검사 (시트 목록 + 앞쪽 몇 행만 읽음)
+    progress.stage("preflight", "형식/정산월 검사")
+    try:
+        with span("preflight", file__size=len(data)) as sp:
+            sniff = preflight_acen(data, f.filename)
+            sp.set(settlement_month=f"{sniff.settlement_month:%Y-%m}" if sniff.settlement_month else None)
+    except PreflightError as e:
+        return _fail(progress, *e.problems)
+
     try:
-        out_path = run_acen_pipeline(
+        out = run_acen_pipeline(
             file_like=BytesIO(data),
             template_path=ACEN_TEMPLATE,
-            base_dir=OUTPUT_DIR,
+            base_dir=OUTPUT_STORAGE,
             write_formulas=False,
             date_fmt="dots",
             report_day=report_day,
+            progress=progress,
         )
-        return send_file(
-            Path(out_path),
-            as_attachment=True,
-            download_name=Path(out_path).name,
-            mimetype="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        )
+        progress.finish()
+        return _send_stored(out)
     except Exception as e:
         app.logger.exception(e)
-        flash(f"처리 중 오류 발생: {e}", "error")
-        return redirect(url_for("index"))
+        return _fail(progress, f"처리 중 오류 발생: {e}")
 
 # AICC: 파일 업로드 → AICC XLSX + 업무실적 XLSX를 ZIP으로 묶어 바로 응답
 @app.route("/run/aicc", methods=["POST"])
+@admitted
 def run_aicc():
-    files = request.files.getlist("aicc_files")
-    if not files:
-        flash("AICC 파일을 선택해주세요.", "error")
-        return redirect(url_for("index"))
+    progress = PROGRESS.job(request.form.get("job_id"))
+    # 분할 업로드로 이미 올라온 파일(upload_ids) 또는 일반 multipart 파일(aicc_files)
+    upload_ids = [u for u in request.form.getlist("upload_ids") if u] or _hint_list("upload_ids", "X-Upload-Ids")
+    uploads = []
+    if upload_ids:
+        try:
+            uploads = [UPLOADS.completed(uid) for uid in upload_ids]
+        except UploadError as e:
+            return _fail(progress, str(e))
+    else:
+        files = request.files.getlist("aicc_files")
+        if not files:
+            return _fail(progress, "AICC 파일을 선택해주세요.")
+
+        # 내용을 bytes로 읽지 않고 Werkzeug 스풀 스트림 그대로 (파일별 집계가 끝나면 닫음)
+        for f in files:
+            if f and f.filename and _is_allowed(f.filename):
+                uploads.append((f.filename, f.stream))
+            else:
+                return _fail(progress, f"허용되지 않는 파일 형식: {getattr(f, 'filename', '')}")
+
+    # 본 처리 전 형식/정산월 사전 검사 (ACEN 파일 혼입, B/G/H/M 누락, A4 정산월 불일치)
+    progress.stage("preflight", "형식/정산월 검사", files_total=len(uploads))
+    try:
+        with span("preflight", files=len(uploads)):
+            preflight_aicc(uploads)
+    except PreflightError as e:
+        return _fail(progress, *e.problems)
 
-    streams = []
-    for f in files:
-        if f and f.filename and _is_allowed(f.filename):
-            streams.append(f.stream)
-        else:
-            flash(f"허용되지 않는 파일 형식: {getattr(f, 'filename', '')}", "error")
-            return redirect(url_for("index"))
-        
     rd_str = request.form.get("report_day", "").strip()
     report_day = None
     if rd_str.isdigit():
         report_day = int(rd_str)
 
     try:
-        # 1) AICC 매출결의서 생성
-        rows, settlement_month = combine_bghm_from_paths(streams, start_row=7)
-        enriched = enrich_bghm_rows(rows)
-        grouped  = group_sum_by_name_title_H(enriched, keep_order=True)
-        mapped   = map_grouped_names(grouped)
-        aicc_out = write_to_excel(
-            mapped,
-            AICC_TEMPLATE,
-            base_dir=OUTPUT_DIR,
-            settlement_month=settlement_month,
-            report_day=report_day,
-        )
+        # 1) AICC 매출결의서 생성 (읽기 → 분류 → 합산을 행 단위 스트리밍으로)
+        if upload_ids:
+            # 업로드 완료 시점에 미리 집계해 둔 결과가 있으면 재사용
+            progress.stage("parse", "AICC 파일 읽기·분류", files_total=len(uploads), files_parsed=0, rows=0)
+            agg = merge_partials([
+                _upload_partial(uid, path, progress) for uid, (_, path) in zip(upload_ids, uploads)
+            ])
+        else:
+            agg = aggregate_bghm_stream(
+                [stream for _, stream in uploads], start_row=7, progress=progress, close_sources=True,
+            )
+        mapped, settlement_month = agg.mapped, agg.settlement_month
+        set_attrs(settlement_month=f"{settlement_month:%Y-%m}" if settlement_month else None, groups=len(mapped))
 
         # === 전달(=정산월) 기준으로 파일 선정 ===
         month_basis = settlement_month or datetime.now()
 
-        # 2) 정산월 기준 AICC/ACEN 파일 집계 → 업무실적 업데이트
-        #    AICC는 방금 만든 aicc_out을 그대로 사용 (같은 정산월 폴더에 저장됨)
-        latest_aicc = Path(aicc_out)
-
-        #    ACEN은 정산월(YYYY/MM) 폴더에서 prefix로 검색
-        latest_acen = find_latest_file_for_month(
-            OUTPUT_DIR, month_basis, prefix="매출결의서_KT ACen"
-        )
+        # 같은 정산월 작업끼리만 직렬화 (AICC 저장 → ACEN/전달 업무실적 읽기 → 업무실적 저장)
+        progress.stage("lock", f"{month_basis:%Y.%m} 정산월 작업 대기")
+        with OUTPUT_STORAGE.lock(month_basis):
+            progress.stage("write", "AICC 매출결의서 / 업무실적 작성", groups=len(mapped), workbooks_saved=0)
+            aicc_out = write_to_excel(
+                mapped,
+                AICC_TEMPLATE,
+                base_dir=OUTPUT_STORAGE,
+                settlement_month=settlement_month,
+                report_day=report_day,
+                progress=progress,
+            )
 
-        merged_input = []
-        if latest_aicc and latest_aicc.exists():
-            for d, k in extract_D_K_rows(latest_aicc, start_row=11, end_row=25):
-                name = extract_company_aicc(d)
-                if name:
-                    merged_input.append((name, k))
-
-        if latest_acen and latest_acen.exists():
-            for d, k in extract_D_K_rows(latest_acen, start_row=11, end_row=25):
-                name = extract_company_acen(d)
-                if name:
-                    merged_input.append((name, k))
-
-        merged     = merge_by_company(merged_input)
-        mapped_sum = apply_sum_name_mapping(merged)
-        sum_out = fill_sum_template(
-            mapped_sum,
-            SUM_TEMPLATE,
-            out_base_dir=OUTPUT_DIR,
-            settlement_month=settlement_month,  # ★ 전달
-            report_day=report_day,              # ★ 전달
-        )
+            # 2) 정산월 기준 AICC/ACEN 파일 집계 → 업무실적 업데이트
+            #    AICC는 방금 만든 aicc_out을 그대로 사용 (같은 정산월 폴더에 저장됨)
+            sum_out = build_sum_report(
+                OUTPUT_STORAGE,
+                month_basis,
+                SUM_TEMPLATE,
+                aicc_file=aicc_out,
+                settlement_month=settlement_month,  # ★ 전달
+                report_day=report_day,              # ★ 전달
+                progress=progress,
+            )
 
         # 3) ZIP으로 묶어 즉시 다운로드 (파일명도 정산월 기준으로)
         zip_name = f"KT업무실적_{month_basis:%Y.%m}.zip"
-        buf = BytesIO()
-        with zipfile.ZipFile(buf, "w", compression=zipfile.ZIP_DEFLATED) as zf:
-            zf.write(Path(aicc_out), arcname=Path(aicc_out).name)
-            if latest_acen and latest_acen.exists():
-                zf.write(Path(sum_out),  arcname=Path(sum_out).name)
-            else:
-                zf.write(Path(sum_out),  arcname=Path(sum_out).name)  # ACEN 없어도 sum_out은 포함
-        buf.seek(0)
+        progress.stage("zip", "ZIP 묶는 중")
+        buf = _zip_stored([aicc_out, sum_out])  # ACEN 없어도 sum_out은 포함
+        progress.finish()
 
         return send_file(buf, as_attachment=True, download_name=zip_name, mimetype="application/zip")
 
     except Exception as e:
         app.logger.exception(e)
-        flash(f"처리 중 오류 발생: {e}", "error")
-        return redirect(url_for("index"))
+        return _fail(progress, f"처리 중 오류 발생: {e}")
+
+# 일괄: 여러 정산월 ACEN/AICC 파일 → 월별 매출결의서(병렬) + 업무실적(월 순서) → ZIP 하나
+@app.route("/run/batch", methods=["POST"])
+@admitted(processes=batch_pool_size)
+def run_batch_route():
+    progress = PROGRESS.job(request.form.get("job_id"))
+    files = request.files.getlist("batch_files")
+    if not files:
+        return _fail(progress, "처리할 ACEN/AICC 파일을 선택해주세요.")
+
+    for f in files:
+        if not (f and f.filename and _is_allowed(f.filename)):
+            return _fail(progress, f"허용되지 않는 파일 형식: {getattr(f, 'filename', '')}")
+
+    rd_str = request.form.get("report_day", "").strip()
+    report_day = int(rd_str) if rd_str.isdigit() else None
+
+    # 업로드는 요청 동안만 쓰는 임시 디렉토리에 파일로 두고 경로만 넘김
+    # (프로세스 풀에 bytes를 pickle하지 않고, 각 프로세스가 자기 정산월 파일만 읽음)
+    with tempfile.TemporaryDirectory(prefix="kt-batch-") as tmp:
+        uploads = []
+        for i, f in enumerate(files):
+            path = Path(tmp) / f"{i}.xlsx"
+            f.save(path)
+            f.close()
+            uploads.append((f.filename, str(path)))
+
+        # 파일별 A2/A4 정산월로 묶기 (형식 불명 / 같은 월 ACEN 중복이면 중단)
+        progress.stage("preflight", "형식/정산월 검사", files_total=len(uploads))
+        try:
+            jobs = plan_batch(uploads)
+        except PreflightError as e:
+            return _fail(progress, *e.problems)
+
+        try:
+            outputs = run_batch(
+                jobs,
+                OUTPUT_TARGET,
+                acen_template=ACEN_TEMPLATE,
+                aicc_template=AICC_TEMPLATE,
+                sum_template=SUM_TEMPLATE,
+                report_day=report_day,
+                progress=progress,
+            )
+            progress.stage("zip", "ZIP 묶는 중")
+            first, last = jobs[0].month, jobs[-1].month
+            zip_name = f"KT업무실적_{first:%Y.%m}-{last:%Y.%m}.zip" if first != last else f"KT업무실적_{first:%Y.%m}.zip"
+            buf = _zip_stored(outputs, keep_dirs=True)
+            progress.finish()
+            return send_file(buf, as_attachment=True, download_name=zip_name, mimetype="application/zip")
+        except Exception as e:
+            app.logger.exception(e)
+            return _fail(progress, f"처리 중 오류 발생: {e}")
+
+# -----------------------------
+# 분할 업로드 (재개 가능)
+#   POST /uploads            {"filename", "size", "sha256"?} → 세션 생성
+#   PUT  /uploads/<id>       Content-Range: bytes s-e/total (+ X-Chunk-SHA256) → 조각 기록
+#   GET/HEAD /uploads/<id>   받은 구간 / 재개 지점(Range 헤더)
+# -----------------------------
+def _upload_response(status: dict, code: int = 200):
+    resp = jsonify(status)
+    resp.status_code = code
+    if status["offset"]:
+        resp.headers["Range"] = f"bytes=0-{status['offset'] - 1}"
+    resp.headers["Upload-Complete"] = "?1" if status["complete"] else "?0"
+    return resp
+
+def _aggregate_completed_upload(upload_id: str) -> None:
+    try:
+        filename, path = UPLOADS.completed(upload_id)
+        if sniff_workbook(path, filename).kind == "aicc":
+            partial = aggregate_bghm_file(path).to_json()
+            if partial is not None:
+                UPLOADS.save_partial(upload_id, partial)
+    except Exception as e:
+        # 여기서 실패해도 /run/aicc에서 다시 집계하므로 로그만 남김
+        app.logger.warning("업로드 선집계 실패 (%s): %s", upload_id, e)
+
+def _upload_partial(upload_id: str, path: Path, progress) -> FilePartial:
+    saved = UPLOADS.load_partial(upload_id)
+    part = FilePartial.from_json(saved) if saved else None
+    if part is not None:
+        progress.add(files_parsed=1, rows=part.rows)
+        return part
+    return aggregate_bghm_file(path, progress=progress)
+
+@app.route("/uploads", methods=["POST"])
+def upload_create():
+    body = request.get_json(silent=True) or {}
+    filename = str(body.get("filename") or "")
+    if not filename or not _is_allowed(filename):
+        return jsonify(errors=[f"허용되지 않는 파일 형식: {filename}"]), 400
+    try:
+        status = UPLOADS.create(filename, int(body.get("size") or 0), body.get("sha256"))
+    except (UploadError, ValueError) as e:
+        return jsonify(errors=[str(e)]), getattr(e, "status", 400)
+    return _upload_response(status, 201)
+
+@app.route("/uploads/<upload_id>", methods=["GET", "HEAD"])
+def upload_status(upload_id):
+    try:
+        return _upload_response(UPLOADS.status(upload_id))
+    except UploadError as e:
+        return jsonify(errors=[str(e)]), e.status
+
+@app.route("/uploads/<upload_id>", methods=["PUT"])
+def upload_chunk(upload_id):
+    try:
+        status, completed_now = UPLOADS.write_chunk(
+            upload_id,
+            request.headers.get("Content-Range"),
+            request.stream,
+            request.headers.get("X-Chunk-SHA256"),
+        )
+    except UploadError as e:
+        return jsonify(errors=[str(e)]), e.status
+    if completed_now:
+        _upload_executor.submit(_aggregate_completed_upload, upload_id)
+    return _upload_response(status)
+
+# -----------------------------
+# 진행 상황 (Server-Sent Events)
+#   GET /progress/<job_id>   job_id는 클라이언트가 만들어 실행 폼(job_id)에 같이 보냄
+#   각 이벤트 data = {"stage", "label", "counters", "elapsed", "done", "error"}
+# -----------------------------
+@app.route("/admission", methods=["GET"])
+def admission_status():
+    # 현재 점유/대기 현황 (모니터링용)
+    if ADMISSION is None:
+        return jsonify(enabled=False)
+    return jsonify(enabled=True, **ADMISSION.snapshot())
+
+@app.route("/progress/<job_id>", methods=["GET"])
+def progress_stream(job_id):
+    if not valid_job_id(job_id):
+        return jsonify(errors=["잘못된 작업 ID입니다."]), 404
+    after = request.headers.get("Last-Event-ID", "")
+    body = PROGRESS.stream(job_id, after=int(after) if after.isdigit() else 0)
+    return Response(
+        stream_with_context(body),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# -----------------------------
+# Preview (JSON): 수집·집계만 수행, xlsx 생성/저장/ZIP 없음
+# -----------------------------
+@app.route("/preview/acen", methods=["POST"])
+@admitted
+def preview_acen_route():
+    f = request.files.get("acen_file")
+    if not f or f.filename == "" or not _is_allowed(f.filename):
+        return jsonify(errors=["유효한 ACEN 파일을 선택해주세요."]), 400
+
+    data = f.read()
+    try:
+        sniff = preflight_acen(data, f.filename)
+        return jsonify(preview_acen(data, sniff))
+    except PreflightError as e:
+        return jsonify(errors=e.problems), 400
+    except Exception as e:
+        app.logger.exception(e)
+        return jsonify(errors=[f"처리 중 오류 발생: {e}"]), 500
+
+@app.route("/preview/aicc", methods=["POST"])
+@admitted
+def preview_aicc_route():
+    files = request.files.getlist("aicc_files")
+    if not files:
+        return jsonify(errors=["AICC 파일을 선택해주세요."]), 400
+
+    uploads = []
+    for f in files:
+        if not (f and f.filename and _is_allowed(f.filename)):
+            return jsonify(errors=[f"허용되지 않는 파일 형식: {getattr(f, 'filename', '')}"]), 400
+        uploads.append((f.filename, f.stream))               # 스풀 스트림 그대로 (preview_aicc가 파일별로 닫음)
+
+    try:
+        sniffs = preflight_aicc(uploads)
+        return jsonify(preview_aicc(uploads, sniffs))
+    except PreflightError as e:
+        return jsonify(errors=e.problems), 400
+    except Exception as e:
+        app.logger.exception(e)
+        return jsonify(errors=[f"처리 중 오류 발생: {e}"]), 500
+
+# -----------------------------
+# 지난 산출물 조회/다운로드 (읽기 전용, 재생성 없이)
+#   GET /reports?month=YYYY-MM | year=YYYY [&kind=acen|aicc|sum]   → 목록 (기본: 최근 REPORTS_RECENT_MONTHS개월)
+#   GET /reports/YYYY/MM/<파일명>                                  → 다운로드 (ETag/If-None-Match, Range)
+# -----------------------------
+REPORTS_RECENT_MONTHS = 12
+_MONTH_RE = re.compile(r"^(\d{4})[-./]?(\d{2})$")
+
+def _parse_month(value: str):
+    m = _MONTH_RE.match(value.strip())
+    if not m or not 1 <= int(m.group(2)) <= 12:
+        return None
+    return datetime(int(m.group(1)), int(m.group(2)), 1)
+
+@app.route("/reports", methods=["GET"])
+def reports_list():
+    kind = request.args.get("kind") or None
+    if kind is not None and kind not in OUTPUT_KINDS:
+        return jsonify(errors=[f"알 수 없는 종류: {kind} (가능: {', '.join(OUTPUT_KINDS)})"]), 400
+
+    available = report_months(OUTPUT_STORAGE)
+    if request.args.get("month"):
+        month = _parse_month(request.args["month"])
+        if month is None:
+            return jsonify(errors=["month는 YYYY-MM 형식이어야 합니다."]), 400
+        months = [month]
+    elif request.args.get("year"):
+        year = request.args["year"].strip()
+        if not (len(year) == 4 and year.isdigit()):
+            return jsonify(errors=["year는 YYYY 형식이어야 합니다."]), 400
+        months = [m for m in available if m.year == int(year)]
+    else:
+        months = available[:REPORTS_RECENT_MONTHS]
+
+    reports = list_reports(OUTPUT_STORAGE, months, kind)
+    for r in reports:
+        r["url"] = url_for("report_download", key=r["key"])
+    return jsonify(months=[f"{m:%Y-%m}" for m in available], reports=reports)
+
+def _if_range_ok(info: ObjectInfo) -> bool:
+    """If-Range가 없거나 현재 파일과 같으면 Range 적용 (다르면 전체 전송)."""
+    cond = request.if_range
+    if cond.etag is not None:
+        return cond.etag == info.etag
+    if cond.date is not None:
+        return int(info.mtime) <= cond.date.timestamp()
+    return True
+
+def _send_report(stored: StoredFile, info: ObjectInfo):
+    local = stored.local_path()
+    if local is not None:
+        # 로컬 파일은 send_file이 ETag/If-None-Match/Range를 처리
+        return send_file(
+            local,
+            as_attachment=True,
+            download_name=stored.name,
+            mimetype=XLSX_MIMETYPE,
+            conditional=True,
+            etag=info.etag,
+            last_modified=info.mtime,
+        )
+
+    # 오브젝트 스토리지 / 저장 대기 중인 메모리 사본: 필요한 구간만 읽어서 응답
+    if request.if_none_match.contains(info.etag):
+        resp = Response(status=304)
+        resp.set_etag(info.etag)
+        return resp
+    start, length, status = 0, info.size, 200
+    headers = {"Accept-Ranges": "bytes"}
+    rng = request.range
+    if rng is not None and rng.units == "bytes" and len(rng.ranges) == 1 and _if_range_ok(info):
+        byte_range = rng.range_for_length(info.size)
+        if byte_range is None:
+            return Response(status=416, headers={"Content-Range": f"bytes */{info.size}"})
+        start, stop = byte_range
+        length, status = stop - start, 206
+        headers["Content-Range"] = f"bytes {start}-{stop - 1}/{info.size}"
+
+    resp = Response(
+        stream_with_context(stored.storage.iter_range(stored.key, start, length)),
+        status=status,
+        mimetype=XLSX_MIMETYPE,
+        headers=headers,
+        direct_passthrough=True,
+    )
+    resp.content_length = length
+    resp.set_etag(info.etag)
+    resp.last_modified = datetime.fromtimestamp(info.mtime)
+    resp.cache_control.no_cache = True
+    resp.headers.set(
+        "Content-Disposition", "attachment",
+        filename=stored.name.encode("ascii", "ignore").decode("ascii") or "report.xlsx",
+        **{"filename*": "UTF-8''" + quote(stored.name, safe="!#$&+-.^_`|~")},
+    )
+    return resp
+
+@app.route("/reports/<path:key>", methods=["GET"])
+def report_download(key):
+    month, _, name = key.rpartition("/")
+    if _parse_month(month.replace("/", "-")) is None or "/" in name or output_kind(name) is None:
+        return jsonify(errors=["산출물을 찾을 수 없습니다."]), 404
+    stored = StoredFile(OUTPUT_STORAGE, key)
+    info = stored.stat()
+    if info is None:
+        return jsonify(errors=["산출물을 찾을 수 없습니다."]), 404
+    return _send_report(stored, info)
 
 if __name__ == "__main__":
     # 개발용 실행 (프로덕션은 gunicorn/uwsgi 권장)
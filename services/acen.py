@@ -3,13 +3,21 @@ from io import BytesIO
 from pathlib import Path
 from typing import Dict, Tuple, Optional
 from datetime import datetime, date
+import json
 import re
 from dateutil.relativedelta import relativedelta
-from openpyxl import load_workbook
+from openpyxl.utils import column_index_from_string
 from calendar import monthrange
-import math
 from collections import defaultdict
 
+from services.layout import SLIP_START_ROW, prepare_slip_rows
+from services.money import parse_won, split_vat_won, try_parse_amounts
+from services.progress import NULL_PROGRESS, NullProgress
+from services.readers import get_reader, open_sheet
+from services.shared_cache import content_key, get_cache, load_template
+from services.storage import Storage, StoredFile, get_storage, month_key
+from services.tracing import set_attrs, traced
+
 # (옵션) Flask 응답이 필요할 때만 쓰세요
 try:
     from flask import send_file as _flask_send_file  # type: ignore
@@ -18,14 +26,6 @@ except Exception:
 
 
 # ===== 공통 유틸 =====
-def _make_yyyy_mm_dir(base_dir: Path | str, when: Optional[datetime] = None) -> Path:
-    when = when or datetime.now()
-    base = Path(base_dir)
-    out_dir = base / when.strftime("%Y") / when.strftime("%m")
-    out_dir.mkdir(parents=True, exist_ok=True)
-    return out_dir
-
-
 def _parse_yyyymm(val) -> Optional[datetime]:
     """
     A2 셀 값에서 YYYY-MM(또는 YYYY.MM / YYYY/MM / 'YYYYMM' 등) 파싱 → 해당 월의 1일 datetime 반환.
@@ -59,43 +59,46 @@ def _parse_yyyymm(val) -> Optional[datetime]:
 
     return None
 
-def _read_a2_month(file_like) -> Optional[datetime]:
+def _read_a2_month(file_like, reader: Optional[str] = None) -> Optional[datetime]:
     """
     원본 첫 시트의 A2 값을 읽어 base month(해당월 1일)로 반환.
     file_like는 BytesIO/스트림 모두 가능.
     """
-    wb = load_workbook(file_like, data_only=True, read_only=True)
-    ws = wb.worksheets[0]
-    a2 = ws["A2"].value
+    with open_sheet(file_like, reader) as sheet:
+        a2 = sheet.cell(2, 1)
     return _parse_yyyymm(a2)
 
 def split_vat_exact(gross_list):
-    raw = [g * 10 / 11 for g in gross_list]
-    floor_vals = [math.floor(x) for x in raw]
-    residues = [x - f for x, f in zip(raw, floor_vals)]
-
-    target = round(sum(raw))           # 정책에 따라 floor/ceil/half_up로 변경 가능
-    need = target - sum(floor_vals)
-
-    order = sorted(range(len(residues)), key=lambda i: residues[i], reverse=True)
-    for i in order[:need]:
-        floor_vals[i] += 1
-
-    supply = [int(v) for v in floor_vals]                    # ← 정수화
-    vat = [int(round(g)) - s for g, s in zip(gross_list, supply)]  # ← 정수로 계산
-    return supply, vat
+    """총액 목록(정확한 금액) → (공급가, 부가세) 원 단위 목록. 계산은 services.money.split_vat_won (정수 연산)."""
+    return split_vat_won(gross_list)
 
 # ===== 1) 원본에서 추출 =====
+# 업체 패턴/배분 규칙을 바꾸면 올려서 예전 캐시 항목을 무효화
+P_BI_CACHE_VERSION = 1
+
+@traced("acen.extract_p_bi")
 def extract_p_bi_mapped_only(
     file_like,
     name_col: str = "P",
     amount_col: str = "BI",
+    reader: Optional[str] = None,
 ) -> Dict[str, int]:
     raw = file_like.read() if hasattr(file_like, "read") else file_like
     bio = BytesIO(raw if isinstance(raw, (bytes, bytearray)) else raw.getvalue())
-    wb = load_workbook(bio, data_only=True, read_only=True)
-    ws = wb.worksheets[0]
 
+    # 같은 내용의 원본을 이미 추출한 적이 있으면 (다른 워커 포함) 공유 캐시 결과 사용
+    key = content_key(bio, "acen.p_bi", P_BI_CACHE_VERSION, name_col, amount_col, get_reader(reader).name)
+    cached = get_cache().get("acen", key) if key else None
+    if cached is not None:
+        set_attrs(cache="hit")
+        return dict(json.loads(bytes(cached).decode("utf-8")))
+    result = _extract_p_bi(bio, name_col, amount_col, reader)
+    if key:
+        get_cache().put("acen", key, json.dumps([[k, int(v)] for k, v in result.items()], ensure_ascii=False).encode("utf-8"))
+    return result
+
+
+def _extract_p_bi(bio: BytesIO, name_col: str, amount_col: str, reader: Optional[str]) -> Dict[str, int]:
     patterns = [
         (re.compile(r"남"), "㈜남이섬"),
         (re.compile(r"엠지브이보"), "㈜엠지브이보안시스템"),
@@ -108,47 +111,55 @@ def extract_p_bi_mapped_only(
             if pat.search(name): return canon
         return None
 
-    # 1) 행 순서대로 (업체, 총액) 모으기
-    rows: list[tuple[str, float]] = []
-    for r in range(2, ws.max_row + 1):
-        nval = ws[f"{name_col}{r}"].value
-        aval = ws[f"{amount_col}{r}"].value
-        name = str(nval).strip() if nval not in (None, "") else ""
-        canon = canonize(name)
-        if not canon: continue
-        if aval in (None, ""): continue
-        try:
-            amt = float(str(aval).replace(",", ""))
-        except Exception:
-            continue
-        if amt > 0:
-            rows.append((canon, amt))
-
-    if not rows:
+    # 1) 행 순서대로 (업체, 원본 금액) 모으기 - 시트는 P~BI 구간만 한 번 순회
+    n_idx = column_index_from_string(name_col)
+    a_idx = column_index_from_string(amount_col)
+    lo, hi = min(n_idx, a_idx), max(n_idx, a_idx)
+    vendors: list[str] = []
+    raw_amounts: list = []
+    with open_sheet(bio, reader) as sheet:
+        for row in sheet.iter_rows(min_row=2, min_col=lo, max_col=hi):
+            if not row:
+                continue
+            nval = row[n_idx - lo]
+            aval = row[a_idx - lo] if a_idx - lo < len(row) else None
+            name = str(nval).strip() if nval not in (None, "") else ""
+            canon = canonize(name)
+            if not canon: continue
+            if aval in (None, ""): continue
+            vendors.append(canon)
+            raw_amounts.append(aval)
+
+    # 2) 금액을 반올림 없이 한 번에 변환 (해석 불가/0 이하 제외)
+    amounts = try_parse_amounts(raw_amounts)
+    keep = [a is not None and a > 0 for a in amounts]
+    if not any(keep):
         return {}
+    vendors = [v for v, k in zip(vendors, keep) if k]
+    gross_all = [a for a, k in zip(amounts, keep) if k]
 
-    # 2) ★ 전체 한 번에 정확 배분 → 공급가 리스트
-    gross_all = [amt for _, amt in rows]
+    # 3) ★ 전체 한 번에 정확 배분 → 공급가 리스트
     supply_all, _ = split_vat_exact(gross_all)  # ← 전체 합이 304,545로 맞춰짐
 
-    # 3) 업체별 공급가 합계로 집계
+    # 4) 업체별 공급가 합계로 집계
     result: Dict[str, int] = defaultdict(int)
-    for (vendor, _), supply in zip(rows, supply_all):
-        result[vendor] += int(supply)
+    for vendor, supply in zip(vendors, supply_all):
+        result[vendor] += supply
 
     return dict(result)
 
 
 # ===== 2) 템플릿 채워 메모리로 만들기 =====
+@traced("acen.build_slip")
 def build_sample2_bytes(
-    mapped_result: Dict[str, float],
+    mapped_result: Dict[str, int],
     template_path: str | Path,
     write_formulas: bool = False,
     filename_date_fmt: str = "dots",   # 무시 가능, 파일명은 아래서 YY.MM.dd 고정
     settlement_month: Optional[datetime] = None,
     report_date: Optional[datetime] = None,
 ) -> Tuple[BytesIO, str]:
-    wb = load_workbook(str(template_path))
+    wb = load_template(template_path)
     ws = wb.active
 
     # 정산월(없으면 -3개월 fallback 대신 지금 시점에서 -3개월은 이전 로직이었음)
@@ -181,14 +192,15 @@ def build_sample2_bytes(
     # 본문 라인: (예시) 정산 문구는 정산월-3개월 기준으로 유지
     yy_for_body = adjusted_date.strftime("%y")
     mm_for_body = adjusted_date.month  # int (9월 → 9)
-    start_row = 11
+    start_row = SLIP_START_ROW
+    prepare_slip_rows(ws, len(mapped_result), start_row=start_row)  # 업체 수 > 템플릿 행 수면 행 삽입
     seq = 1
     for i, (name, amount) in enumerate(mapped_result.items(), start=start_row):
         ws[f"A{i}"] = seq
         ws[f"D{i}"] = f"A'CenCloud {name} 정산({yy_for_body}년 {mm_for_body}월) - 판매수수료"
         ws[f"C{i}"] = "판매위탁 수수료 (A'cen)"
         ws[f"E{i}"] = 1
-        ws[f"K{i}"] = float(amount)
+        ws[f"K{i}"] = parse_won(amount)
         ws[f"G{i}"] = "-"
         seq += 1
 
@@ -204,14 +216,13 @@ def build_sample2_bytes(
 def save_acen_bytes_yyyy_mm(
     bio: BytesIO,
     filename_base: str = "매출결의서_KT ACen_유지수수료",
-    base_dir: Path | str = "output",
+    base_dir: Path | str | Storage = "output",
     when: Optional[datetime] = None,            # 폴더(YYYY/MM) 기준: 정산월
     date_fmt: str = "dots",                     # "dots" | "underscores"
     report_date: Optional[datetime] = None,     # 파일명 날짜 기준(우선)
-) -> Path:
+) -> StoredFile:
     # 1) 디렉토리: 정산월(when) 기준
     dir_basis = when or datetime.now()
-    out_dir = _make_yyyy_mm_dir(base_dir, dir_basis)
 
     # 2) 파일명: report_date 우선, 없으면 정산월(when)
     name_basis = report_date or dir_basis
@@ -221,30 +232,33 @@ def save_acen_bytes_yyyy_mm(
         else name_basis.strftime("%y.%m.%d")
     )
 
-    out_path = out_dir / f"{filename_base}_{date_str}.xlsx"
-    with open(out_path, "wb") as f:
-        f.write(bio.getbuffer())
-    return out_path
+    key = month_key(dir_basis, f"{filename_base}_{date_str}.xlsx")
+    return get_storage(base_dir).write_bytes(key, bio.getbuffer())
 
+@traced("acen.pipeline")
 def run_acen_pipeline(
     file_like,
     template_path: str | Path,
-    base_dir: Path | str = "output",
+    base_dir: Path | str | Storage = "output",
     write_formulas: bool = False,
     date_fmt: str = "dots",
     filename_base: str = "매출결의서_KT ACen_유지수수료",
     when: Optional[datetime] = None,           # 그대로 두되 사용 안 함
     report_day: Optional[int] = None,          # ★ 추가: 일(day)만 받기
-) -> Path:
+    progress: NullProgress = NULL_PROGRESS,
+    reader: Optional[str] = None,              # 엑셀 리더 백엔드 (services.readers)
+) -> StoredFile:
     # 업로드 원본 복사
     raw = file_like.read() if hasattr(file_like, "read") else file_like
     buf1, buf2 = BytesIO(raw), BytesIO(raw)
 
     # 1) 데이터 집계
-    mapped = extract_p_bi_mapped_only(buf1)
+    progress.stage("parse", "ACEN 파일 읽기", files_total=1, files_parsed=0)
+    mapped = extract_p_bi_mapped_only(buf1, reader=reader)
+    progress.add(files_parsed=1, vendors=len(mapped))
 
     # 2) 정산월 계산 (A2 + 1개월, 실패 시 now-3M)
-    base_month = _read_a2_month(buf2)
+    base_month = _read_a2_month(buf2, reader=reader)
     settlement_month = base_month + relativedelta(months=1) if base_month else (datetime.now() - relativedelta(months=3))
 
     # 3) report_day → report_date 생성 (해당 월에 없는 일자면 말일로 보정)
@@ -256,6 +270,7 @@ def run_acen_pipeline(
         report_date = settlement_month.replace(day=safe_day)
 
     # 4) 템플릿 채우기
+    progress.stage("write", "ACEN 매출결의서 작성")
     bio, _ = build_sample2_bytes(
         mapped_result=mapped,
         template_path=template_path,
@@ -265,12 +280,17 @@ def run_acen_pipeline(
         report_date=report_date,  # ★ 전달!
     )
 
-    # 5) 저장 (정산월 기준 경로/파일명)
-    return save_acen_bytes_yyyy_mm(
-        bio=bio,
-        filename_base=filename_base,
-        base_dir=base_dir,
-        when=settlement_month,
-        date_fmt=date_fmt,
-        report_date=report_date, 
-    )
\ No newline at end of file
+    # 5) 저장 (정산월 기준 경로/파일명) - 같은 정산월 작업끼리만 직렬화
+    storage = get_storage(base_dir)
+    with storage.lock(settlement_month):
+        out = save_acen_bytes_yyyy_mm(
+            bio=bio,
+            filename_base=filename_base,
+            base_dir=storage,
+            when=settlement_month,
+            date_fmt=date_fmt,
+            report_date=report_date,
+        )
+    progress.add(workbooks_saved=1)
+    set_attrs(file__size=len(raw) if isinstance(raw, (bytes, bytearray)) else None, vendors=len(mapped), settlement_month=f"{settlement_month:%Y-%m}", key=out.key)
+    return out
\ No newline at end of file
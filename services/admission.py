@@ -0,0 +1,285 @@
+# services/admission.py
+from __future__ import annotations
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from services.atomic import path_lock
+
+# 무거운 실행 요청(/run/*, /preview/*) 입장 제어.
+# - 요청 비용(예상 메모리) = 기본 + 업로드 크기 × 팽창 계수 + 파일 수 × 파일당 비용 + 추가 프로세스 수 × 프로세스당 비용
+# - 예산: 워커(프로세스)별 + 호스트(같은 ledger 디렉토리를 보는 모든 워커) 합계, 각각 동시 실행 수/메모리
+# - 예산이 모자라면 호스트 공용 FIFO 대기열에서 대기. 앞선 대기자가 호스트 예산 때문에 못 들어가는 동안은
+#   뒤 요청이 끼어들지 않음 (큰 요청이 작은 요청에 밀려 굶지 않도록).
+#   앞선 대기자가 자기 워커 예산 때문에만 막혀 있으면 다른 워커의 뒤 요청은 먼저 들어감
+# - 대기열이 가득 찼거나 max_wait 안에 못 들어가면 AdmissionRejected (→ 503 + Retry-After)
+# - 상태는 <root>/ledger.json 하나 (flock으로 직렬화). 죽은 워커의 항목은 pid로 정리
+
+MB = 1024 * 1024
+
+
+def _env_int(name: str, default: int) -> int:
+    v = os.environ.get(name, "").strip()
+    return int(v) if v.isdigit() else default
+
+
+def _host_memory() -> int:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return 8 * 1024 * MB
+
+
+@dataclass(frozen=True)
+class Budget:
+    slots: int                # 동시 실행 수
+    memory: int               # 예상 메모리 합계 (bytes)
+
+
+@dataclass(frozen=True)
+class CostModel:
+    base: int = 48 * MB       # 템플릿/결과 워크북 등 요청마다 드는 고정 비용
+    expansion: float = 8.0    # 업로드 xlsx(압축) 1바이트당 처리 중 메모리
+    per_file: int = 4 * MB
+    per_process: int = 96 * MB  # 일괄 처리 프로세스 풀 (spawn 인터프리터 + 템플릿 + 결과 워크북)
+
+    def estimate(self, total_bytes: int, files: int, processes: int = 0) -> int:
+        return int(
+            self.base + self.expansion * max(0, total_bytes) + self.per_file * max(0, files)
+            + self.per_process * max(0, processes)
+        )
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """입장권. with 문을 나가거나 release()하면 예산 반환."""
+
+    def __init__(self, controller: "AdmissionController", ticket_id: str, cost: int, waited: float):
+        self.controller = controller
+        self.id = ticket_id
+        self.cost = cost
+        self.waited = waited
+        self._started = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self.controller._release(self, time.monotonic() - self._started)
+
+    def __enter__(self) -> "Ticket":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.release()
+
+
+def _pid_alive(pid) -> bool:
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True
+    return True
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        root: Path | str,
+        *,
+        worker: Budget,
+        host: Budget,
+        cost_model: CostModel = CostModel(),
+        max_queue: int = 16,
+        max_wait: float = 20.0,
+        poll: float = 0.05,
+    ):
+        self.root = Path(root)
+        self.worker = worker
+        self.host = host
+        self.cost_model = cost_model
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.poll = poll
+        self._cond = threading.Condition()
+
+    @classmethod
+    def from_env(cls, root: Path | str) -> "AdmissionController":
+        """KT_ADMIT_* 환경변수로 예산 설정 (기본: 워커 2건/1GB, 호스트 CPU 수/물리 메모리 절반)"""
+        return cls(
+            root,
+            worker=Budget(_env_int("KT_ADMIT_WORKER_SLOTS", 2), _env_int("KT_ADMIT_WORKER_MB", 1024) * MB),
+            host=Budget(
+                _env_int("KT_ADMIT_HOST_SLOTS", os.cpu_count() or 2),
+                _env_int("KT_ADMIT_HOST_MB", _host_memory() // 2 // MB) * MB,
+            ),
+            cost_model=CostModel(
+                base=_env_int("KT_ADMIT_BASE_MB", 48) * MB,
+                expansion=float(os.environ.get("KT_ADMIT_EXPANSION") or 8.0),
+                per_process=_env_int("KT_ADMIT_PROCESS_MB", 96) * MB,
+            ),
+            max_queue=_env_int("KT_ADMIT_QUEUE", 16),
+            max_wait=float(os.environ.get("KT_ADMIT_MAX_WAIT") or 20.0),
+        )
+
+    def estimate(self, total_bytes: int, files: int, processes: int = 0) -> int:
+        # 예산보다 큰 요청도 혼자서는 돌 수 있도록 상한을 예산에 맞춤
+        return min(self.cost_model.estimate(total_bytes, files, processes), self.worker.memory, self.host.memory)
+
+    # ---------- ledger ----------
+    @property
+    def _ledger_path(self) -> Path:
+        return self.root / "ledger.json"
+
+    def _locked(self):
+        return path_lock(self.root / ".ledger.lock")
+
+    def _load(self) -> dict:
+        try:
+            ledger = json.loads(self._ledger_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            ledger = {}
+        ledger.setdefault("active", {})
+        ledger.setdefault("waiting", {})
+        ledger.setdefault("avg_hold", 5.0)
+        return ledger
+
+    def _save(self, ledger: dict) -> None:
+        # 호스트 로컬 상태라 fsync 없이 임시파일 → rename
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.root / f".ledger.{os.getpid()}.{threading.get_ident()}.tmp"
+        tmp.write_text(json.dumps(ledger), encoding="utf-8")
+        os.replace(tmp, self._ledger_path)
+
+    @staticmethod
+    def _purge(ledger: dict) -> bool:
+        now = time.time()
+        changed = False
+        for section in ("active", "waiting"):
+            for tid, e in list(ledger[section].items()):
+                if not _pid_alive(e["pid"]) or (section == "waiting" and e["deadline"] + 5 < now):
+                    del ledger[section][tid]
+                    changed = True
+        return changed
+
+    def _fits(self, ledger: dict, entry: dict, budget: Budget, pid: Optional[int]) -> bool:
+        active = [e for e in ledger["active"].values() if pid is None or e["pid"] == pid]
+        return len(active) < budget.slots and sum(e["cost"] for e in active) + entry["cost"] <= budget.memory
+
+    def _can_enter(self, ledger: dict, tid: str) -> bool:
+        me = ledger["waiting"][tid]
+        if not (self._fits(ledger, me, self.host, None) and self._fits(ledger, me, self.worker, me["pid"])):
+            return False
+        for other_id, other in ledger["waiting"].items():
+            if other_id == tid or (other["t"], other_id) >= (me["t"], tid):
+                continue
+            # 앞선 대기자가 호스트 예산으로 막혀 있으면 양보 (자기 워커 예산으로만 막혀 있으면 통과)
+            if not self._fits(ledger, other, self.host, None) or self._fits(ledger, other, self.worker, other["pid"]):
+                return False
+        return True
+
+    def _retry_after(self, ledger: dict) -> int:
+        ahead = len(ledger["waiting"]) + len(ledger["active"])
+        return max(1, min(60, math.ceil(ledger["avg_hold"] * ahead / max(1, self.host.slots))))
+
+    # ---------- 입장 / 퇴장 ----------
+    def admit(self, cost: int, on_wait: Optional[Callable[[int], None]] = None) -> Ticket:
+        """
+        예산이 날 때까지 대기 후 Ticket 반환. on_wait(앞선 대기자 수)는 순번이 바뀔 때마다 호출.
+        대기열이 가득 찼거나 max_wait를 넘기면 AdmissionRejected.
+        """
+        t0 = time.monotonic()
+        tid = uuid.uuid4().hex
+        entry = {"pid": os.getpid(), "cost": cost, "t": time.time(), "deadline": time.time() + self.max_wait}
+        with self._locked():
+            ledger = self._load()
+            self._purge(ledger)
+            if not ledger["waiting"] and self._fits(ledger, entry, self.host, None) \
+                    and self._fits(ledger, entry, self.worker, entry["pid"]):
+                ledger["active"][tid] = entry                    # 바로 입장
+                self._save(ledger)
+                return Ticket(self, tid, cost, 0.0)
+            if len(ledger["waiting"]) >= self.max_queue:
+                raise AdmissionRejected("대기 중인 요청이 많습니다.", self._retry_after(ledger))
+            ledger["waiting"][tid] = entry
+            self._save(ledger)
+
+        last_pos = -1
+        try:
+            while True:
+                with self._locked():
+                    ledger = self._load()
+                    changed = self._purge(ledger)
+                    if tid not in ledger["waiting"]:             # 정리됨 (시계 문제 등) → 다시 등록
+                        ledger["waiting"][tid] = entry
+                        changed = True
+                    if self._can_enter(ledger, tid):
+                        ledger["active"][tid] = ledger["waiting"].pop(tid)
+                        self._save(ledger)
+                        return Ticket(self, tid, cost, time.monotonic() - t0)
+                    if time.monotonic() - t0 >= self.max_wait:
+                        del ledger["waiting"][tid]
+                        self._save(ledger)
+                        raise AdmissionRejected("처리 대기 시간이 초과되었습니다.", self._retry_after(ledger))
+                    if changed:
+                        self._save(ledger)
+                    pos = sum(1 for k, e in ledger["waiting"].items() if (e["t"], k) < (entry["t"], tid))
+                if on_wait is not None and pos != last_pos:
+                    last_pos = pos
+                    on_wait(pos)
+                # 같은 워커의 퇴장은 바로 깨우고, 다른 워커의 퇴장은 poll 간격으로 확인
+                with self._cond:
+                    self._cond.wait(self.poll)
+        except BaseException as e:
+            if not isinstance(e, AdmissionRejected):
+                self._forget(tid)
+            raise
+
+    def _forget(self, tid: str) -> None:
+        with self._locked():
+            ledger = self._load()
+            ledger["waiting"].pop(tid, None)
+            ledger["active"].pop(tid, None)
+            self._save(ledger)
+
+    def _release(self, ticket: Ticket, held: float) -> None:
+        with self._locked():
+            ledger = self._load()
+            ledger["active"].pop(ticket.id, None)
+            ledger["avg_hold"] = round(0.8 * ledger["avg_hold"] + 0.2 * held, 3)   # Retry-After 추정용
+            self._save(ledger)
+        with self._cond:
+            self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, object]:
+        """현재 점유/대기 현황 (모니터링용)"""
+        with self._locked():
+            ledger = self._load()
+            self._purge(ledger)
+        active: List[dict] = list(ledger["active"].values())
+        return {
+            "active": len(active),
+            "active_memory_mb": round(sum(e["cost"] for e in active) / MB, 1),
+            "waiting": len(ledger["waiting"]),
+            "host_slots": self.host.slots,
+            "host_memory_mb": self.host.memory // MB,
+            "worker_slots": self.worker.slots,
+            "worker_memory_mb": self.worker.memory // MB,
+            "avg_hold_s": ledger["avg_hold"],
+        }
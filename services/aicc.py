@@ -2,37 +2,42 @@
 from __future__ import annotations
 from pathlib import Path
 from collections import OrderedDict
-from decimal import Decimal, ROUND_HALF_UP
-from typing import Any, List, Sequence, Tuple, Optional
+from typing import Any, Iterable, Iterator, List, NamedTuple, Sequence, Tuple, Optional
 import fnmatch
-import pandas as pd
-from openpyxl import load_workbook
+import json
+import struct
+import time
 from datetime import datetime, date
-from io import BytesIO
+from decimal import Decimal
 import re
 from calendar import monthrange
 from dateutil.relativedelta import relativedelta
+import numpy as np
+
+from services.layout import SLIP_START_ROW, prepare_slip_rows
+from services.money import AMOUNT_EPS, Amount, parse_amount, parse_amounts, round_won
+from services.progress import NULL_PROGRESS, NullProgress, counted
+from services.readers import SheetReader, get_reader, open_sheet
+from services.shared_cache import content_key, get_cache, load_template
+from services.storage import Storage, StoredFile, get_storage, month_key
+from services.tracing import set_attrs, span, traced
 
 # =========================
 # 유틸
 # =========================
 def _norm(x):
-    if pd.isna(x):
+    if x is None:
         return None
     if isinstance(x, str):
         s = x.strip()
         return None if s == "" else s
+    if isinstance(x, float):
+        if x != x:  # NaN
+            return None
+        if x.is_integer():
+            return int(x)  # pandas(read_excel)와 동일하게 정수형 float는 int로
     return x
 
-def _to_decimal(x) -> Decimal:
-    if x is None: return Decimal("0")
-    if isinstance(x, Decimal): return x
-    if isinstance(x, (int, float)): return Decimal(str(x))
-    if isinstance(x, str):
-        s = x.replace(",", "").strip()
-        return Decimal(s) if s else Decimal("0")
-    return Decimal("0")
-
 def _parse_yyyymm(val) -> Optional[datetime]:
     """
     A2 셀 값에서 YYYY-MM(또는 YYYY.MM / YYYY/MM / 'YYYYMM' 등) 파싱 → 해당 월의 1일 datetime 반환.
@@ -67,101 +72,309 @@ def _parse_yyyymm(val) -> Optional[datetime]:
     return None
 
 # =========================
-# Read & Combine
+# Read & Combine (스트리밍)
 # =========================
-def read_bghm_one(file_obj, start_row: int = 7) -> Tuple[List[List[Any]], Optional[datetime]]:
+# 본문 행은 generator로 흘려보내고 G/H는 STREAM_CHUNK 행 단위로 묶어 정확한 금액(int / 소수면 Decimal)으로 변환.
+# 원 단위 반올림은 (B, Title) 합계마다 1회 (GroupAccumulator.result).
+# 전체 행 리스트를 만들지 않으므로 메모리는 (name, title) 그룹 수에만 비례.
+STREAM_CHUNK = 2048
+_B, _G, _H, _M = 0, 5, 6, 11        # min_col=B(2) 기준 B/G/H/M 오프셋
+
+
+class AiccAggregate(NamedTuple):
+    mapped: List[List[Any]]                  # [[회사명, total_H, Title], ...]
+    settlement_month: Optional[datetime]
+    files: List[dict]                        # 파일별 {"rows", "month", "elapsed_ms"}
+
+
+def _amount_chunk(chunk: List[List[Any]]) -> List[List[Any]]:
+    g_amt = parse_amounts([r[1] for r in chunk])
+    h_amt = parse_amounts([r[2] for r in chunk])
+    for r, g, h in zip(chunk, g_amt, h_amt):
+        r[1], r[2] = g, h
+    return chunk
+
+
+def _iter_bghm(sheet: SheetReader, start_row: int) -> Iterator[List[Any]]:
+    try:
+        chunk: List[List[Any]] = []
+        for row in sheet.iter_rows(min_row=start_row, min_col=2, max_col=13):
+            if len(row) <= _M:
+                continue
+            b, g, h, m = _norm(row[_B]), _norm(row[_G]), _norm(row[_H]), _norm(row[_M])
+            if b is None or g is None or h is None or m is None:
+                continue
+            chunk.append([b, g, h, m])
+            if len(chunk) >= STREAM_CHUNK:
+                yield from _amount_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield from _amount_chunk(chunk)
+    finally:
+        sheet.close()
+
+
+def open_bghm(
+    file_obj,
+    start_row: int = 7,
+    reader: Optional[str] = None,
+) -> Tuple[Optional[datetime], Iterator[List[Any]]]:
+    """
+    단일 파일의 (A4 정산월, [B,G,H,M] 행 iterator).
+    iterator는 다 읽으면 워크북을 닫음. G/H는 정확한 금액 (원 단위면 int, 소수면 Decimal).
+    reader: 엑셀 리더 백엔드 (services.readers, None이면 KT_EXCEL_READER / auto)
+    """
+    sheet = open_sheet(file_obj, reader)
+    a4 = sheet.cell(4, 1)
+    # _parse_yyyymm은 기존에 있으니 재사용 (YYYYMM/YYYY-MM/… 대응, 해당 월 1일 반환)
+    return _parse_yyyymm(a4), _iter_bghm(sheet, start_row)
+
+
+@traced("aicc.read_bghm_one")
+def read_bghm_one(
+    file_obj,
+    start_row: int = 7,
+    reader: Optional[str] = None,
+) -> Tuple[List[List[Any]], Optional[datetime]]:
     """
     단일 파일에서 B/G/H/M을 start_row부터 읽어서 [[B,G,H,M], ...] 리턴
     + 첫 시트 A4의 정산년월(YYYYMM 등)을 파싱해 해당 월의 1일 datetime도 함께 리턴
     """
-    # 1) 파일을 메모리에 복사해 두 개의 버퍼로 사용 (pandas / openpyxl 각각)
-    raw = file_obj.read() if hasattr(file_obj, "read") else file_obj
-    if isinstance(raw, (bytes, bytearray)):
-        raw_bytes = raw
-    else:
-        # raw가 BytesIO인 경우 등
-        raw_bytes = raw.getvalue()
-    bio_pd = BytesIO(raw_bytes)   # pandas용
-    bio_xl = BytesIO(raw_bytes)   # openpyxl용
-
-    # 2) pandas로 본문(B,G,H,M) 읽기
-    df = pd.read_excel(
-        bio_pd,
-        sheet_name=0,
-        usecols="B,G,H,M",
-        header=None,
-        skiprows=start_row - 1,
-        engine="openpyxl",
-        dtype=object,
-    )
-    df.columns = ["B", "G", "H", "M"]
+    month, rows = open_bghm(file_obj, start_row=start_row, reader=reader)
+    out = list(rows)
+    set_attrs(file__size=_source_size(file_obj), rows=len(out), settlement_month=_ym(month))
+    return out, month
+
+
+def _source_size(src) -> Optional[int]:
+    """트레이스 속성용 파일 크기 (bytes / BytesIO / seek 가능한 file-like / 경로)"""
+    if isinstance(src, (bytes, bytearray)):
+        return len(src)
+    if hasattr(src, "getbuffer"):
+        return src.getbuffer().nbytes
+    if hasattr(src, "seek") and hasattr(src, "tell"):
+        try:
+            pos = src.tell()
+            size = src.seek(0, 2)
+            src.seek(pos)
+            return size
+        except (OSError, ValueError):
+            return None
     try:
-        df = df.map(_norm)              # pandas>=2.2
-    except Exception:
-        df = df.applymap(_norm)         # fallback
+        return Path(src).stat().st_size
+    except (TypeError, OSError):
+        return None
 
-    df = df.dropna(how="all")
-    df = df.dropna(subset=["B", "G", "H", "M"])
-    rows = df.values.tolist()
 
-    # 3) openpyxl로 A4 읽어서 정산월 파싱
-    wb = load_workbook(bio_xl, data_only=True, read_only=True)
-    ws = wb.worksheets[0]
-    a4 = ws["A4"].value
+def _ym(month: Optional[datetime]) -> Optional[str]:
+    return f"{month:%Y-%m}" if month else None
 
-    # _parse_yyyymm은 기존에 있으니 재사용 (YYYYMM/YYYY-MM/… 대응, 해당 월 1일 반환)
-    settlement_month = _parse_yyyymm(a4)  # Optional[datetime]
 
-    return rows, settlement_month
+def _iter_sources(paths_or_files: Sequence[Any]) -> Iterator[Any]:
+    for item in paths_or_files:
+        if hasattr(item, "read") or isinstance(item, (bytes, bytearray)):  # file-like / bytes
+            yield item
+        else:
+            p = Path(item)
+            if not p.exists():
+                print(f"[WARN] 파일 없음: {p}")
+                continue
+            yield p
+
 
+def _choose_month(months: Sequence[datetime], strict_same_month: bool) -> Optional[datetime]:
+    """
+    모든 파일의 정산월이 다르면:
+      * strict_same_month=True: ValueError
+      * strict_same_month=False: 가장 최신 월을 선택하고 경고 출력
+    """
+    if not months:
+        return None
+    # year, month 쌍 기준으로 상이 여부 판단
+    ym_set = {(m.year, m.month) for m in months}
+    if len(ym_set) > 1:
+        msg = "[WARN] A4 정산월이 파일마다 다릅니다: " + ", ".join(
+            sorted({f"{y}-{m:02d}" for y, m in ym_set})
+        )
+        if strict_same_month:
+            raise ValueError(msg)
+        else:
+            print(msg + " → 가장 최신 월로 선택합니다.")
+    # 가장 최신(큰) 월 선택
+    return max(months, key=lambda d: (d.year, d.month))
+
+
+@traced("aicc.combine_bghm_from_paths")
 def combine_bghm_from_paths(
     paths_or_files: Sequence[Any],
     start_row: int = 7,
     strict_same_month: bool = False,
+    progress: NullProgress = NULL_PROGRESS,
+    reader: Optional[str] = None,
 ) -> Tuple[List[List[Any]], Optional[datetime]]:
     """
     여러 파일에서 [[B,G,H,M], ...] 병합 + 정산월 반환
     - 각 파일의 첫 시트 A4에서 정산월(YYYYMM 등) 파싱 → 해당 월 1일(datetime)
-    - 모든 파일의 정산월이 다르면:
-        * strict_same_month=True: ValueError
-        * strict_same_month=False: 가장 최신 월을 선택하고 경고 출력
+    - 정산월 선택 규칙은 _choose_month
     반환: (combined_rows, chosen_settlement_month)
+    대용량은 aggregate_bghm_stream 사용 (행 리스트를 만들지 않음)
     """
     combined: List[List[Any]] = []
     months: List[datetime] = []
-
-    for item in paths_or_files:
-        if hasattr(item, "read"):  # file-like
-            rows, month = read_bghm_one(item, start_row=start_row)  # ← f 아님!
-        else:
-            p = Path(item)
-            if not p.exists():
-                print(f"[WARN] 파일 없음: {p}")
-                continue
-            with open(p, "rb") as f:
-                rows, month = read_bghm_one(f, start_row=start_row)
-
-        if rows:
-            combined.extend(rows)
+    progress.stage("parse", "AICC 파일 읽기", files_total=len(paths_or_files), files_parsed=0, rows=0)
+    for src in _iter_sources(paths_or_files):
+        month, rows = open_bghm(src, start_row=start_row, reader=reader)
+        combined.extend(counted(rows, progress, "rows"))
+        progress.add(files_parsed=1)
         if month:
             months.append(month)
-
-    chosen: Optional[datetime] = None
-    if months:
-        # year, month 쌍 기준으로 상이 여부 판단
-        ym_set = {(m.year, m.month) for m in months}
-        if len(ym_set) > 1:
-            msg = "[WARN] A4 정산월이 파일마다 다릅니다: " + ", ".join(
-                sorted({f"{y}-{m:02d}" for y, m in ym_set})
-            )
-            if strict_same_month:
-                raise ValueError(msg)
-            else:
-                print(msg + " → 가장 최신 월로 선택합니다.")
-        # 가장 최신(큰) 월 선택
-        chosen = max(months, key=lambda d: (d.year, d.month))
-
-    return combined, chosen
+    return combined, _choose_month(months, strict_same_month)
+
+
+# 분류 규칙(build_title 등)이나 열 형식을 바꾸면 올려서 예전 캐시 항목을 무효화
+PARTIAL_CACHE_VERSION = 2
+
+
+class FilePartial(NamedTuple):
+    """파일 1개의 중간 집계. 파일 순서대로 merge_partials 하면 전체 스트리밍 결과와 같음."""
+    month: Optional[datetime]
+    rows: int
+    groups: List[List[Any]]                  # [[B, Title, total_H(정확한 금액, 반올림 전)], ...] (회사명 매핑 전)
+    elapsed_ms: float = 0.0
+
+    def _json_keys(self) -> bool:
+        """B/Title이 JSON에서 그대로 복원되는 값인지 (날짜/Decimal 등 B 값은 캐시하지 않음 → hit/miss 결과가 같게)"""
+        return all(isinstance(v, (str, int, float)) or v is None for g in self.groups for v in g[:2])
+
+    def to_json(self) -> Optional[dict]:
+        """업로드 선집계 저장용. B/Title에 JSON으로 못 옮기는 값이 있으면 None (저장하지 않음)."""
+        if not self._json_keys():
+            return None
+        return {
+            "version": PARTIAL_CACHE_VERSION,
+            "month": self.month.strftime("%Y-%m") if self.month else None,
+            "rows": self.rows,
+            "groups": [[b, title, t if type(t) is int else str(t)] for b, title, t in self.groups],
+            "elapsed_ms": self.elapsed_ms,
+        }
+
+    @classmethod
+    def from_json(cls, d: dict) -> Optional["FilePartial"]:
+        """to_json 결과 → FilePartial. 형식 버전이 다르면 (예전 선집계) None → 다시 집계."""
+        if d.get("version") != PARTIAL_CACHE_VERSION:
+            return None
+        groups = [[b, title, parse_amount(t)] for b, title, t in d["groups"]]
+        return cls(_parse_yyyymm(d.get("month")), int(d["rows"]), groups, d.get("elapsed_ms", 0.0))
+
+    def to_columns(self) -> Optional[bytes]:
+        """
+        공유 캐시용 열 단위 직렬화: [헤더 길이(8)][헤더 JSON: month/rows/names/titles/places][total_H int64 배열].
+        total_H는 10^places배 한 정수 (소수 합계도 정확히 복원).
+        int64 범위를 넘거나 B/Title에 JSON으로 못 옮기는 값이 있으면 None (캐시하지 않음).
+        """
+        if not self._json_keys():
+            return None
+        totals = [g[2] for g in self.groups]
+        places = max((-t.as_tuple().exponent for t in totals if type(t) is not int), default=0)
+        places = max(places, 0)
+        scaled = [t * 10 ** places if type(t) is int else int(t.scaleb(places)) for t in totals]
+        if any(not -(2 ** 63) <= t < 2 ** 63 for t in scaled):
+            return None
+        header = json.dumps({
+            "month": self.month.strftime("%Y-%m") if self.month else None,
+            "rows": self.rows,
+            "names": [g[0] for g in self.groups],
+            "titles": [g[1] for g in self.groups],
+            "places": places,
+        }, ensure_ascii=False).encode("utf-8")
+        return struct.pack("<Q", len(header)) + header + np.asarray(scaled, dtype="<i8").tobytes()
+
+    @classmethod
+    def from_columns(cls, buf: memoryview, elapsed_ms: float = 0.0) -> "FilePartial":
+        (n,) = struct.unpack_from("<Q", buf)
+        header = json.loads(bytes(buf[8:8 + n]).decode("utf-8"))
+        totals: List[Amount] = np.frombuffer(buf, dtype="<i8", offset=8 + n).tolist()   # 캐시 페이지를 그대로 읽음
+        places = header["places"]
+        if places:
+            totals = [parse_amount(Decimal(t).scaleb(-places)) for t in totals]
+        groups = [list(g) for g in zip(header["names"], header["titles"], totals)]
+        return cls(_parse_yyyymm(header["month"]), int(header["rows"]), groups, elapsed_ms)
+
+
+def aggregate_bghm_file(
+    file_obj,
+    start_row: int = 7,
+    progress: NullProgress = NULL_PROGRESS,
+    reader: Optional[str] = None,
+) -> FilePartial:
+    """단일 파일 읽기 → 분류 → (B, Title) 합산. progress에 분류한 행 수(rows)/파일 수(files_parsed) 보고."""
+    t0 = time.perf_counter()
+    with span("aicc.read_file", file__size=_source_size(file_obj)) as sp:
+        # 같은 내용의 파일을 이미 집계한 적이 있으면 (다른 워커 포함) 공유 캐시에서 바로 가져옴
+        key = content_key(file_obj, "aicc.partial", PARTIAL_CACHE_VERSION, start_row, get_reader(reader).name)
+        cached = get_cache().get("aicc", key) if key else None
+        if cached is not None:
+            part = FilePartial.from_columns(cached, round((time.perf_counter() - t0) * 1000, 2))
+            progress.add(rows=part.rows, files_parsed=1)
+            sp.set(rows=part.rows, groups=len(part.groups), settlement_month=_ym(part.month), cache="hit")
+            return part
+
+        month, rows = open_bghm(file_obj, start_row=start_row, reader=reader)
+        acc = GroupAccumulator(keep_order=True)
+        n = acc.add_rows(counted(iter_enriched(rows), progress, "rows"))
+        progress.add(files_parsed=1)
+        groups = [[name, title, total] for (name, title), total in acc.acc.items()]
+        sp.set(rows=n, groups=len(groups), settlement_month=_ym(month), cache="miss" if key else None)
+    part = FilePartial(month, n, groups, round((time.perf_counter() - t0) * 1000, 2))
+    if key:
+        data = part.to_columns()
+        if data is not None:
+            get_cache().put("aicc", key, data)
+    return part
+
+
+@traced("aicc.merge_partials")
+def merge_partials(
+    partials: Sequence[FilePartial],
+    strict_same_month: bool = False,
+    keep_order: bool = True,
+) -> AiccAggregate:
+    acc = GroupAccumulator(keep_order=keep_order)
+    for part in partials:
+        for name, title, total in part.groups:
+            key = (name, title)
+            acc.acc[key] = acc.acc.get(key, 0) + total
+    chosen = _choose_month([p.month for p in partials if p.month], strict_same_month)
+    files = [{"rows": p.rows, "month": p.month, "elapsed_ms": p.elapsed_ms} for p in partials]
+    set_attrs(files=len(partials), rows=sum(p.rows for p in partials), groups=len(acc), settlement_month=_ym(chosen))
+    return AiccAggregate(map_grouped_names(acc.result()), chosen, files)
+
+
+@traced("aicc.aggregate")
+def aggregate_bghm_stream(
+    paths_or_files: Sequence[Any],
+    start_row: int = 7,
+    strict_same_month: bool = False,
+    keep_order: bool = True,
+    progress: NullProgress = NULL_PROGRESS,
+    reader: Optional[str] = None,
+    close_sources: bool = False,
+) -> AiccAggregate:
+    """
+    읽기 → Type/Title 분류 → (B, Title) 합산 → 회사명 매핑을 행 단위로 흘려 처리.
+    combine_bghm_from_paths → enrich_bghm_rows → group_sum_by_name_title_H → map_grouped_names
+    와 같은 결과.
+    close_sources=True면 file-like 원본은 파일별 집계가 끝나는 대로 닫음 (업로드 스풀 메모리/임시파일 반환).
+    """
+    progress.stage("parse", "AICC 파일 읽기·분류", files_total=len(paths_or_files), files_parsed=0, rows=0)
+    partials = []
+    for src in _iter_sources(paths_or_files):
+        try:
+            partials.append(aggregate_bghm_file(src, start_row=start_row, progress=progress, reader=reader))
+        finally:
+            if close_sources and hasattr(src, "close"):
+                src.close()
+    return merge_partials(partials, strict_same_month=strict_same_month, keep_order=keep_order)
 
 # =========================
 # Type/Title 생성
@@ -188,15 +401,15 @@ def build_title(g, h, typ: str | None) -> str:
     4) H != 3*G && H < 1,000,000 && IB → 유지수수료
     5) H != 3*G && H < 1,000,000 && 챗봇 → {Type} 유지수수료
     """
-    G = _to_decimal(g)
-    H = _to_decimal(h)
-    EPS = Decimal("0.000001")
+    G = parse_amount(g)
+    H = parse_amount(h)
     type_disp = typ if typ else "미정"
 
-    if (H - (G * 3)).copy_abs() <= EPS:
+    diff = H - G * 3
+    if diff == 0 or (type(diff) is not int and abs(diff) <= AMOUNT_EPS):
         return f"판매위탁 수수료 (A'cen) 보이스봇({type_disp}) 모집수수료"
 
-    if H > Decimal("1000000"):
+    if H > 1_000_000:
         return f"판매위탁 수수료 (A'cen) 보이스봇({type_disp}) 개발비용"
 
     if (typ or "").upper() == "OB":
@@ -208,43 +421,70 @@ def build_title(g, h, typ: str | None) -> str:
 
     return f"판매위탁 수수료 (A'cen) 보이스봇({type_disp}) 기타"
 
-def enrich_bghm_rows(rows: Sequence[Sequence[Any]]) -> List[List[Any]]:
+def iter_enriched(rows: Iterable[Sequence[Any]]) -> Iterator[List[Any]]:
     """
-    [[B,G,H,M]] → [[B,G,H,M,Type,Title]]
+    [B,G,H,M] 행 iterator → [B,G,H,M,Type,Title] 행 iterator
     """
-    out: List[List[Any]] = []
     for r in rows:
         if not r or len(r) < 4:
             continue
         B, G, H, M = r[0], r[1], r[2], r[3]
         typ = infer_type_from_m(M)
         title = build_title(G, H, typ)
-        out.append([B, G, H, M, typ, title])
-    return out
+        yield [B, G, H, M, typ, title]
+
+def enrich_bghm_rows(rows: Sequence[Sequence[Any]]) -> List[List[Any]]:
+    """
+    [[B,G,H,M]] → [[B,G,H,M,Type,Title]]
+    """
+    return list(iter_enriched(rows))
 
 # =========================
 # 그룹핑 & 매핑
 # =========================
-def group_sum_by_name_title_H(rows: Sequence[Sequence[Any]], keep_order: bool = True) -> List[List[Any]]:
+class GroupAccumulator:
+    """
+    (B, Title) 기준 H 누적 합계. 행을 하나씩 받아 바로 더하므로 메모리는 그룹 수에 비례.
+    합계는 정확한 금액으로 누적하고 result()에서 그룹마다 1회 원 단위로 반올림.
+    """
+
+    def __init__(self, keep_order: bool = True):
+        self.acc: dict[Tuple[Any, Any], Amount] = OrderedDict() if keep_order else {}
+
+    def add_rows(self, rows: Iterable[Sequence[Any]]) -> int:
+        """[[B,G,H,M,Type,Title]] 누적. 반환: 받은 행 수"""
+        acc = self.acc
+        n = 0
+        for r in rows:
+            n += 1
+            if not r or len(r) < 6:
+                continue
+            name, H, title = r[0], r[2], r[5]
+            if name is None or title is None:
+                continue
+            key = (name, title)
+            acc[key] = acc.get(key, 0) + parse_amount(H)
+        return n
+
+    def merge(self, other: "GroupAccumulator") -> None:
+        for key, total in other.acc.items():
+            self.acc[key] = self.acc.get(key, 0) + total
+
+    def result(self) -> List[List[Any]]:
+        return [[name, round_won(total), title] for (name, title), total in self.acc.items()]
+
+    def __len__(self) -> int:
+        return len(self.acc)
+
+@traced("aicc.group_sum_by_name_title_H")
+def group_sum_by_name_title_H(rows: Iterable[Sequence[Any]], keep_order: bool = True) -> List[List[Any]]:
     """
     [[B,G,H,M,Type,Title]] → (B,Title) 기준 H 합산
     반환: [[B, total_H, Title]]
     """
-    acc: dict[Tuple[Any, Any], Decimal] = OrderedDict() if keep_order else {}
-    for r in rows:
-        if not r or len(r) < 6:
-            continue
-        name, H, title = r[0], r[2], r[5]
-        if name is None or title is None:
-            continue
-        key = (name, title)
-        acc[key] = acc.get(key, Decimal("0")) + _to_decimal(H)
-
-    out: List[List[Any]] = []
-    for (name, title), total in acc.items():
-        rounded = total.quantize(Decimal("1"), rounding=ROUND_HALF_UP)
-        out.append([name, int(rounded), title])
-    return out
+    acc = GroupAccumulator(keep_order=keep_order)
+    set_attrs(rows=acc.add_rows(rows), groups=len(acc))
+    return acc.result()
 
 NAME_MAP_RULES = [
     ("(주)오토피*", "오토피온"),
@@ -281,14 +521,16 @@ def map_grouped_names(grouped: Sequence[Sequence[Any]]) -> List[List[Any]]:
 # =========================
 # 엑셀 쓰기
 # =========================
+@traced("aicc.write_to_excel")
 def write_to_excel(
     mapped: dict,
     template_path: str | Path,
-    base_dir: str | Path,
+    base_dir: str | Path | Storage,
     *,
     settlement_month: datetime | None = None,
     report_day: int | None = None,
-) -> Path:
+    progress: NullProgress = NULL_PROGRESS,
+) -> StoredFile:
     """
     mapped_grouped: [[회사명, total_H, Title], ...]
     템플릿의 A/C/D/E/K/G 열에 기록 후 "매출결의서_KT AICC_YY.mm.dd.xlsx"로 저장
@@ -302,7 +544,7 @@ def write_to_excel(
         last = monthrange(target.year, target.month)[1]
         report_date = target.replace(day=min(report_day, last))
 
-    wb = load_workbook(template_path)
+    wb = load_template(template_path)
     ws = wb.active
 
      # 요일 포맷
@@ -321,7 +563,8 @@ def write_to_excel(
     yy = (report_date or settlement_month or datetime.now()).strftime("%y")
     ws["D6"] = f"{yy}년 A'CenCloud 사용량 판매위탁 협력사 정산"
 
-    start_row = 11
+    start_row = SLIP_START_ROW
+    prepare_slip_rows(ws, len(mapped), start_row=start_row)  # 업체 수 > 템플릿 행 수면 행 삽입
     seq = 1
 
     for i, row in enumerate(mapped, start=start_row):
@@ -334,15 +577,13 @@ def write_to_excel(
         ws[f"G{i}"] = "-"  # 필요시 제거 가능
         seq += 1
 
-     # === 저장 디렉토리: base_dir/YYYY/MM ===
+     # === 저장 위치: base_dir/YYYY/MM ===
     if base_dir is None:
-        base_dir = template_path.parent
-    year_dir = base_dir / use_date.strftime("%Y") / use_date.strftime("%m")
-    year_dir.mkdir(parents=True, exist_ok=True)
+        base_dir = Path(template_path).parent
 
     today_str = use_date.strftime("%y.%m.%d")
     out_name = f"매출결의서_KT AICC_{today_str}.xlsx"
-    out_path = year_dir / out_name
-
-    wb.save(out_path)
-    return out_path
+    out = get_storage(base_dir).save_workbook(wb, month_key(use_date, out_name))
+    progress.add(workbooks_saved=1)
+    set_attrs(groups=len(mapped), settlement_month=_ym(target), key=out.key)
+    return out
@@ -0,0 +1,169 @@
+# services/atomic.py
+from __future__ import annotations
+import os
+import threading
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt  # type: ignore
+
+LOCK_NAME = ".month.lock"
+PENDING_LOCK_NAME = ".pending.lock"      # 아직 저장소에 반영되지 않은 산출물이 있는 동안 잡힘 (write-behind)
+
+# mkstemp는 0600으로 만들기 때문에 일반 open()과 같은 권한으로 맞춤 (umask는 import 시 1회 조회)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+# =========================
+# 원자적 쓰기 (임시파일 → rename)
+# =========================
+@contextmanager
+def atomic_write(path: Path | str) -> Iterator:
+    """
+    같은 디렉토리의 숨김 임시파일에 쓴 뒤 fsync → os.replace.
+    읽는 쪽(find_latest_file_for_month 등)은 항상 완성된 파일만 보게 됨.
+    임시파일은 '.'으로 시작하고 확장자가 .tmp라 prefix/glob 검색에 걸리지 않음.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{path.name}.", suffix=".tmp", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "wb") as f:
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp, 0o666 & ~_UMASK)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def write_bytes_atomic(path: Path | str, data) -> Path:
+    with atomic_write(path) as f:
+        f.write(data)
+    return Path(path)
+
+
+def save_workbook_atomic(wb, path: Path | str) -> Path:
+    with atomic_write(path) as f:
+        wb.save(f)
+    return Path(path)
+
+
+# =========================
+# 파일 기반 advisory lock (정산월 / 업로드 등)
+# =========================
+# key → [RLock, 보유 횟수, lock 파일 fd]
+_held: Dict[str, list] = {}
+_held_guard = threading.Lock()
+
+
+def _lock_fd(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_LOCK, 1)
+
+
+def _unlock_fd(fd: int) -> None:
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def month_lock_path(base_dir: Path | str, when: datetime, name: str = LOCK_NAME) -> Path:
+    return Path(base_dir) / when.strftime("%Y") / when.strftime("%m") / name
+
+
+@contextmanager
+def path_lock(path: Path | str) -> Iterator[Path]:
+    """
+    lock 파일 하나에 대한 배타 잠금.
+    - 워커 간: lock 파일에 flock
+    - 같은 프로세스 내: 스레드별 RLock, 같은 스레드의 중첩 진입 허용
+    """
+    path = Path(path)
+    key = os.path.abspath(path)
+
+    with _held_guard:
+        entry = _held.setdefault(key, [threading.RLock(), 0, None])
+    rlock = entry[0]
+    rlock.acquire()
+    try:
+        if entry[1] == 0:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                _lock_fd(fd)
+            except BaseException:
+                os.close(fd)
+                raise
+            entry[2] = fd
+        entry[1] += 1
+        try:
+            yield path
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                fd, entry[2] = entry[2], None
+                try:
+                    _unlock_fd(fd)
+                finally:
+                    os.close(fd)
+    finally:
+        rlock.release()
+
+
+def month_lock(base_dir: Path | str, when: Optional[datetime] = None):
+    """
+    base_dir/YYYY/MM 단위 배타 잠금 (gunicorn -w N 에서도 같은 월끼리만 직렬화).
+    """
+    return path_lock(month_lock_path(base_dir, when or datetime.now()))
+
+
+# =========================
+# 스레드에 묶이지 않는 잠금 (잡은 스레드와 푸는 스레드가 다를 때)
+# =========================
+def hold_lock(path: Path | str) -> int:
+    """
+    lock 파일에 배타 flock을 걸고 fd 반환. release_lock(fd)는 다른 스레드에서 해도 됨.
+    flock은 fd(open file description) 단위라 같은 프로세스의 다른 스레드와도 서로 막힘.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd = os.open(str(path), os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        _lock_fd(fd)
+    except BaseException:
+        os.close(fd)
+        raise
+    return fd
+
+
+def release_lock(fd: int) -> None:
+    try:
+        _unlock_fd(fd)
+    finally:
+        os.close(fd)
+
+
+def wait_unlocked(path: Path | str) -> None:
+    """다른 쪽이 hold_lock으로 잡고 있으면 풀릴 때까지 대기 (잠금은 남기지 않음)."""
+    if not Path(path).exists():
+        return                      # 한 번도 잡힌 적 없음 (빈 정산월 폴더를 만들지 않음)
+    release_lock(hold_lock(path))
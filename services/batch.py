@@ -0,0 +1,179 @@
+# services/batch.py
+from __future__ import annotations
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from services.acen import run_acen_pipeline
+from services.aicc import aggregate_bghm_stream, write_to_excel
+from services.output_index import record_outputs
+from services.preflight import PreflightError, sniff_workbook
+from services.progress import NULL_PROGRESS, NullProgress
+from services.storage import StoredFile, get_storage
+from services.sum import build_sum_report
+from services.tracing import set_attrs, traced
+
+# 여러 정산월 ACEN/AICC 파일을 한 번에 처리.
+# 1) 파일별 A2(ACEN)/A4(AICC) 정산월로 묶음
+# 2) 월별 매출결의서(ACEN/AICC)는 서로 독립 → 프로세스 풀에서 병렬 처리
+# 3) 업무실적은 전달 업무실적을 이어받으므로 정산월 오름차순으로 차례대로 작성
+
+# 기본은 CPU 수와 4 중 작은 값 (spawn 프로세스마다 인터프리터+템플릿+워크북 메모리를 따로 씀)
+BATCH_MAX_WORKERS = int(os.environ.get("KT_BATCH_WORKERS") or 0) or min(4, os.cpu_count() or 1)
+
+
+def batch_pool_size(files: Optional[int], max_workers: Optional[int] = None) -> int:
+    """
+    파일 files개 일괄 처리 시 띄울 수 있는 최대 프로세스 수 (정산월 수 ≤ 파일 수).
+    1개면 풀 없이 현재 프로세스 → 0, 파일 수를 모르면(None) 최대 풀 크기.
+    """
+    workers = max_workers or BATCH_MAX_WORKERS
+    if files is not None:
+        workers = min(files, workers)
+    return workers if workers > 1 else 0
+
+
+@dataclass
+class MonthJob:
+    month: datetime                                          # 정산월 (해당 월 1일)
+    acen: Optional[Tuple[str, bytes | str]] = None        # (파일명, bytes 또는 같은 호스트의 파일 경로)
+    aicc: List[Tuple[str, bytes | str]] = field(default_factory=list)
+
+
+@dataclass
+class MonthResult:
+    month: datetime
+    acen_key: Optional[str] = None
+    aicc_key: Optional[str] = None
+    sum_key: Optional[str] = None
+
+
+def _open_source(data: bytes | str):
+    return BytesIO(data) if isinstance(data, (bytes, bytearray)) else open(data, "rb")
+
+
+def plan_batch(items: Sequence[Tuple[str, bytes | str]]) -> List[MonthJob]:
+    """
+    items: [(파일명, bytes 또는 파일 경로), ...] → 정산월 오름차순 MonthJob 목록.
+    경로로 넘기면 프로세스 풀에는 경로만 전달되고 각 프로세스가 자기 정산월 파일만 읽음.
+    형식을 알 수 없는 파일 / 같은 정산월 ACEN 파일 중복은 PreflightError.
+    """
+    jobs: Dict[datetime, MonthJob] = {}
+    problems: List[str] = []
+    for name, data in items:
+        res = sniff_workbook(data if isinstance(data, (bytes, bytearray)) else Path(data), name)
+        if res.errors or res.settlement_month is None:
+            problems.extend(f"{name}: {e}" for e in res.errors or ["정산월을 찾지 못했습니다."])
+            continue
+        job = jobs.setdefault(res.settlement_month, MonthJob(res.settlement_month))
+        if res.kind == "acen":
+            if job.acen is not None:
+                problems.append(f"{res.settlement_month:%Y-%m} ACEN 파일이 여러 개입니다: {job.acen[0]}, {name}")
+                continue
+            job.acen = (name, data)
+        else:
+            job.aicc.append((name, data))
+    if problems:
+        raise PreflightError(problems)
+    return [jobs[m] for m in sorted(jobs)]
+
+
+def run_month_slips(
+    job: MonthJob,
+    base_dir: str,
+    acen_template: str,
+    aicc_template: str,
+    report_day: Optional[int] = None,
+) -> MonthResult:
+    """
+    한 정산월의 ACEN/AICC 매출결의서 작성 (업무실적 제외).
+    프로세스 풀에서 돌기 때문에 인자/반환값은 pickle 가능한 값만 사용 (저장소는 경로/URL로 전달).
+    """
+    storage = get_storage(base_dir)
+    out = MonthResult(job.month)
+    if job.acen is not None:
+        with _open_source(job.acen[1]) as f:
+            out.acen_key = run_acen_pipeline(
+                file_like=f,
+                template_path=acen_template,
+                base_dir=storage,
+                report_day=report_day,
+            ).key
+    if job.aicc:
+        agg = aggregate_bghm_stream(
+            [_open_source(data) for _, data in job.aicc], start_row=7, strict_same_month=True, close_sources=True,
+        )
+        with storage.lock(job.month):
+            out.aicc_key = write_to_excel(
+                agg.mapped,
+                aicc_template,
+                base_dir=storage,
+                settlement_month=agg.settlement_month,
+                report_day=report_day,
+            ).key
+    return out
+
+
+@traced("batch.run")
+def run_batch(
+    jobs: Sequence[MonthJob],
+    base_dir: str | Path,
+    *,
+    acen_template: str | Path,
+    aicc_template: str | Path,
+    sum_template: str | Path,
+    report_day: Optional[int] = None,
+    max_workers: Optional[int] = None,
+    progress: NullProgress = NULL_PROGRESS,
+) -> List[StoredFile]:
+    """
+    base_dir: 산출물 저장소 경로 또는 's3://...' (자식 프로세스에서 get_storage로 다시 엶)
+    반환: 정산월 순서대로 [ACEN, AICC, 업무실적, ...] 산출물
+    """
+    storage = get_storage(base_dir)
+    args = (str(base_dir), str(acen_template), str(aicc_template), report_day)
+    workers = min(len(jobs), max_workers or BATCH_MAX_WORKERS)
+    set_attrs(months=len(jobs), workers=workers)
+
+    # 1) 월별 매출결의서 (독립) — 월이 하나면 프로세스를 띄우지 않음
+    progress.stage("slips", "정산월별 매출결의서 작성", months_total=len(jobs), months_done=0)
+    results: Dict[datetime, MonthResult] = {}
+    if workers <= 1:
+        for job in jobs:
+            results[job.month] = run_month_slips(job, *args)
+            progress.add(months_done=1)
+    else:
+        # gunicorn 스레드 워커 안에서 fork하지 않도록 spawn 사용
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as ex:
+            futures = [ex.submit(run_month_slips, job, *args) for job in jobs]
+            for fut in as_completed(futures):
+                res = fut.result()
+                results[res.month] = res
+                progress.add(months_done=1)
+
+    # 2) 업무실적: 전달 업무실적을 기반으로 하므로 정산월 오름차순
+    progress.stage("sum", "업무실적 작성 (정산월 순서)", sums_done=0)
+    outputs: List[StoredFile] = []
+    for job in jobs:
+        res = results[job.month]
+        aicc_file = StoredFile(storage, res.aicc_key) if res.aicc_key else None
+        with storage.lock(job.month):
+            sum_out = build_sum_report(
+                storage,
+                job.month,
+                sum_template,
+                aicc_file=aicc_file,
+                settlement_month=job.month,
+                report_day=report_day,
+            )
+        progress.add(sums_done=1)
+        month_outputs = [StoredFile(storage, k) for k in (res.acen_key, res.aicc_key) if k] + [sum_out]
+        record_outputs(storage, [info for info in (f.stat() for f in month_outputs) if info is not None])
+        outputs.extend(month_outputs)
+    return outputs
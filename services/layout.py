@@ -0,0 +1,246 @@
+# services/layout.py
+from __future__ import annotations
+import re
+from copy import copy
+from typing import Dict, Optional, Sequence, Tuple
+from weakref import WeakKeyDictionary
+
+from openpyxl.utils import column_index_from_string, get_column_letter
+from openpyxl.worksheet.cell_range import CellRange
+
+# 표 하단(합계/소계/총계) 행 판별
+TOTAL_MARKER = re.compile(r"^\s*(합\s*계|소\s*계|총\s*계)\s*$")
+
+# 매출결의서 / 업무실적 템플릿 기본 레이아웃 (footer가 없는 템플릿일 때의 fallback)
+SLIP_START_ROW = 11
+SLIP_DEFAULT_END = 25
+SLIP_MARKER_COLS = ("A", "B", "C", "D")
+
+SUM_START_ROW = 5
+SUM_DEFAULT_END = 24
+SUM_MARKER_COLS = ("A", "B")
+
+# ws → {(start_row, end_row, name_col): RowIndex}  (워크북 단위로 1회만 빌드)
+_INDEX_CACHE: "WeakKeyDictionary" = WeakKeyDictionary()
+
+# 수식 내 셀 참조: A1 / $A$1 / A1:B2 (+ 시트 접두사 Sheet2!A1 / 'My Sheet'!A1)
+# 문자열 리터럴("...")은 통째로 매치해서 안의 글자는 참조로 보지 않음
+_REF_RE = re.compile(
+    r'(?P<str>"(?:[^"]|"")*")'
+    r"|(?P<sheet>(?:'(?:[^']|'')+'|[^\W\d][\w.]*)!)?"
+    r"(?<![A-Za-z_\d])(\$?[A-Z]{1,3})(\$?)(\d+)(?::(\$?[A-Z]{1,3})(\$?)(\d+))?(?![\d(])"
+)
+
+
+# =========================
+# 영역 탐색
+# =========================
+def find_footer_row(ws, start_row: int, marker_cols: Sequence[str] = SLIP_MARKER_COLS) -> Optional[int]:
+    """
+    start_row 아래에서 '합계/소계/총계' 문구가 있는 첫 행 번호. 없으면 None.
+    read_only 워크시트에서도 동작하도록 iter_rows(values_only)만 사용.
+    """
+    idx = [column_index_from_string(c) for c in marker_cols]
+    min_col, max_col = min(idx), max(idx)
+    for r, row in enumerate(
+        ws.iter_rows(min_row=start_row, min_col=min_col, max_col=max_col, values_only=True),
+        start=start_row,
+    ):
+        for i in idx:
+            v = row[i - min_col] if i - min_col < len(row) else None
+            if isinstance(v, str) and TOTAL_MARKER.match(v):
+                return r
+    return None
+
+
+def find_table_end(
+    ws,
+    start_row: int,
+    default_end: int,
+    marker_cols: Sequence[str] = SLIP_MARKER_COLS,
+) -> int:
+    """
+    데이터 영역 마지막 행.
+    - footer(합계 행)가 있으면 그 바로 윗 행
+    - 없으면 default_end와 시트 최대 행 중 큰 값 (read_only에서 max_row를 모르면 default_end)
+    """
+    footer = find_footer_row(ws, start_row, marker_cols)
+    if footer is not None:
+        return footer - 1
+    return max(default_end, ws.max_row or 0)
+
+
+# =========================
+# 회사명 → 행 인덱스
+# =========================
+class RowIndex:
+    """
+    name_col[start_row:end_row]의 회사명(공백 트림) → 엑셀 행번호.
+    같은 이름이 여러 번 나오면 마지막 행 (기존 _build_name_row_map과 동일).
+    """
+
+    def __init__(self, ws, start_row: int, end_row: int, name_col: str = "B"):
+        self.start_row = start_row
+        self.end_row = end_row
+        self.name_col = name_col
+        self.rows: Dict[str, int] = {}
+        col = column_index_from_string(name_col)
+        for r, (v,) in enumerate(
+            ws.iter_rows(min_row=start_row, max_row=end_row, min_col=col, max_col=col, values_only=True),
+            start=start_row,
+        ):
+            if v is None:
+                continue
+            key = str(v).strip()
+            if key:
+                self.rows[key] = r
+
+    def get(self, name) -> Optional[int]:
+        return self.rows.get(str(name).strip())
+
+    def __contains__(self, name) -> bool:
+        return self.get(name) is not None
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+def row_index(
+    ws,
+    start_row: int = SUM_START_ROW,
+    end_row: Optional[int] = None,
+    name_col: str = "B",
+    default_end: int = SUM_DEFAULT_END,
+    marker_cols: Sequence[str] = SUM_MARKER_COLS,
+) -> RowIndex:
+    """
+    워크시트별 RowIndex 캐시. end_row가 없으면 템플릿에서 영역을 탐색.
+    행 삽입(ensure_capacity) 시 캐시는 무효화됨.
+    """
+    if end_row is None:
+        end_row = find_table_end(ws, start_row, default_end, marker_cols)
+    per_ws = _INDEX_CACHE.setdefault(ws, {})
+    key = (start_row, end_row, name_col)
+    idx = per_ws.get(key)
+    if idx is None:
+        idx = per_ws[key] = RowIndex(ws, start_row, end_row, name_col)
+    return idx
+
+
+def invalidate(ws) -> None:
+    _INDEX_CACHE.pop(ws, None)
+
+
+# =========================
+# 행 자동 확장
+# =========================
+def _sheet_name(prefix: str) -> str:
+    """'My Sheet'! / Sheet2! → 시트 이름"""
+    name = prefix[:-1]
+    if name.startswith("'"):
+        name = name[1:-1].replace("''", "'")
+    return name
+
+
+def _shift_formula(formula: str, at: int, n: int, grow_end: int, sheet: Optional[str] = None) -> str:
+    """
+    at 행 이상을 가리키는 참조는 n만큼 내리고,
+    grow_end(=기존 데이터 마지막 행)에서 끝나는 범위(SUM(K11:K25) 등)는 삽입 행까지 늘림.
+    문자열 리터럴과 다른 시트 참조(sheet가 아닌 시트 접두사, sheet=None이면 접두사가 있는 모든 참조)는 그대로 둠.
+    """
+    def _row(r: int, is_range_end: bool) -> int:
+        if r >= at or (is_range_end and r == grow_end):
+            return r + n
+        return r
+
+    def _sub(m: re.Match) -> str:
+        literal, prefix, c1, d1, r1, c2, d2, r2 = m.groups()
+        if literal is not None:
+            return literal
+        if prefix is not None and (sheet is None or _sheet_name(prefix).lower() != sheet.lower()):
+            return m.group(0)
+        prefix = prefix or ""
+        if c2 is None:
+            return f"{prefix}{c1}{d1}{_row(int(r1), False)}"
+        return f"{prefix}{c1}{d1}{_row(int(r1), False)}:{c2}{d2}{_row(int(r2), True)}"
+
+    return _REF_RE.sub(_sub, formula)
+
+
+def ensure_capacity(ws, start_row: int, end_row: int, needed: int) -> int:
+    """
+    데이터 영역 [start_row, end_row]에 needed 행이 들어가도록 end_row 아래에 행을 삽입.
+    - 마지막 데이터 행의 서식/높이/병합을 새 행에 복제
+    - 아래쪽 병합 영역과 수식 참조(합계 SUM 범위 포함)를 함께 이동
+    반환: 새 end_row
+    """
+    extra = needed - (end_row - start_row + 1)
+    if extra <= 0:
+        return end_row
+    at = end_row + 1
+
+    # 1) 삽입 지점 아래(또는 걸친) 병합 영역은 풀었다가 이동 후 다시 병합
+    moved: list[Tuple[int, int, int, int]] = []
+    row_merges: list[Tuple[int, int]] = []
+    for mcr in list(ws.merged_cells.ranges):
+        if mcr.min_row == mcr.max_row == end_row:
+            row_merges.append((mcr.min_col, mcr.max_col))
+        if mcr.max_row >= at:
+            b = (mcr.min_col, mcr.min_row, mcr.max_col, mcr.max_row)
+            ws.unmerge_cells(str(mcr))
+            moved.append(b)
+
+    # 2) 행 높이는 insert_rows가 옮기지 않으므로 직접 이동
+    dims = ws.row_dimensions
+    for r in sorted((r for r in list(dims.keys()) if r >= at), reverse=True):
+        d = dims[r]
+        dims[r + extra].height = d.height
+        d.height = None
+    tpl_height = dims[end_row].height if end_row in dims else None
+
+    ws.insert_rows(at, extra)
+
+    # 3) 수식 참조 이동
+    for row in ws.iter_rows():
+        for cell in row:
+            v = cell.value
+            if isinstance(v, str) and v.startswith("="):
+                cell.value = _shift_formula(v, at, extra, end_row, ws.title)
+
+    # 4) 병합 복원 (+ 데이터 행 병합 복제)
+    for min_col, min_row, max_col, max_row in moved:
+        rng = CellRange(min_col=min_col, min_row=min_row, max_col=max_col, max_row=max_row)
+        if min_row >= at:
+            rng.shift(row_shift=extra)
+        else:
+            rng.expand(down=extra)
+        ws.merge_cells(rng.coord)
+
+    # 5) 서식 복제
+    max_col = ws.max_column
+    for r in range(at, at + extra):
+        for c in range(1, max_col + 1):
+            src = ws.cell(row=end_row, column=c)
+            if src.has_style:
+                dst = ws.cell(row=r, column=c)
+                dst._style = copy(src._style)
+        if tpl_height is not None:
+            dims[r].height = tpl_height
+        for min_col, max_col_ in row_merges:
+            ws.merge_cells(f"{get_column_letter(min_col)}{r}:{get_column_letter(max_col_)}{r}")
+
+    invalidate(ws)
+    return end_row + extra
+
+
+def prepare_slip_rows(ws, needed: int, start_row: int = SLIP_START_ROW) -> int:
+    """
+    매출결의서 본문(start_row~합계 직전)에 needed 행을 쓸 수 있게 확보.
+    반환: 데이터 영역 마지막 행
+    """
+    end_row = find_table_end(ws, start_row, SLIP_DEFAULT_END, SLIP_MARKER_COLS)
+    footer = find_footer_row(ws, start_row, SLIP_MARKER_COLS)
+    if footer is None:
+        # 합계 행이 없는 템플릿은 아래로 그냥 써도 덮어쓸 것이 없음
+        return max(end_row, start_row + needed - 1)
+    return ensure_capacity(ws, start_row, end_row, needed)
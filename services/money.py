@@ -0,0 +1,169 @@
+# services/money.py
+from __future__ import annotations
+import re
+from datetime import date, datetime, time
+from decimal import Decimal, InvalidOperation, ROUND_HALF_EVEN, ROUND_HALF_UP
+from typing import Any, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+# 원본 금액은 반올림하지 않고 정확한 값(Amount)으로 수집: 원 단위로 떨어지면 int, 소수가 있으면 Decimal.
+# 분류(비교)·합산까지 정확한 값으로 하고, 원 단위 반올림(ROUND_HALF_UP, 0에서 먼 쪽)은 합계마다 1회 (round_won).
+# 대부분의 원본은 정수 금액이라 int 연산 fast path를 탐.
+Won = int
+Amount = Union[int, Decimal]
+AMOUNT_EPS = Decimal("0.000001")        # 금액 일치 비교 허용 오차 (H == 3G 등)
+
+_INT_RE = re.compile(r"^[+-]?\d+$")
+_DATE_TYPES = (datetime, date, time)    # 날짜 서식 셀: 금액 아님 (기존처럼 0 / 건너뜀)
+
+
+# =========================
+# 스칼라
+# =========================
+def _won_from_decimal(d: Decimal) -> int:
+    return int(d.quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def _exact(d: Decimal) -> Amount:
+    return int(d) if d == d.to_integral_value() else d
+
+
+def try_parse_amount(val: Any) -> Optional[Amount]:
+    """
+    셀 값 → 정확한 금액 (반올림 없음). 원 단위 값은 int, 소수가 있으면 Decimal.
+    비어있거나(None/"") 숫자로 해석할 수 없으면(날짜/시각 셀 포함) None.
+    """
+    if val is None or isinstance(val, (bool, *_DATE_TYPES)):
+        return None
+    if isinstance(val, (int, np.integer)):
+        return int(val)
+    if isinstance(val, (float, np.floating)):
+        if val != val or val in (float("inf"), float("-inf")):
+            return None
+        if float(val).is_integer():
+            return int(val)
+        return Decimal(repr(float(val)))
+    if isinstance(val, Decimal):
+        return _exact(val) if val.is_finite() else None
+    s = str(val).replace(",", "").strip()
+    if not s:
+        return None
+    if _INT_RE.match(s):
+        return int(s)
+    try:
+        d = Decimal(s)
+    except InvalidOperation:
+        return None
+    return _exact(d) if d.is_finite() else None
+
+
+def parse_amount(val: Any) -> Amount:
+    """셀 값 → 정확한 금액. 빈 값/날짜 셀은 0, 해석 불가한 문자열은 ValueError."""
+    if type(val) is int:
+        return val  # 수집 이후 단계의 fast path
+    if val is None or isinstance(val, _DATE_TYPES) or (isinstance(val, str) and not val.strip()):
+        return 0
+    a = try_parse_amount(val)
+    if a is None:
+        raise ValueError(f"금액으로 해석할 수 없는 값: {val!r}")
+    return a
+
+
+def round_won(amount: Amount) -> int:
+    """정확한 금액(합계) → 원 단위 int (ROUND_HALF_UP)"""
+    if type(amount) is int:
+        return amount
+    return _won_from_decimal(Decimal(amount))
+
+
+def try_parse_won(val: Any) -> Optional[int]:
+    """
+    셀 값 → 원 단위 int (소수는 반올림). 비어있거나(None/"") 숫자로 해석할 수 없으면 None.
+    """
+    a = try_parse_amount(val)
+    return None if a is None else round_won(a)
+
+
+def parse_won(val: Any) -> int:
+    """
+    셀 값 → 원 단위 int. 빈 값/날짜 셀은 0, 해석 불가한 문자열은 ValueError.
+    """
+    if isinstance(val, int) and not isinstance(val, bool):
+        return val  # 수집 이후 단계의 fast path
+    if val is None or isinstance(val, _DATE_TYPES) or (isinstance(val, str) and not val.strip()):
+        return 0
+    w = try_parse_won(val)
+    if w is None:
+        raise ValueError(f"금액으로 해석할 수 없는 값: {val!r}")
+    return w
+
+
+# =========================
+# 벌크 (수집 단계)
+# =========================
+_EXACT_FLOAT = 2 ** 53                  # 이 미만의 정수값 float는 int로 정확히 바뀜
+
+
+def try_parse_amounts(values: Sequence[Any]) -> List[Optional[Amount]]:
+    """
+    셀 값 목록 → 정확한 금액 목록 (해석 불가는 None).
+    전부 정수 금액인 숫자 열은 벡터 연산으로 한 번에 변환하고, 소수/문자열이 섞이면 값 단위로 처리.
+    """
+    n = len(values)
+    try:
+        f = np.asarray(values, dtype=np.float64)
+    except (TypeError, ValueError):
+        f = None
+    if f is not None and f.shape == (n,) and bool(np.all(np.isfinite(f))) \
+            and bool(np.all(np.abs(f) < _EXACT_FLOAT)) and bool(np.all(f == np.floor(f))):
+        return f.astype(np.int64).tolist()
+    return [try_parse_amount(v) for v in values]
+
+
+def parse_amounts(values: Sequence[Any]) -> List[Amount]:
+    """이미 걸러진 금액 열 → 정확한 금액 목록 (날짜 셀은 0). 해석 불가 값이 있으면 ValueError."""
+    out = try_parse_amounts(values)
+    for i, (v, a) in enumerate(zip(values, out)):
+        if a is None:
+            if not isinstance(v, _DATE_TYPES):
+                raise ValueError(f"금액으로 해석할 수 없는 값: {v!r}")
+            out[i] = 0
+    return out
+
+
+# =========================
+# 공급가/부가세 분리
+# =========================
+def split_vat_won(gross: Sequence[Any]) -> Tuple[List[int], List[int]]:
+    """
+    총액(부가세 포함, 정확한 금액) 목록 → (공급가, 부가세) 원 단위 목록. 정수 연산만 사용.
+    - 각 행 공급가 = floor(g * 10 / 11)
+    - 전체 공급가 합이 round(Σg * 10 / 11)(ROUND_HALF_EVEN)이 되도록 나머지가 큰 행부터 1원씩 배분
+    - 소수 금액은 10^k배 한 정수로 계산 (k = 가장 긴 소수 자릿수)
+    """
+    amounts = [parse_amount(g) for g in gross]
+    if not amounts:
+        return [], []
+    k = max((-a.as_tuple().exponent for a in amounts if type(a) is not int), default=0)
+    k = max(k, 0)
+    scale = 10 ** k
+    scaled = [a * scale if type(a) is int else int(a.scaleb(k)) for a in amounts]
+    den = 11 * scale
+    supply, residues = [], []
+    for g in scaled:
+        q, r = divmod(g * 10, den)
+        supply.append(q)
+        residues.append(r)
+
+    q, r = divmod(sum(scaled) * 10, den)
+    target = q + (1 if 2 * r > den or (2 * r == den and q % 2) else 0)    # 기존 round()와 같은 ROUND_HALF_EVEN
+    need = target - sum(supply)
+    if need > 0:
+        order = sorted(range(len(residues)), key=lambda i: -residues[i])   # 안정 정렬 → 같은 나머지는 앞 행 먼저
+        for i in order[:need]:
+            supply[i] += 1
+
+    vat = [(a if type(a) is int else int(a.to_integral_value(rounding=ROUND_HALF_EVEN))) - s
+           for a, s in zip(amounts, supply)]
+    return supply, vat
@@ -0,0 +1,113 @@
+# services/output_index.py
+from __future__ import annotations
+import json
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from services.atomic import path_lock
+from services.storage import ObjectInfo, Storage, month_prefix
+
+# 정산월 폴더별 산출물 목록: YYYY/MM/.index.json
+# - 숨김 파일이라 Storage.list / find_latest_file_for_month 에는 걸리지 않음
+# - 같은 정산월 갱신은 .index.lock 으로 직렬화 (읽기 → 병합 → 전체 다시 쓰기)
+
+INDEX_NAME = ".index.json"
+INDEX_LOCK_NAME = ".index.lock"
+
+# 파일명 접두어 → 종류
+OUTPUT_KINDS = {
+    "acen": "매출결의서_KT ACen",
+    "aicc": "매출결의서_KT AICC",
+    "sum": "업무실적_",
+}
+
+
+def output_kind(name: str) -> Optional[str]:
+    for kind, prefix in OUTPUT_KINDS.items():
+        if name.startswith(prefix):
+            return kind
+    return None
+
+
+def key_month(key: str) -> Optional[datetime]:
+    """'YYYY/MM/파일명' → 해당 월 1일"""
+    parts = key.split("/")
+    if len(parts) < 3:
+        return None
+    try:
+        return datetime(int(parts[0]), int(parts[1]), 1)
+    except ValueError:
+        return None
+
+
+def report_months(storage: Storage) -> List[datetime]:
+    """산출물 폴더(YYYY/MM)가 있는 정산월 목록, 최신 월부터."""
+    out = []
+    for y in storage.subdirs(""):
+        if not (len(y) == 4 and y.isdigit()):
+            continue
+        for m in storage.subdirs(y + "/"):
+            if len(m) == 2 and m.isdigit() and 1 <= int(m) <= 12:
+                out.append(datetime(int(y), int(m), 1))
+    return sorted(out, reverse=True)
+
+
+def list_reports(storage: Storage, months: Sequence[datetime], kind: Optional[str] = None) -> List[dict]:
+    """
+    정산월별 산출물 목록 (저장소 기준, 인덱스가 없던 예전 산출물 포함). 최신 월 → 파일명 순.
+    kind: 'acen' | 'aicc' | 'sum' | None(전체)
+    """
+    out = []
+    for when in sorted(set(months), reverse=True):
+        for info in sorted(storage.list(month_prefix(when)), key=lambda o: o.key):
+            name = info.key.rsplit("/", 1)[-1]
+            k = output_kind(name)
+            if k is None or (kind is not None and k != kind):
+                continue
+            out.append({
+                "key": info.key,
+                "name": name,
+                "kind": k,
+                "month": f"{when:%Y-%m}",
+                "size": info.size,
+                "mtime": info.mtime,
+                "etag": info.etag,
+            })
+    return out
+
+
+def read_index(storage: Storage, when: datetime) -> List[dict]:
+    key = month_prefix(when) + INDEX_NAME
+    if not storage.exists(key):
+        return []
+    try:
+        return json.loads(storage.read_bytes(key).decode("utf-8"))
+    except ValueError:
+        return []          # 깨진 인덱스는 다음 기록 때 새로 씀
+
+
+def record_outputs(storage: Storage, infos: Sequence[ObjectInfo]) -> None:
+    """저장이 끝난 산출물(stat 결과)을 정산월별 인덱스에 기록. 같은 키는 최신 값으로 교체."""
+    by_month: Dict[datetime, List[ObjectInfo]] = {}
+    for info in infos:
+        when = key_month(info.key)
+        if when is not None:
+            by_month.setdefault(when, []).append(info)
+
+    for when, items in by_month.items():
+        with path_lock(storage.lock_path(when, INDEX_LOCK_NAME)):
+            entries = {e["key"]: e for e in read_index(storage, when)}
+            for info in items:
+                name = info.key.rsplit("/", 1)[-1]
+                entries[info.key] = {
+                    "key": info.key,
+                    "name": name,
+                    "kind": output_kind(name),
+                    "size": info.size,
+                    "mtime": info.mtime,
+                    "etag": info.etag,
+                    "recorded": time.time(),
+                }
+            body = json.dumps(sorted(entries.values(), key=lambda e: e["key"]), ensure_ascii=False, indent=0)
+            storage.write_bytes(month_prefix(when) + INDEX_NAME, body.encode("utf-8"))
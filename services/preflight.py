@@ -0,0 +1,270 @@
+# services/preflight.py
+from __future__ import annotations
+import posixpath
+import time
+import zipfile
+from dataclasses import dataclass, field
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from typing import IO, Dict, List, Optional, Sequence, Tuple
+from xml.etree.ElementTree import iterparse
+
+from dateutil.relativedelta import relativedelta
+from openpyxl.utils import column_index_from_string
+from openpyxl.utils.cell import coordinate_from_string, range_boundaries
+from openpyxl.styles.numbers import BUILTIN_FORMATS, is_date_format
+from openpyxl.utils.datetime import from_excel
+
+from services.aicc import _parse_yyyymm
+
+# 본 파이프라인 전에 워크북 '머리'만 읽어 형식/정산월을 검사.
+# openpyxl은 read_only여도 sharedStrings 전체를 읽으므로 zip + iterparse로 직접 읽음.
+
+SNIFF_ROWS = 8                                   # A2(ACEN) / A4(AICC) / AICC 본문 첫 행(7) 포함
+ACEN_MIN_COL = column_index_from_string("BI")    # P(업체) / BI(금액)
+AICC_MIN_COL = column_index_from_string("M")     # B/G/H/M
+
+_NS_MAIN = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_NS_REL = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_NS_PKG_REL = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+
+BUILTIN_DATE_FORMATS = {i for i, fmt in BUILTIN_FORMATS.items() if is_date_format(fmt)}
+
+
+class PreflightError(ValueError):
+    """업로드 파일이 형식/정산월 검사를 통과하지 못함. problems에 파일별 사유."""
+
+    def __init__(self, problems: Sequence[str]):
+        self.problems = list(problems)
+        super().__init__(" / ".join(self.problems))
+
+
+@dataclass
+class SniffResult:
+    filename: str
+    size: int
+    kind: Optional[str] = None                   # "acen" | "aicc" | None
+    month: Optional[datetime] = None             # 원본 셀(A2/A4) 기준 월
+    settlement_month: Optional[datetime] = None  # 파이프라인이 쓰는 정산월
+    sheet_names: List[str] = field(default_factory=list)
+    max_row: int = 0
+    max_col: int = 0
+    cells: Dict[str, object] = field(default_factory=dict)
+    errors: List[str] = field(default_factory=list)
+    elapsed_ms: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "filename": self.filename,
+            "size": self.size,
+            "kind": self.kind,
+            "month": self.month.strftime("%Y-%m") if self.month else None,
+            "settlement_month": self.settlement_month.strftime("%Y-%m") if self.settlement_month else None,
+            "sheets": self.sheet_names,
+            "max_row": self.max_row,
+            "max_col": self.max_col,
+            "errors": self.errors,
+            "elapsed_ms": round(self.elapsed_ms, 2),
+        }
+
+
+# =========================
+# xlsx 머리 읽기
+# =========================
+def _first_sheet_part(zf: zipfile.ZipFile) -> Tuple[List[str], str]:
+    with zf.open("xl/workbook.xml") as f:
+        sheets = [(el.get("name"), el.get(f"{_NS_REL}id"))
+                  for _, el in iterparse(f) if el.tag == f"{_NS_MAIN}sheet"]
+    if not sheets:
+        raise ValueError("시트가 없습니다.")
+    with zf.open("xl/_rels/workbook.xml.rels") as f:
+        targets = {el.get("Id"): el.get("Target")
+                   for _, el in iterparse(f) if el.tag == f"{_NS_PKG_REL}Relationship"}
+    target = targets[sheets[0][1]]
+    part = target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
+    return [name for name, _ in sheets], part
+
+
+def _read_head(zf: zipfile.ZipFile, part: str, max_rows: int):
+    """(dimension 최대 행/열, {주소: (type, raw, style)}, 실제로 본 최대 열)"""
+    dim_row = dim_col = seen_col = 0
+    raw: Dict[str, Tuple[Optional[str], str, int]] = {}
+    with zf.open(part) as f:
+        for _, el in iterparse(f):
+            tag = el.tag
+            if tag == f"{_NS_MAIN}dimension":
+                try:
+                    _, _, c2, r2 = range_boundaries(el.get("ref", ""))
+                    dim_row, dim_col = r2 or 0, c2 or 0
+                except (ValueError, TypeError):
+                    pass
+            elif tag == f"{_NS_MAIN}c":
+                addr = el.get("r")
+                if addr:
+                    t = el.get("t")
+                    if t == "inlineStr":
+                        v = "".join(x.text or "" for x in el.iter(f"{_NS_MAIN}t"))
+                    else:
+                        v_el = el.find(f"{_NS_MAIN}v")
+                        v = v_el.text if v_el is not None else None
+                    if v is not None:
+                        raw[addr] = (t, v, int(el.get("s", 0)))
+                        col, _ = coordinate_from_string(addr)
+                        seen_col = max(seen_col, column_index_from_string(col))
+            elif tag == f"{_NS_MAIN}row":
+                if int(el.get("r", 0)) >= max_rows:
+                    break
+                el.clear()
+    return dim_row, dim_col, raw, seen_col
+
+
+def _shared_strings(zf: zipfile.ZipFile, wanted: set) -> Dict[int, str]:
+    """필요한 인덱스까지만 sharedStrings를 읽음."""
+    out: Dict[int, str] = {}
+    if not wanted or "xl/sharedStrings.xml" not in zf.namelist():
+        return out
+    last = max(wanted)
+    idx = 0
+    with zf.open("xl/sharedStrings.xml") as f:
+        for _, el in iterparse(f):
+            if el.tag == f"{_NS_MAIN}si":
+                if idx in wanted:
+                    out[idx] = "".join(x.text or "" for x in el.iter(f"{_NS_MAIN}t"))
+                idx += 1
+                el.clear()
+                if idx > last:
+                    break
+    return out
+
+
+def _date_styles(zf: zipfile.ZipFile) -> set:
+    """날짜 서식인 cellXfs 인덱스 집합."""
+    if "xl/styles.xml" not in zf.namelist():
+        return set()
+    custom: Dict[int, str] = {}
+    out = set()
+    with zf.open("xl/styles.xml") as f:
+        in_xfs = False
+        xf_idx = 0
+        for ev, el in iterparse(f, events=("start", "end")):
+            if el.tag == f"{_NS_MAIN}numFmt" and ev == "end":
+                custom[int(el.get("numFmtId", 0))] = el.get("formatCode", "")
+            elif el.tag == f"{_NS_MAIN}cellXfs":
+                in_xfs = ev == "start"
+            elif el.tag == f"{_NS_MAIN}xf" and in_xfs and ev == "end":
+                fid = int(el.get("numFmtId", 0))
+                if fid in BUILTIN_DATE_FORMATS or (fid in custom and is_date_format(custom[fid])):
+                    out.add(xf_idx)
+                xf_idx += 1
+    return out
+
+
+def _cell_value(t: Optional[str], v: str, strings: Dict[int, str], is_date: bool = False):
+    if t == "s":
+        return strings.get(int(v))
+    if t in ("str", "inlineStr", "e"):
+        return v
+    if t == "b":
+        return v == "1"
+    try:
+        f = float(v)
+    except ValueError:
+        return v
+    if is_date:
+        try:
+            return from_excel(f)
+        except (ValueError, OverflowError):
+            pass
+    return int(f) if f.is_integer() else f
+
+
+# =========================
+# 판별
+# =========================
+def sniff_workbook(data: bytes | Path | IO[bytes], filename: str = "", max_rows: int = SNIFF_ROWS) -> SniffResult:
+    """data: 업로드 bytes / 디스크상의 파일 경로 / seek 가능한 file-like (검사 후 처음 위치로 되돌림)"""
+    t0 = time.perf_counter()
+    pos = None
+    if isinstance(data, (bytes, bytearray)):
+        src, size = BytesIO(data), len(data)
+    elif hasattr(data, "read"):
+        src, pos = data, data.tell()
+        size = data.seek(0, 2) - pos
+        data.seek(pos)
+    else:
+        src, size = str(data), Path(data).stat().st_size
+    res = SniffResult(filename=filename, size=size)
+    try:
+        with zipfile.ZipFile(src) as zf:
+            res.sheet_names, part = _first_sheet_part(zf)
+            dim_row, dim_col, raw, seen_col = _read_head(zf, part, max_rows)
+            strings = _shared_strings(zf, {int(v) for t, v, _ in raw.values() if t == "s"})
+            date_xfs = _date_styles(zf) if any(t in (None, "n") for t, _, _ in raw.values()) else set()
+    except (zipfile.BadZipFile, KeyError, ValueError, SyntaxError) as e:
+        res.errors.append(f"엑셀(xlsx) 파일을 읽을 수 없습니다: {e}")
+        res.elapsed_ms = (time.perf_counter() - t0) * 1000
+        return res
+    finally:
+        if pos is not None:
+            data.seek(pos)
+
+    res.cells = {addr: _cell_value(t, v, strings, st in date_xfs) for addr, (t, v, st) in raw.items()}
+    res.max_row = dim_row
+    res.max_col = max(dim_col, seen_col)
+
+    a2 = _parse_yyyymm(res.cells.get("A2"))
+    a4 = _parse_yyyymm(res.cells.get("A4"))
+    if a2 and res.max_col >= ACEN_MIN_COL:
+        res.kind = "acen"
+        res.month = a2
+        res.settlement_month = a2 + relativedelta(months=1)   # run_acen_pipeline과 동일 (A2 + 1개월)
+    elif a4 and res.max_col >= AICC_MIN_COL:
+        res.kind = "aicc"
+        res.month = res.settlement_month = a4
+    elif a2 or a4:
+        need = "P/BI" if a2 else "B/G/H/M"
+        res.errors.append(f"{need} 열이 없습니다 (마지막 열: {res.max_col}).")
+    else:
+        res.errors.append("A2(ACEN) / A4(AICC)에서 정산월을 찾지 못했습니다.")
+
+    res.elapsed_ms = (time.perf_counter() - t0) * 1000
+    return res
+
+
+def _kind_label(kind: Optional[str]) -> str:
+    return {"acen": "ACEN", "aicc": "AICC"}.get(kind or "", "알 수 없는 형식")
+
+
+def preflight_acen(data: bytes | Path, filename: str = "") -> SniffResult:
+    res = sniff_workbook(data, filename)
+    if res.errors:
+        raise PreflightError([f"{filename}: {e}" for e in res.errors])
+    if res.kind != "acen":
+        raise PreflightError([f"{filename}: {_kind_label(res.kind)} 파일입니다. AICC 실행에 업로드하세요."])
+    return res
+
+
+def preflight_aicc(
+    items: Sequence[Tuple[str, bytes | Path | IO[bytes]]],
+    strict_same_month: bool = True,
+) -> List[SniffResult]:
+    """
+    items: [(파일명, bytes / 경로 / file-like), ...]
+    - 모두 AICC 형식(A4 정산월 + B/G/H/M)이어야 함. ACEN 파일은 ACEN 실행으로 안내
+    - strict_same_month=True면 A4 정산월이 모두 같아야 함
+    """
+    results = [sniff_workbook(data, name) for name, data in items]
+    problems: List[str] = []
+    for r in results:
+        problems.extend(f"{r.filename}: {e}" for e in r.errors)
+        if not r.errors and r.kind != "aicc":
+            problems.append(f"{r.filename}: {_kind_label(r.kind)} 파일입니다. ACEN 실행에 업로드하세요.")
+
+    months = sorted({r.month.strftime("%Y-%m") for r in results if r.kind == "aicc" and r.month})
+    if strict_same_month and len(months) > 1:
+        problems.append("A4 정산월이 파일마다 다릅니다: " + ", ".join(months))
+
+    if problems:
+        raise PreflightError(problems)
+    return results
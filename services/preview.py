@@ -0,0 +1,75 @@
+# services/preview.py
+from __future__ import annotations
+import time
+from collections import OrderedDict
+from datetime import datetime
+from io import BytesIO
+from typing import IO, Any, Dict, List, Optional, Sequence, Tuple
+
+from services.acen import extract_p_bi_mapped_only
+from services.aicc import aggregate_bghm_stream
+from services.preflight import SniffResult
+
+# 템플릿 로드/워크북 저장/ZIP 생성 없이 수집·집계 단계만 돌려 JSON으로 돌려줌
+
+
+def _ym(d: Optional[datetime]) -> Optional[str]:
+    return d.strftime("%Y-%m") if d else None
+
+
+def _ms(t0: float) -> float:
+    return round((time.perf_counter() - t0) * 1000, 2)
+
+
+def preview_acen(data: bytes, sniff: SniffResult) -> Dict[str, Any]:
+    """ACEN 업체별 공급가 (extract_p_bi_mapped_only 결과)."""
+    t0 = time.perf_counter()
+    mapped = extract_p_bi_mapped_only(BytesIO(data))
+    file_stats = sniff.to_dict()
+    file_stats["parse_ms"] = _ms(t0)
+    return {
+        "kind": "acen",
+        "settlement_month": _ym(sniff.settlement_month),
+        "vendors": [{"name": name, "supply": amount} for name, amount in mapped.items()],
+        "total": sum(mapped.values()),
+        "files": [file_stats],
+    }
+
+
+def preview_aicc(
+    uploads: Sequence[Tuple[str, bytes | IO[bytes]]],
+    sniffs: Sequence[SniffResult],
+    start_row: int = 7,
+) -> Dict[str, Any]:
+    """
+    AICC (회사명, 합계, 구분) 그룹 (map_grouped_names 결과) + 파일별 행 수.
+    uploads의 file-like는 파일별 집계가 끝나는 대로 닫음.
+    """
+    t0 = time.perf_counter()
+    agg = aggregate_bghm_stream(
+        [BytesIO(data) if isinstance(data, (bytes, bytearray)) else data for _, data in uploads],
+        start_row=start_row,
+        close_sources=True,
+    )
+
+    files: List[Dict[str, Any]] = []
+    for sniff, stats in zip(sniffs, agg.files):
+        d = sniff.to_dict()
+        d["rows"] = stats["rows"]
+        d["parse_ms"] = stats["elapsed_ms"]
+        files.append(d)
+
+    by_vendor: Dict[str, int] = OrderedDict()
+    for vendor, total, _ in agg.mapped:
+        by_vendor[vendor] = by_vendor.get(vendor, 0) + total
+
+    return {
+        "kind": "aicc",
+        "settlement_month": _ym(agg.settlement_month),
+        "groups": [{"name": n, "total": t, "title": title} for n, t, title in agg.mapped],
+        "vendors": [{"name": n, "total": t} for n, t in by_vendor.items()],
+        "total": sum(by_vendor.values()),
+        "rows": sum(f["rows"] for f in agg.files),
+        "elapsed_ms": _ms(t0),
+        "files": files,
+    }
@@ -0,0 +1,184 @@
+# services/progress.py
+from __future__ import annotations
+import json
+import os
+import re
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar
+
+# 작업(job) 진행 상황.
+# - 파이프라인 함수는 progress.stage()/add()/set()만 호출 (기본값 NULL_PROGRESS는 아무것도 안 함)
+# - 상태가 바뀔 때마다 스냅샷 1줄을 <root>/<job_id>.jsonl 에 append
+#   → POST를 처리하는 워커와 SSE를 내보내는 워커가 달라도 같은 파일을 봄
+# - SSE 엔드포인트는 이 파일을 tail 해서 줄 번호를 이벤트 id로 내보냄 (Last-Event-ID로 재개)
+
+PROGRESS_TTL = 60 * 60              # 끝난 작업 기록 보관 시간(초)
+PROGRESS_MIN_INTERVAL = 0.2         # 카운터만 바뀔 때 기록 최소 간격(초). 단계 전환/종료는 즉시 기록
+PROGRESS_EVERY = 2048               # counted(): 이 행 수마다 카운터 갱신
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+T = TypeVar("T")
+
+
+def valid_job_id(job_id: Optional[str]) -> bool:
+    return bool(job_id and _ID_RE.match(job_id))
+
+
+class NullProgress:
+    """진행 보고를 받지 않는 호출용 (CLI/미리보기/테스트)."""
+
+    def stage(self, name: str, label: str = "", **counters: int) -> None:
+        pass
+
+    def set(self, **counters: int) -> None:
+        pass
+
+    def add(self, **deltas: int) -> None:
+        pass
+
+    def finish(self, error: Optional[str] = None) -> None:
+        pass
+
+
+NULL_PROGRESS = NullProgress()
+
+
+class Progress(NullProgress):
+    def __init__(self, path: Path):
+        self.path = path
+        self.stage_name = ""
+        self.label = ""
+        self.counters: Dict[str, int] = {}
+        self._started = time.time()
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    def stage(self, name: str, label: str = "", **counters: int) -> None:
+        with self._lock:
+            self.stage_name, self.label = name, label or name
+            self.counters.update(counters)
+            self._emit(force=True)
+
+    def set(self, **counters: int) -> None:
+        with self._lock:
+            self.counters.update(counters)
+            self._emit()
+
+    def add(self, **deltas: int) -> None:
+        with self._lock:
+            for k, v in deltas.items():
+                self.counters[k] = self.counters.get(k, 0) + v
+            self._emit()
+
+    def finish(self, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._emit(force=True, done=True, error=error)
+
+    def _emit(self, force: bool = False, done: bool = False, error: Optional[str] = None) -> None:
+        now = time.time()
+        if not force and now - self._last_write < PROGRESS_MIN_INTERVAL:
+            return
+        self._last_write = now
+        line = json.dumps({
+            "stage": self.stage_name,
+            "label": self.label,
+            "counters": self.counters,
+            "elapsed": round(now - self._started, 2),
+            "done": done,
+            "error": error,
+        }, ensure_ascii=False) + "\n"
+        # O_APPEND + 한 번의 write → 줄 단위로 원자적으로 붙음
+        fd = os.open(str(self.path), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, line.encode("utf-8"))
+        finally:
+            os.close(fd)
+
+
+def counted(items: Iterable[T], progress: NullProgress, key: str, every: int = PROGRESS_EVERY) -> Iterator[T]:
+    """iterator를 그대로 흘리면서 every개마다 progress.add(key=...)"""
+    n = 0
+    for item in items:
+        yield item
+        n += 1
+        if n >= every:
+            progress.add(**{key: n})
+            n = 0
+    if n:
+        progress.add(**{key: n})
+
+
+class ProgressStore:
+    def __init__(self, root: Path | str):
+        self.root = Path(root)
+
+    def _path(self, job_id: str) -> Path:
+        if not valid_job_id(job_id):
+            raise ValueError(f"잘못된 작업 ID: {job_id!r}")
+        return self.root / f"{job_id}.jsonl"
+
+    def job(self, job_id: Optional[str]) -> NullProgress:
+        """job_id가 없거나 잘못되면 NULL_PROGRESS (진행 표시 없이 기존처럼 동작)."""
+        if not valid_job_id(job_id):
+            return NULL_PROGRESS
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.cleanup()
+        return Progress(self._path(job_id))
+
+    def read(self, job_id: str, after: int = 0) -> List[Tuple[int, str]]:
+        """after번째 줄 이후의 (줄 번호, JSON 문자열) 목록. 쓰는 중인 마지막 줄은 제외."""
+        try:
+            with open(self._path(job_id), "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        out = []
+        for i, raw in enumerate(data.split(b"\n")[:-1], start=1):
+            if i > after:
+                out.append((i, raw.decode("utf-8")))
+        return out
+
+    def stream(self, job_id: str, after: int = 0, timeout: float = 30 * 60,
+               poll: float = 0.25, heartbeat: float = 15.0, wait_start: float = 60.0) -> Iterator[str]:
+        """
+        SSE 본문. 종료 스냅샷(done)을 보내거나 timeout이 지나면 끝.
+        wait_start초 안에 작업 기록이 생기지 않으면(실행 요청이 오지 않음) 바로 끝냄.
+        """
+        path = self._path(job_id)
+        started = time.monotonic()
+        deadline = started + timeout
+        last_sent = started
+        yield "retry: 2000\n\n"
+        while time.monotonic() < deadline:
+            if not after and time.monotonic() - started > wait_start and not path.exists():
+                return
+            events = self.read(job_id, after)
+            for i, line in events:
+                after = i
+                yield f"id: {i}\ndata: {line}\n\n"
+                if json.loads(line).get("done"):
+                    return
+            now = time.monotonic()
+            if events:
+                last_sent = now
+            elif now - last_sent >= heartbeat:
+                # 프록시 유휴 타임아웃 방지용 주석 줄
+                last_sent = now
+                yield ": keep-alive\n\n"
+            time.sleep(poll)
+
+    def cleanup(self, max_age: int = PROGRESS_TTL) -> None:
+        cutoff = time.time() - max_age
+        try:
+            entries = list(self.root.iterdir())
+        except OSError:
+            return
+        for p in entries:
+            try:
+                if p.suffix == ".jsonl" and p.stat().st_mtime < cutoff:
+                    p.unlink()
+            except OSError:
+                continue
@@ -0,0 +1,168 @@
+# services/readers.py
+from __future__ import annotations
+import os
+from abc import ABC, abstractmethod
+from datetime import date, datetime
+from io import BytesIO
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+
+from openpyxl import load_workbook
+
+# (옵션) Rust calamine 기반 리더 (pip install python-calamine). 설치돼 있으면 auto가 우선 사용
+try:
+    from python_calamine import CalamineWorkbook  # type: ignore
+except Exception:
+    CalamineWorkbook = None
+
+# 원본(ACEN/AICC) 첫 시트를 값으로 읽는 리더 백엔드.
+# 백엔드가 달라도 같은 행/값이 나오도록 맞춤:
+#   - 행/열 번호는 엑셀 기준(1부터), iter_rows는 요청한 열 폭만큼 None으로 채운 tuple
+#   - 빈 셀/빈 문자열 → None, 정수형 float → int, date → datetime
+# 선택: reader 인자 > KT_EXCEL_READER 환경변수 > auto (calamine이 설치돼 있으면 calamine, 없으면 openpyxl)
+# auto 기본값은 tools/reader_conformance.py 를 통과한 백엔드만 (AUTO_READERS)
+
+READER_ENV = "KT_EXCEL_READER"
+
+
+def _source(src):
+    """bytes → BytesIO, 경로 → str, file-like는 그대로"""
+    if isinstance(src, (bytes, bytearray, memoryview)):
+        return BytesIO(bytes(src))
+    if isinstance(src, (str, Path)):
+        return str(src)
+    return src
+
+
+class SheetReader(ABC):
+    """첫 시트 값 읽기. with 문으로 쓰거나 다 쓰면 close()."""
+
+    name = ""
+
+    @abstractmethod
+    def iter_rows(
+        self,
+        min_row: int = 1,
+        max_row: Optional[int] = None,
+        min_col: int = 1,
+        max_col: Optional[int] = None,
+    ) -> Iterator[Tuple[Any, ...]]:
+        ...
+
+    def cell(self, row: int, col: int) -> Any:
+        for values in self.iter_rows(min_row=row, max_row=row, min_col=col, max_col=col):
+            return values[0] if values else None
+        return None
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self) -> "SheetReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class OpenpyxlReader(SheetReader):
+    name = "openpyxl"
+
+    def __init__(self, src):
+        self.wb = load_workbook(_source(src), data_only=True, read_only=True)
+        self.ws = self.wb.worksheets[0]
+
+    def iter_rows(self, min_row=1, max_row=None, min_col=1, max_col=None):
+        for values in self.ws.iter_rows(
+            min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col, values_only=True
+        ):
+            yield tuple(None if v == "" else v for v in values)
+
+    def close(self) -> None:
+        self.wb.close()
+
+
+def _calamine_value(v):
+    if v == "":
+        return None
+    if isinstance(v, float) and v.is_integer():
+        return int(v)              # openpyxl은 "1"로 저장된 숫자를 int로 읽음
+    if isinstance(v, date) and not isinstance(v, datetime):
+        return datetime(v.year, v.month, v.day)
+    return v
+
+
+class CalamineReader(SheetReader):
+    name = "calamine"
+
+    def __init__(self, src):
+        if CalamineWorkbook is None:
+            raise RuntimeError("calamine 리더를 쓰려면 python-calamine이 필요합니다 (pip install python-calamine).")
+        src = _source(src)
+        self.wb = CalamineWorkbook.from_path(src) if isinstance(src, str) else CalamineWorkbook.from_filelike(src)
+        self.sheet = self.wb.get_sheet_by_index(0)
+
+    def _rows(self) -> Iterator[Tuple[int, int, List[Any]]]:
+        """(엑셀 행 번호, 첫 값의 열 번호, 값 목록)"""
+        # sheet.iter_rows()는 행은 1행부터, 열은 데이터 영역(start)부터라 기준이 섞여 있음.
+        # 데이터 영역만 돌려주는 to_python(skip_empty_area=True)에 start(0부터)를 더해 위치를 맞춤
+        start = getattr(self.sheet, "start", None)
+        if start is None:
+            for i, values in enumerate(self.sheet.to_python(skip_empty_area=False)):
+                yield i + 1, 1, values
+            return
+        for i, values in enumerate(self.sheet.to_python(skip_empty_area=True)):
+            yield start[0] + 1 + i, start[1] + 1, values
+
+    def iter_rows(self, min_row=1, max_row=None, min_col=1, max_col=None):
+        width = max(0, max_col - min_col + 1) if max_col is not None else 0
+        expected = min_row
+        for r, c0, values in self._rows():
+            if r < min_row:
+                continue
+            if max_row is not None and r > max_row:
+                break
+            # 데이터 영역 위쪽 빈 행도 openpyxl처럼 빈 tuple로 채움
+            while expected < r:
+                yield (None,) * width
+                expected += 1
+            expected = r + 1
+            hi = max_col if max_col is not None else c0 + len(values) - 1
+            out = []
+            for c in range(min_col, hi + 1):
+                j = c - c0
+                out.append(_calamine_value(values[j]) if 0 <= j < len(values) else None)
+            yield tuple(out)
+
+    def close(self) -> None:
+        close = getattr(self.wb, "close", None)
+        if close is not None:
+            close()
+
+
+READERS: Dict[str, Type[SheetReader]] = {"openpyxl": OpenpyxlReader, "calamine": CalamineReader}
+
+
+# auto가 고를 수 있는 백엔드 (우선순위 순, 설치된 것 중 첫 번째). 모두 tools/reader_conformance.py 통과
+AUTO_READERS = ["calamine", "openpyxl"]
+
+
+def available_readers() -> List[str]:
+    """지금 환경에서 쓸 수 있는 백엔드 (auto 우선순위 순, 그 다음 나머지)"""
+    out = ["openpyxl"]
+    if CalamineWorkbook is not None:
+        out.append("calamine")
+    return sorted(out, key=lambda r: AUTO_READERS.index(r) if r in AUTO_READERS else len(AUTO_READERS))
+
+
+def get_reader(name: Optional[str] = None) -> Type[SheetReader]:
+    name = (name or os.environ.get(READER_ENV) or "auto").strip().lower()
+    if name == "auto":
+        return READERS[next(r for r in available_readers() if r in AUTO_READERS)]
+    if name not in READERS:
+        raise ValueError(f"알 수 없는 엑셀 리더: {name} (가능: auto, {', '.join(READERS)})")
+    return READERS[name]
+
+
+def open_sheet(src, reader: Optional[str] = None) -> SheetReader:
+    """src: bytes / 경로 / file-like. reader: 'auto' | 'openpyxl' | 'calamine' | None(환경변수)"""
+    return get_reader(reader)(src)
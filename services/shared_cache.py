@@ -0,0 +1,254 @@
+# services/shared_cache.py
+from __future__ import annotations
+import hashlib
+import logging
+import mmap
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional, Tuple
+
+import openpyxl
+from openpyxl import load_workbook
+
+from services.atomic import path_lock
+
+# 호스트 공용 캐시 (같은 호스트의 gunicorn 워커/배치 프로세스가 함께 봄).
+# - 템플릿 스냅샷: load_workbook 결과를 pickle로 직렬화. 키 = 경로 + mtime + 크기 (템플릿을 바꾸면 새 키)
+# - 원본 파싱 결과: 파일 내용 해시로 키를 만들고 값 형식은 호출하는 쪽이 정함 (aicc: 그룹 열 단위, acen: 업체별 금액)
+#   → 미리보기 후 실행, 같은 파일 재업로드 등은 다른 워커에서도 파싱을 건너뜀
+# - 항목 1개 = 파일 1개 (<root>/<ns>/<key>.bin). 기본 위치는 /dev/shm (tmpfs = 공유 메모리)
+#   읽을 때는 mmap(읽기 전용)이라 워커마다 복사본을 두지 않고 같은 페이지를 씀
+#   multiprocessing.shared_memory 대신 파일을 쓰는 이유: 만든 워커가 끝나면 세그먼트가 정리되고(resource_tracker),
+#   임시파일 → rename으로 원자적으로 교체할 수 없음
+# - 용량(KT_SHARED_CACHE_MB, 기본 256MB)을 넘으면 오래 안 쓴 항목부터 지움
+# - KT_SHARED_CACHE=0 이면 끔. 위치는 KT_SHARED_CACHE_DIR
+#   pickle을 읽으므로 디렉토리는 현재 사용자 전용(0700)이어야 하고, 아니면 캐시를 끔
+
+log = logging.getLogger(__name__)
+
+MB = 1024 * 1024
+KEEP_OPEN = 32                      # 워커마다 열어 두는 mmap 수 (다시 열지 않고 바로 읽음)
+HASH_CHUNK = 1024 * 1024
+
+
+def _default_root() -> Path:
+    base = Path("/dev/shm") if os.path.isdir("/dev/shm") else Path(tempfile.gettempdir())
+    uid = os.getuid() if hasattr(os, "getuid") else 0
+    return base / f"kt-cache-{uid}"
+
+
+def _digest(*parts: Any) -> str:
+    return hashlib.blake2b("|".join(str(p) for p in parts).encode("utf-8"), digest_size=20).hexdigest()
+
+
+class SharedCache:
+    def __init__(self, root: Path | str, max_bytes: int = 256 * MB, keep_open: int = KEEP_OPEN):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.keep_open = keep_open
+        self._open: "OrderedDict[Tuple[str, str], mmap.mmap]" = OrderedDict()
+        self._guard = threading.Lock()
+
+    def _path(self, ns: str, key: str) -> Path:
+        return self.root / ns / f"{key}.bin"
+
+    def get(self, ns: str, key: str) -> Optional[memoryview]:
+        """항목 내용 (읽기 전용 memoryview, 복사 없음). 없으면 None."""
+        with self._guard:
+            m = self._open.get((ns, key))
+            if m is not None:
+                self._open.move_to_end((ns, key))
+                return memoryview(m)
+
+        path = self._path(ns, key)
+        try:
+            fd = os.open(str(path), os.O_RDONLY)
+        except OSError:
+            return None
+        try:
+            size = os.fstat(fd).st_size
+            if size == 0:
+                return None
+            m = mmap.mmap(fd, size, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return None
+        finally:
+            os.close(fd)
+        try:
+            os.utime(path)                  # 정리 순서(오래 안 쓴 순)용
+        except OSError:
+            pass
+
+        with self._guard:
+            self._open[(ns, key)] = m
+            while len(self._open) > self.keep_open:
+                # 닫지 않고 참조만 놓음 (아직 쓰는 memoryview가 있으면 그게 끝날 때 해제)
+                self._open.popitem(last=False)
+        return memoryview(m)
+
+    def put(self, ns: str, key: str, data) -> None:
+        """항목 기록 (임시파일 → rename). 같은 키를 여러 워커가 동시에 써도 내용이 같으므로 마지막 것이 남음."""
+        path = self._path(ns, key)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(prefix=f".{key}.", suffix=".tmp", dir=str(path.parent))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+        except OSError as e:
+            log.warning("공유 캐시 기록 실패 (%s/%s): %s", ns, key, e)
+            return
+        self._evict()
+
+    def _evict(self) -> None:
+        with path_lock(self.root / ".evict.lock"):
+            entries = []
+            for ns_dir in self.root.iterdir():
+                if not ns_dir.is_dir():
+                    continue
+                for p in ns_dir.glob("*.bin"):
+                    try:
+                        st = p.stat()
+                    except OSError:
+                        continue
+                    entries.append((st.st_mtime, st.st_size, p))
+            total = sum(size for _, size, _ in entries)
+            for _, size, p in sorted(entries, key=lambda e: e[0]):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    p.unlink()              # 이미 mmap한 워커는 계속 읽을 수 있음
+                except OSError:
+                    continue
+                total -= size
+
+    def clear(self) -> None:
+        with self._guard:
+            self._open.clear()
+        for ns_dir in self.root.iterdir() if self.root.is_dir() else []:
+            if ns_dir.is_dir():
+                for p in ns_dir.glob("*.bin"):
+                    p.unlink(missing_ok=True)
+
+
+# =========================
+# 전역 설정
+# =========================
+CACHE_ENABLED = os.environ.get("KT_SHARED_CACHE", "1") != "0"
+CACHE_ROOT = Path(os.environ.get("KT_SHARED_CACHE_DIR") or _default_root())
+CACHE_MAX_MB = int(os.environ.get("KT_SHARED_CACHE_MB") or 256)
+
+_cache: Optional[SharedCache] = None
+_cache_config: Optional[tuple] = None
+
+
+def _private_dir(root: Path) -> bool:
+    """현재 사용자만 쓸 수 있는 디렉토리인지 (없으면 0700으로 만듦)"""
+    try:
+        root.mkdir(mode=0o700, parents=True, exist_ok=True)
+        st = os.lstat(root)
+    except OSError as e:
+        log.warning("공유 캐시 디렉토리를 만들 수 없어 캐시를 끕니다 (%s): %s", root, e)
+        return False
+    if not hasattr(os, "getuid"):
+        return True
+    if root.is_symlink() or st.st_uid != os.getuid() or st.st_mode & 0o022:
+        log.warning("공유 캐시 디렉토리가 현재 사용자 전용이 아니라 캐시를 끕니다: %s", root)
+        return False
+    return True
+
+
+def get_cache() -> Optional[SharedCache]:
+    """설정된 공유 캐시 (꺼져 있거나 쓸 수 없으면 None)"""
+    global _cache, _cache_config
+    config = (CACHE_ENABLED, CACHE_ROOT, CACHE_MAX_MB, os.getpid())
+    if _cache_config != config:
+        _cache_config = config
+        _cache = SharedCache(CACHE_ROOT, CACHE_MAX_MB * MB) if CACHE_ENABLED and _private_dir(CACHE_ROOT) else None
+    return _cache
+
+
+def configure(root: Optional[Path | str] = None, max_mb: Optional[int] = None, enabled: Optional[bool] = None) -> None:
+    """환경변수 대신 코드에서 설정 (도구/테스트용)."""
+    global CACHE_ROOT, CACHE_MAX_MB, CACHE_ENABLED
+    if root is not None:
+        CACHE_ROOT = Path(root)
+    if max_mb is not None:
+        CACHE_MAX_MB = int(max_mb)
+    if enabled is not None:
+        CACHE_ENABLED = bool(enabled)
+
+
+# =========================
+# 키 / 템플릿 스냅샷
+# =========================
+def content_key(src, *parts: Any) -> Optional[str]:
+    """
+    원본 내용 해시 + 구분값(parts)으로 캐시 키. src: bytes / BytesIO / 경로 / seek 가능한 file-like.
+    캐시가 꺼져 있거나 해시할 수 없으면 None.
+    """
+    if get_cache() is None:
+        return None
+    h = hashlib.blake2b(digest_size=20)
+    try:
+        if isinstance(src, (bytes, bytearray, memoryview)):
+            h.update(src)
+        elif hasattr(src, "getbuffer"):
+            with src.getbuffer() as buf:
+                h.update(buf)
+        elif isinstance(src, (str, Path)):
+            with open(src, "rb") as f:
+                for buf in iter(lambda: f.read(HASH_CHUNK), b""):
+                    h.update(buf)
+        elif hasattr(src, "read") and hasattr(src, "seek"):
+            pos = src.tell()
+            for buf in iter(lambda: src.read(HASH_CHUNK), b""):
+                h.update(buf)
+            src.seek(pos)
+        else:
+            return None
+    except (OSError, ValueError):
+        return None
+    h.update(_digest(*parts).encode("ascii"))
+    return h.hexdigest()
+
+
+def load_template(path: str | Path):
+    """
+    load_workbook(path)와 같은 (수정 가능한) Workbook.
+    공유 캐시에 같은 템플릿(경로·mtime·크기) 스냅샷이 있으면 XML 파싱 대신 스냅샷에서 복원.
+    """
+    cache = get_cache()
+    if cache is None:
+        return load_workbook(path)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return load_workbook(path)          # 없는 경로 등은 원래 오류 그대로
+    key = _digest(
+        Path(path).resolve(), st.st_mtime_ns, st.st_size, openpyxl.__version__, sys.version_info[:2],
+    )
+    snapshot = cache.get("template", key)
+    if snapshot is not None:
+        try:
+            return pickle.loads(snapshot)
+        except Exception as e:
+            log.warning("템플릿 스냅샷 복원 실패, 다시 읽습니다 (%s): %s", path, e)
+    wb = load_workbook(path)
+    try:
+        cache.put("template", key, pickle.dumps(wb, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception as e:
+        log.warning("템플릿 스냅샷 생성 실패 (%s): %s", path, e)
+    return wb
@@ -0,0 +1,399 @@
+# services/storage.py
+from __future__ import annotations
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import ExitStack, contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import IO, Iterator, List, NamedTuple, Optional
+from urllib.parse import urlparse
+
+from services.atomic import LOCK_NAME, PENDING_LOCK_NAME, atomic_write, month_lock_path, path_lock, wait_unlocked
+from services.tracing import span
+
+# (옵션) 오브젝트 스토리지 백엔드에서만 필요
+try:
+    import boto3  # type: ignore
+    from botocore.exceptions import ClientError  # type: ignore
+except Exception:
+    boto3 = None
+    ClientError = Exception
+
+# 산출물 키 규칙: "YYYY/MM/파일명"
+SPOOL_MAX = 8 * 1024 * 1024      # 이 크기까지는 메모리, 넘으면 임시파일로 스풀
+COPY_CHUNK = 1024 * 1024
+
+
+class ObjectInfo(NamedTuple):
+    key: str
+    size: int
+    mtime: float           # epoch seconds
+    etag: str
+
+
+def month_prefix(when: datetime) -> str:
+    return f"{when:%Y}/{when:%m}/"
+
+
+def month_key(when: datetime, name: str) -> str:
+    return month_prefix(when) + name
+
+
+# =========================
+# 공통 인터페이스
+# =========================
+class Storage(ABC):
+    """산출물 저장소. 키는 '/' 구분 상대 경로 (예: 2025/09/업무실적_25.09.xlsx)."""
+
+    @abstractmethod
+    def open_write(self, key: str):
+        """쓰기용 바이너리 파일 컨텍스트. 정상 종료 시에만 완성본이 보임."""
+
+    @abstractmethod
+    def open_read(self, key: str, seekable: bool = False) -> IO[bytes]:
+        """읽기 스트림. seekable=True면 openpyxl 등 랜덤 접근이 필요한 소비자용."""
+
+    @abstractmethod
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        ...
+
+    @abstractmethod
+    def list(self, prefix: str = "") -> List[ObjectInfo]:
+        ...
+
+    @abstractmethod
+    def subdirs(self, prefix: str = "") -> List[str]:
+        """prefix('YYYY/' 등) 바로 아래 하위 경로 이름 목록 (정산월 폴더 탐색용)."""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    def lock_path(self, when: datetime, name: str = LOCK_NAME) -> Path:
+        """정산월 단위 lock 파일 위치 (워커 간 공유되는 로컬/공유 디렉토리)."""
+
+    @contextmanager
+    def lock(self, when: Optional[datetime] = None):
+        """
+        정산월 단위 배타 잠금 컨텍스트.
+        다른 워커가 같은 정산월 산출물을 아직 저장 중(write-behind)이면 끝날 때까지 기다린 뒤 진입.
+        """
+        when = when or datetime.now()
+        with ExitStack() as stack:
+            with span("storage.lock_wait", month=f"{when:%Y-%m}"):
+                stack.enter_context(path_lock(self.lock_path(when)))
+                self.wait_pending(when)
+            yield
+
+    def wait_pending(self, when: datetime) -> None:
+        """해당 정산월에 저장 대기 중인 산출물이 있으면 반영될 때까지 대기."""
+        wait_unlocked(self.lock_path(when, PENDING_LOCK_NAME))
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """로컬 파일로 존재하면 경로 (send_file 등 최적화용), 아니면 None."""
+        return None
+
+    # --- 편의 메서드 ---
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def write_bytes(self, key: str, data) -> "StoredFile":
+        with self.open_write(key) as f:
+            f.write(data)
+        return StoredFile(self, key)
+
+    def write_stream(self, key: str, src: IO[bytes]) -> "StoredFile":
+        with self.open_write(key) as f:
+            shutil.copyfileobj(src, f, COPY_CHUNK)
+        return StoredFile(self, key)
+
+    def save_workbook(self, wb, key: str) -> "StoredFile":
+        with span("storage.save_workbook", key=key), self.open_write(key) as f:
+            wb.save(f)
+        return StoredFile(self, key)
+
+    def read_bytes(self, key: str) -> bytes:
+        with self.open_read(key) as f:
+            return f.read()
+
+    def iter_range(self, key: str, start: int, length: int, chunk: int = COPY_CHUNK) -> Iterator[bytes]:
+        """[start, start+length) 구간을 chunk 단위로 (HTTP Range 응답용)."""
+        with self.open_read(key) as f:
+            if f.seekable():
+                f.seek(start)
+            else:
+                skip = start
+                while skip > 0:
+                    got = f.read(min(chunk, skip))
+                    if not got:
+                        return
+                    skip -= len(got)
+            left = length
+            while left > 0:
+                data = f.read(min(chunk, left))
+                if not data:
+                    return
+                left -= len(data)
+                yield data
+
+
+class StoredFile:
+    """저장소 안의 산출물 하나. 로컬 백엔드면 os.PathLike로도 쓸 수 있음."""
+
+    def __init__(self, storage: Storage, key: str):
+        self.storage = storage
+        self.key = key
+
+    @property
+    def name(self) -> str:
+        return self.key.rsplit("/", 1)[-1]
+
+    def exists(self) -> bool:
+        return self.storage.exists(self.key)
+
+    def stat(self) -> Optional[ObjectInfo]:
+        return self.storage.stat(self.key)
+
+    def open(self, seekable: bool = False) -> IO[bytes]:
+        return self.storage.open_read(self.key, seekable=seekable)
+
+    def read_bytes(self) -> bytes:
+        return self.storage.read_bytes(self.key)
+
+    def local_path(self) -> Optional[Path]:
+        return self.storage.local_path(self.key)
+
+    def __fspath__(self) -> str:
+        p = self.local_path()
+        if p is None:
+            raise TypeError(f"로컬 파일이 아닌 산출물입니다: {self.key}")
+        return str(p)
+
+    def __repr__(self) -> str:
+        return f"StoredFile({self.storage!r}, {self.key!r})"
+
+
+@contextmanager
+def open_source(src) -> Iterator:
+    """
+    StoredFile / 경로 / file-like 를 openpyxl이 읽을 수 있는 seekable 소스로.
+    """
+    if isinstance(src, StoredFile):
+        p = src.local_path()
+        if p is not None:
+            yield p
+            return
+        f = src.open(seekable=True)
+        try:
+            yield f
+        finally:
+            f.close()
+    else:
+        yield src
+
+
+# =========================
+# 로컬 파일시스템
+# =========================
+class LocalStorage(Storage):
+    def __init__(self, root: Path | str):
+        self.root = Path(root)
+
+    def __repr__(self) -> str:
+        return f"LocalStorage({str(self.root)!r})"
+
+    def _path(self, key: str) -> Path:
+        return self.root.joinpath(*key.split("/"))
+
+    def open_write(self, key: str):
+        return atomic_write(self._path(key))
+
+    def open_read(self, key: str, seekable: bool = False) -> IO[bytes]:
+        return open(self._path(key), "rb")
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        p = self._path(key)
+        try:
+            st = p.stat()
+        except OSError:
+            return None
+        if not p.is_file():
+            return None
+        return ObjectInfo(key, st.st_size, st.st_mtime, f"{st.st_mtime_ns:x}-{st.st_size:x}")
+
+    def list(self, prefix: str = "") -> List[ObjectInfo]:
+        # prefix = "YYYY/MM/이름접두어" → 디렉토리 + 파일명 접두어로 분리
+        dir_part, _, name_prefix = prefix.rpartition("/")
+        base = self._path(dir_part) if dir_part else self.root
+        if not base.is_dir():
+            return []
+        out = []
+        for p in base.iterdir():
+            # 숨김 파일(임시파일/잠금파일)은 제외
+            if p.name.startswith(".") or not p.name.startswith(name_prefix) or not p.is_file():
+                continue
+            key = f"{dir_part}/{p.name}" if dir_part else p.name
+            info = self.stat(key)
+            if info is not None:
+                out.append(info)
+        return out
+
+    def subdirs(self, prefix: str = "") -> List[str]:
+        base = self._path(prefix.strip("/")) if prefix.strip("/") else self.root
+        if not base.is_dir():
+            return []
+        return sorted(p.name for p in base.iterdir() if p.is_dir() and not p.name.startswith("."))
+
+    def delete(self, key: str) -> None:
+        try:
+            self._path(key).unlink()
+        except FileNotFoundError:
+            pass
+
+    def lock_path(self, when: datetime, name: str = LOCK_NAME) -> Path:
+        return month_lock_path(self.root, when, name)
+
+    def local_path(self, key: str) -> Optional[Path]:
+        p = self._path(key)
+        return p if p.is_file() else None
+
+
+# =========================
+# S3 호환 오브젝트 스토리지 (AWS S3 / MinIO / moto_server 등)
+# =========================
+class S3Storage(Storage):
+    """
+    boto3 기반. endpoint_url로 로컬 S3 호환 서버(MinIO, moto_server)에 붙여 테스트 가능.
+    - 쓰기: SpooledTemporaryFile에 쓴 뒤 upload_fileobj (큰 파일은 멀티파트로 스트리밍)
+    - 읽기: get_object Body 스트림 그대로. seekable이 필요하면 스풀 파일로 내려받음
+    - 잠금: 오브젝트 스토리지에는 advisory lock이 없으므로 lock_dir 기준 flock.
+            여러 노드면 lock_dir는 모든 노드가 함께 보는 디렉토리(flock을 지원하는 NFS 등)여야 함.
+            lock_dir 없이는 single_node=True(노드 1대, 로컬 임시 디렉토리)로 명시해야 만들 수 있음.
+    """
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        *,
+        endpoint_url: Optional[str] = None,
+        client=None,
+        lock_dir: Path | str | None = None,
+        single_node: bool = False,
+    ):
+        if lock_dir is None and not single_node:
+            # 노드마다 다른 로컬 잠금이면 같은 정산월을 여러 노드가 동시에 써도 막지 못함
+            raise RuntimeError(
+                "S3 저장소에는 모든 노드가 공유하는 잠금 디렉토리가 필요합니다. "
+                "KT_S3_LOCK_DIR을 공유 디렉토리로 지정하거나, 노드가 1대면 KT_S3_SINGLE_NODE=1로 설정하세요."
+            )
+        if client is None:
+            if boto3 is None:
+                raise RuntimeError("S3 저장소를 쓰려면 boto3가 필요합니다 (pip install boto3).")
+            client = boto3.client("s3", endpoint_url=endpoint_url)
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.lock_dir = Path(lock_dir) if lock_dir else Path(tempfile.gettempdir()) / "kt-output-locks" / bucket
+
+    def __repr__(self) -> str:
+        return f"S3Storage({self.bucket!r}, {self.prefix!r})"
+
+    def _k(self, key: str) -> str:
+        return self.prefix + key
+
+    @contextmanager
+    def open_write(self, key: str):
+        spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+        try:
+            yield spool
+            spool.seek(0)
+            self.client.upload_fileobj(spool, self.bucket, self._k(key))
+        finally:
+            spool.close()
+
+    def open_read(self, key: str, seekable: bool = False) -> IO[bytes]:
+        if seekable:
+            spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX)
+            self.client.download_fileobj(self.bucket, self._k(key), spool)
+            spool.seek(0)
+            return spool
+        return self.client.get_object(Bucket=self.bucket, Key=self._k(key))["Body"]
+
+    def iter_range(self, key: str, start: int, length: int, chunk: int = COPY_CHUNK) -> Iterator[bytes]:
+        # 필요한 구간만 GET (Range 요청)
+        if length <= 0:
+            return
+        body = self.client.get_object(
+            Bucket=self.bucket, Key=self._k(key), Range=f"bytes={start}-{start + length - 1}"
+        )["Body"]
+        try:
+            while True:
+                data = body.read(chunk)
+                if not data:
+                    return
+                yield data
+        finally:
+            body.close()
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        try:
+            h = self.client.head_object(Bucket=self.bucket, Key=self._k(key))
+        except ClientError:
+            return None
+        return ObjectInfo(key, h["ContentLength"], h["LastModified"].timestamp(), h["ETag"].strip('"'))
+
+    def list(self, prefix: str = "") -> List[ObjectInfo]:
+        out = []
+        pager = self.client.get_paginator("list_objects_v2")
+        for page in pager.paginate(Bucket=self.bucket, Prefix=self._k(prefix)):
+            for o in page.get("Contents", []):
+                key = o["Key"][len(self.prefix):]
+                if key.rsplit("/", 1)[-1].startswith("."):
+                    continue
+                out.append(ObjectInfo(key, o["Size"], o["LastModified"].timestamp(), o["ETag"].strip('"')))
+        return out
+
+    def subdirs(self, prefix: str = "") -> List[str]:
+        out = set()
+        pager = self.client.get_paginator("list_objects_v2")
+        for page in pager.paginate(Bucket=self.bucket, Prefix=self._k(prefix), Delimiter="/"):
+            for cp in page.get("CommonPrefixes", []):
+                name = cp["Prefix"][len(self._k(prefix)):].rstrip("/")
+                if name and not name.startswith("."):
+                    out.add(name)
+        return sorted(out)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._k(key))
+
+    def lock_path(self, when: datetime, name: str = LOCK_NAME) -> Path:
+        return month_lock_path(self.lock_dir, when, name)
+
+
+# =========================
+# 생성 헬퍼
+# =========================
+def get_storage(target) -> Storage:
+    """
+    Storage 그대로 / 's3://bucket/prefix' → S3Storage / 그 외 경로 → LocalStorage
+    (S3 endpoint는 KT_S3_ENDPOINT_URL 환경변수로 지정, 예: http://127.0.0.1:9000,
+     정산월 잠금 디렉토리는 KT_S3_LOCK_DIR, 노드 1대면 KT_S3_SINGLE_NODE=1)
+    """
+    if isinstance(target, Storage):
+        return target
+    s = str(target)
+    if s.startswith("s3://"):
+        u = urlparse(s)
+        return S3Storage(
+            u.netloc,
+            u.path,
+            endpoint_url=os.environ.get("KT_S3_ENDPOINT_URL") or None,
+            lock_dir=os.environ.get("KT_S3_LOCK_DIR") or None,
+            single_node=os.environ.get("KT_S3_SINGLE_NODE") == "1",
+        )
+    return LocalStorage(Path(target))
+
@@ -1,4 +1,5 @@
 # sum.py
+import logging
 from pathlib import Path
 from openpyxl import load_workbook
 import re
@@ -9,46 +10,67 @@ from openpyxl.worksheet.worksheet import Worksheet
 from calendar import monthrange
 from dateutil.relativedelta import relativedelta
 
+from services.money import parse_won
+from services.progress import NULL_PROGRESS, NullProgress
+from services.shared_cache import load_template
+from services.storage import Storage, StoredFile, get_storage, month_key, open_source
+from services.tracing import set_attrs, traced
+from services.layout import (
+    SLIP_START_ROW, SLIP_MARKER_COLS,
+    SUM_START_ROW, SUM_DEFAULT_END, SUM_MARKER_COLS,
+    find_footer_row, row_index, find_table_end, ensure_capacity, RowIndex,
+)
+
+log = logging.getLogger(__name__)
+
 OUTPUT_DIR = Path("output")
 AICC_PATTERN = re.compile(r"매출결의서_KT AICC_.*\.xlsx$")
 ACEN_PATTERN = re.compile(r"매출결의서_KT ACen_유지수수료_.*\.xlsx$")
 
-def _make_yyyy_mm_dir(base_dir: Path | str, when: Optional[datetime] = None) -> Path:
-    when = when or datetime.now()
-    base = Path(base_dir)
-    out_dir = base / when.strftime("%Y") / when.strftime("%m")
-    out_dir.mkdir(parents=True, exist_ok=True)
-    return out_dir
-
-
 def find_latest_file_for_month(
-    base_dir: str | Path,
+    base_dir: str | Path | Storage,
     when: datetime,
     prefix: str,                    # 예: "매출결의서_KT ACen" / "매출결의서_KT AICC"
     ext: str = ".xlsx",
-) -> Optional[Path]:
-    month_dir = Path(base_dir) / when.strftime("%Y") / when.strftime("%m")
-    if not month_dir.exists():
-        return None
-    # 접두어(prefix)로 필터링
-    candidates = [p for p in month_dir.glob(f"{prefix}*{ext}") if p.is_file()]
+) -> Optional[StoredFile]:
+    storage = get_storage(base_dir)
+    # 접두어(prefix)로 필터링 (저장소 목록 조회 1회)
+    candidates = [o for o in storage.list(month_key(when, prefix)) if o.key.endswith(ext)]
     if not candidates:
         return None
     # 수정시간 최신(또는 파일명 날짜 파싱으로 정렬해도 OK)
-    return max(candidates, key=lambda p: p.stat().st_mtime)
+    return StoredFile(storage, max(candidates, key=lambda o: o.mtime).key)
+
+@traced("sum.extract_D_K_rows")
+def extract_D_K_rows(xlsx_path: Path | StoredFile, start_row: int = SLIP_START_ROW, end_row: Optional[int] = None):
+    """
+    매출결의서 본문 (D, K) 추출.
+    end_row가 없으면 합계 행 직전까지 (합계 행이 없으면 시트 끝까지) 읽음.
+    """
+    with open_source(xlsx_path) as src:
+        rows = _extract_D_K_rows(load_workbook(src, data_only=True, read_only=True), start_row, end_row)
+    set_attrs(key=getattr(xlsx_path, "key", str(xlsx_path)), rows=len(rows))
+    return rows
 
-def extract_D_K_rows(xlsx_path: Path, start_row: int = 11, end_row: int = 25):
-    wb = load_workbook(xlsx_path, data_only=True)
-    ws = wb.active
-    out = []
-    for r in range(start_row, end_row + 1):
-        d = ws[f"D{r}"].value
-        k = ws[f"K{r}"].value
-        if (d is None or (isinstance(d, str) and not d.strip())) and \
-           (k is None or (isinstance(k, str) and not str(k).strip())):
-            continue
-        out.append((d, k))
-    return out
+
+def _extract_D_K_rows(wb, start_row: int, end_row: Optional[int]):
+    try:
+        ws = wb.active
+        if end_row is None:
+            footer = find_footer_row(ws, start_row, SLIP_MARKER_COLS)
+            end_row = footer - 1 if footer is not None else None
+        out = []
+        # D(4) ~ K(11) 구간만 읽고 양 끝 값만 사용
+        for row in ws.iter_rows(min_row=start_row, max_row=end_row, min_col=4, max_col=11, values_only=True):
+            d = row[0] if row else None
+            k = row[7] if len(row) > 7 else None
+            if (d is None or (isinstance(d, str) and not d.strip())) and \
+               (k is None or (isinstance(k, str) and not str(k).strip())):
+                continue
+            out.append((d, k))
+        return out
+    finally:
+        wb.close()
 
 
 def pretty_print_pairs(pairs, title: str):
@@ -84,17 +106,17 @@ def extract_company_acen(d_value: str) -> str | None:
         return None
     return clean_company_name(m.group(1))
 
-def merge_by_company(rows: list[tuple[str, float]]) -> list[tuple[str, float]]:
+def merge_by_company(rows: list[tuple[str, int]]) -> list[tuple[str, int]]:
     """
     rows: [(회사명, 금액), ...]
-    같은 회사명은 금액 합산.
+    같은 회사명은 금액 합산 (원 단위 int).
     반환: [(회사명, 총금액), ...]
     """
-    acc = defaultdict(float)
+    acc = defaultdict(int)
     for name, amount in rows:
         if not name:
             continue
-        acc[name] += float(amount or 0)
+        acc[name] += parse_won(amount)
 
     # 정렬은 원하면 회사명 알파벳순/금액순 등 지정 가능
     return list(acc.items())
@@ -109,7 +131,7 @@ NAME_MAP_SUM = {
     "즐거운세상": "인터불고호텔",
 }
 
-def apply_sum_name_mapping(rows: list[tuple[str, float]]) -> list[tuple[str, float]]:
+def apply_sum_name_mapping(rows: list[tuple[str, int]]) -> list[tuple[str, int]]:
     """
     rows: [(회사명, 금액), ...]
     NAME_MAP_SUM 기준으로 이름 치환. 없으면 그대로 유지.
@@ -137,40 +159,59 @@ def _parse_month_cell(v) -> int | None:
     iv = int(m.group(1))
     return iv if 1 <= iv <= 12 else None
 
-def _build_name_row_map(ws, start_row=5, end_row=24, name_col="B") -> dict[str, int]:
+def _build_name_row_map(ws, start_row=SUM_START_ROW, end_row=None, name_col="B") -> dict[str, int]:
     """
-    B5:B24의 회사명 → 엑셀 행번호 매핑 딕셔너리 생성.
-    공백 트림해서 매칭 안정화.
+    B열 회사명 → 엑셀 행번호 매핑 딕셔너리.
+    end_row가 없으면 합계 행 직전까지 탐색 (워크시트별 1회 빌드 후 캐시).
     """
-    name_to_row = {}
-    for r in range(start_row, end_row + 1):
-        v = ws[f"{name_col}{r}"].value
-        if v is None:
-            continue
-        key = str(v).strip()
-        if key:
-            name_to_row[key] = r
-    return name_to_row
+    return row_index(ws, start_row=start_row, end_row=end_row, name_col=name_col).rows
 
-def _clear_year_data(ws: Worksheet, start_row=5, end_row=24,
+def _clear_year_data(ws: Worksheet, start_row=SUM_START_ROW, end_row=None,
                      start_col_letter="L", end_col_letter="W"):
     """
-    월별 값 영역(L5:W24)을 모두 비움(None).
-    회사명(B5:B24)과 헤더(L4:W4)는 유지.
+    월별 값 영역(L5:W{합계 직전})을 모두 비움(None).
+    회사명(B열)과 헤더(L4:W4)는 유지.
     """
+    if end_row is None:
+        end_row = find_table_end(ws, start_row, SUM_DEFAULT_END, SUM_MARKER_COLS)
     for r in range(start_row, end_row + 1):
         for c in range(ord(start_col_letter), ord(end_col_letter) + 1):
             ws[f"{chr(c)}{r}"].value = None
 
+def _append_missing_names(ws: Worksheet, index: RowIndex, names) -> list[str]:
+    """
+    B열 블록(index)에 없는 회사명을 마지막 회사명 아래 빈 행에 추가하고 index에도 등록.
+    빈 행이 모자라면 합계 행 위에 행을 삽입 (서식/합계 SUM 범위 함께 확장).
+    반환: 추가한 회사명 (입력 순서)
+    """
+    new = list(dict.fromkeys(k for k in (str(n).strip() for n in names) if k and k not in index))
+    if not new:
+        return []
+    last = max(index.rows.values(), default=index.start_row - 1)
+    needed = last - index.start_row + 1 + len(new)
+    if find_footer_row(ws, index.start_row, SUM_MARKER_COLS) is None:
+        # 합계 행이 없는 템플릿은 아래로 그냥 써도 덮어쓸 것이 없음
+        index.end_row = max(index.end_row, index.start_row + needed - 1)
+    else:
+        index.end_row = ensure_capacity(ws, index.start_row, index.end_row, needed)
+    for r, name in enumerate(new, start=last + 1):
+        ws[f"{index.name_col}{r}"] = name
+        index.rows[name] = r
+    return new
+
+@traced("sum.fill_sum_template")
 def fill_sum_template(
     mapped: dict,
     template_path: str | Path,
-    out_base_dir: str | Path,
+    out_base_dir: str | Path | Storage,
     *,
     settlement_month: datetime | None = None,   # ★ 전달된 정산월(전달)
     report_day: int | None = None,              # ★ 일(day)만
     date_fmt: str = "dots",
-) -> Path:
+    progress: NullProgress = NULL_PROGRESS,
+) -> StoredFile:
+    storage = get_storage(out_base_dir)
+
     # 1) 기준월 = 정산월(없으면 now)
     target = settlement_month or datetime.now()
 
@@ -182,20 +223,21 @@ def fill_sum_template(
 
     # === (NEW) 전달 파일을 우선 템플릿으로 사용 ===
     prev_month = target - relativedelta(months=1)
-    prev_dir = Path(out_base_dir) / prev_month.strftime("%Y") / prev_month.strftime("%m")
     prev_date_str = (
         prev_month.strftime("%y_%m") if date_fmt == "underscores" else prev_month.strftime("%y.%m")
     )
-    prev_candidate = prev_dir / f"업무실적_{prev_date_str}.xlsx"
+    prev_candidate = StoredFile(storage, month_key(prev_month, f"업무실적_{prev_date_str}.xlsx"))
+    storage.wait_pending(prev_month)   # 다른 워커가 전달 업무실적을 아직 저장 중이면 대기
 
     try:
         if prev_candidate.exists():
-            wb = load_workbook(prev_candidate)
+            with open_source(prev_candidate) as src:
+                wb = load_workbook(src)
         else:
-            wb = load_workbook(template_path)
+            wb = load_template(template_path)
     except Exception:
         # 혹시라도 열기 실패하면 기본 템플릿으로 폴백
-        wb = load_workbook(template_path)
+        wb = load_template(template_path)
 
     ws = wb.active
 
@@ -204,7 +246,7 @@ def fill_sum_template(
     month_num = target.month  # 1~12
 
     if month_num == 1:
-        _clear_year_data(ws, start_row=5, end_row=24, start_col_letter="L", end_col_letter="W")
+        _clear_year_data(ws, start_row=SUM_START_ROW, start_col_letter="L", end_col_letter="W")
         ws["A2"] = f"{yyyy}년 KT AICC 실적 현황"
     else:
         if not ws["A2"].value:
@@ -221,30 +263,74 @@ def fill_sum_template(
     if target_col_letter is None:
         raise RuntimeError(f"L4:W4에서 {month_num}월에 해당하는 열을 찾지 못했습니다.")
 
-    # ---- B5:B24 회사명 → 행번호 맵 ----
-    name_to_row = _build_name_row_map(ws, start_row=5, end_row=24, name_col="B")
+    # ---- B열 회사명 → 행번호 맵 (합계 행 직전까지) ----
+    name_index = row_index(ws, start_row=SUM_START_ROW, name_col="B")
+
+    # ---- 템플릿에 없는 업체는 B열 블록 끝(합계 행 위)에 행 추가 ----
+    items = list(mapped.items() if isinstance(mapped, dict) else mapped)
+    added = _append_missing_names(ws, name_index, [name for name, _ in items])
 
     # ---- mapped 값 쓰기 ----
-    items = mapped.items() if isinstance(mapped, dict) else mapped
-    missing = []
     for name, amount in items:
-        key = str(name).strip()
-        r = name_to_row.get(key)
-        if r is None:
-            missing.append(key)
-            continue
-        ws[f"{target_col_letter}{r}"] = float(amount)
+        r = name_index.get(name)
+        if r is not None:
+            ws[f"{target_col_letter}{r}"] = parse_won(amount)
 
     # ---- 저장: 폴더=정산월(YYYY/MM), 파일명=보고일(없으면 정산월) ----
-    out_dir = _make_yyyy_mm_dir(Path(out_base_dir), target)
     basis = report_date or target
     date_str = basis.strftime("%y_%m") if date_fmt == "underscores" else basis.strftime("%y.%m")
     out_name = f"업무실적_{date_str}.xlsx"
-    out_path = out_dir / out_name
+    out_path = storage.save_workbook(wb, month_key(target, out_name))
+    progress.add(workbooks_saved=1, companies_added=len(added))
+    set_attrs(companies=len(items), added=len(added), settlement_month=f"{target:%Y-%m}", key=out_path.key)
 
-    wb.save(out_path)
-
-    if missing:
-        print("[WARN] 템플릿 B5:B24에서 못 찾은 이름들:", ", ".join(sorted(set(missing))))
+    if added:
+        log.warning("업무실적 %s: 템플릿 B열에 없는 업체 %d곳을 행으로 추가: %s",
+                    out_path.key, len(added), ", ".join(added))
 
     return out_path
+
+@traced("sum.build_report")
+def build_sum_report(
+    base_dir: str | Path | Storage,
+    month_basis: datetime,
+    template_path: str | Path,
+    *,
+    aicc_file: StoredFile | None = None,
+    settlement_month: datetime | None = None,
+    report_day: int | None = None,
+    progress: NullProgress = NULL_PROGRESS,
+) -> StoredFile:
+    """
+    정산월(month_basis) 폴더의 AICC/ACEN 매출결의서 → 업체별 합산 → 업무실적 작성.
+    - aicc_file: 방금 만든 AICC 매출결의서 (없으면 정산월 폴더의 최신 AICC 파일)
+    - ACEN은 정산월 폴더에서 prefix로 검색
+    호출자가 storage.lock(month_basis)를 잡은 상태에서 호출 (전달 업무실적도 읽으므로 월 순서대로).
+    """
+    storage = get_storage(base_dir)
+    latest_aicc = aicc_file or find_latest_file_for_month(storage, month_basis, prefix="매출결의서_KT AICC")
+    latest_acen = find_latest_file_for_month(storage, month_basis, prefix="매출결의서_KT ACen")
+
+    merged_input = []
+    if latest_aicc and latest_aicc.exists():
+        for d, k in extract_D_K_rows(latest_aicc):
+            name = extract_company_aicc(d)
+            if name:
+                merged_input.append((name, k))
+
+    if latest_acen and latest_acen.exists():
+        for d, k in extract_D_K_rows(latest_acen):
+            name = extract_company_acen(d)
+            if name:
+                merged_input.append((name, k))
+
+    merged     = merge_by_company(merged_input)
+    mapped_sum = apply_sum_name_mapping(merged)
+    return fill_sum_template(
+        mapped_sum,
+        template_path,
+        out_base_dir=storage,
+        settlement_month=settlement_month,
+        report_day=report_day,
+        progress=progress,
+    )
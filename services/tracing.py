@@ -0,0 +1,312 @@
+# services/tracing.py
+from __future__ import annotations
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+# 요청 단위 트레이스 (느린 요청 하나를 단계별로 들여다보기 위함).
+# - 요청마다 루트 span, 파이프라인 함수는 span()/@traced 로 중첩 span을 만듦 (contextvars로 현재 span 추적)
+# - 샘플링은 루트에서 한 번 결정. 샘플링되지 않은 요청의 span()은 NOOP_SPAN (비용 거의 없음)
+# - 루트가 끝나면 트레이스 전체를 Zipkin v2 JSON(span 배열)으로 내보냄
+#     KT_TRACE_EXPORT=/path/traces.jsonl                   → 파일 (트레이스 1개 = 1줄)
+#     KT_TRACE_EXPORT=http://127.0.0.1:9411/api/v2/spans   → Zipkin/Jaeger/OTel collector (백그라운드 POST)
+#     미설정이면 끔
+# - KT_TRACE_SAMPLE: 0.0~1.0 (기본 1.0). 요청 헤더 X-B3-Sampled: 1/0 이면 그 값을 따름
+# - 같은 스레드(요청 처리 흐름)만 추적. 프로세스 풀/백그라운드 writer 안의 작업은 포함되지 않음
+
+log = logging.getLogger(__name__)
+
+TRACE_EXPORT = os.environ.get("KT_TRACE_EXPORT", "").strip()
+TRACE_SAMPLE = float(os.environ.get("KT_TRACE_SAMPLE") or 1.0)
+TRACE_SERVICE = os.environ.get("KT_TRACE_SERVICE") or "kt-auto-report"
+MAX_SPANS = 2000                    # 트레이스 하나에 담는 최대 span 수 (넘으면 버림)
+HTTP_BATCH = 50                     # collector로 한 번에 보내는 트레이스 수
+HTTP_QUEUE = 1000                   # 밀린 트레이스가 이만큼이면 새 트레이스는 버림
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+def _hex_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class _NoopSpan:
+    """샘플링되지 않았거나 트레이스 밖에서 만든 span."""
+
+    trace_id = ""
+    sampled = False
+
+    def set(self, **attrs: Any) -> None:
+        pass
+
+    def error(self, exc: BaseException | str) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+class _Trace:
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+        self.dropped = 0
+
+
+class Span(_NoopSpan):
+    sampled = True
+
+    def __init__(self, trace: _Trace, name: str, parent_id: Optional[str], kind: Optional[str] = None):
+        self.trace = trace
+        self.trace_id = trace.trace_id
+        self.id = _hex_id(64)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.tags: Dict[str, str] = {}
+        self.timestamp = int(time.time() * 1_000_000)
+        self._t0 = time.perf_counter()
+        self.duration: Optional[int] = None
+
+    def set(self, **attrs: Any) -> None:
+        for k, v in attrs.items():
+            if v is not None:
+                self.tags[k.replace("__", ".")] = v if isinstance(v, str) else json.dumps(v, ensure_ascii=False, default=str)
+
+    def error(self, exc: BaseException | str) -> None:
+        self.tags["error"] = exc if isinstance(exc, str) else f"{type(exc).__name__}: {exc}"
+
+    def end(self) -> None:
+        if self.duration is None:
+            self.duration = max(1, int((time.perf_counter() - self._t0) * 1_000_000))
+            if len(self.trace.spans) < MAX_SPANS:
+                self.trace.spans.append(self)
+            else:
+                self.trace.dropped += 1
+
+    def to_zipkin(self) -> dict:
+        out: Dict[str, Any] = {
+            "traceId": self.trace_id,
+            "id": self.id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "duration": self.duration or 1,
+            "localEndpoint": {"serviceName": TRACE_SERVICE},
+            "tags": self.tags,
+        }
+        if self.parent_id:
+            out["parentId"] = self.parent_id
+        if self.kind:
+            out["kind"] = self.kind
+        return out
+
+
+_current: ContextVar[Optional[Span]] = ContextVar("kt_current_span", default=None)
+
+
+def current_span() -> _NoopSpan:
+    return _current.get() or NOOP_SPAN
+
+
+def set_attrs(**attrs: Any) -> None:
+    """현재 span에 속성 추가 (키의 '__'는 '.'으로: file__size → file.size)"""
+    current_span().set(**attrs)
+
+
+# =========================
+# 루트 / 중첩 span
+# =========================
+def begin_trace(
+    name: str,
+    *,
+    trace_id: Optional[str] = None,
+    parent_id: Optional[str] = None,
+    sampled: Optional[bool] = None,
+    **attrs: Any,
+):
+    """
+    루트 span 시작. (span, token) 반환 → end_trace(span, token)로 종료/내보내기.
+    before_request/teardown_request 처럼 with 문으로 감쌀 수 없는 곳에서 사용.
+    """
+    if sampled is None:
+        sampled = bool(_exporter()) and random.random() < TRACE_SAMPLE
+    if not sampled or not _exporter():
+        return NOOP_SPAN, _current.set(None)
+    root = Span(_Trace(trace_id or _hex_id(128)), name, parent_id, kind="SERVER")
+    root.set(**attrs)
+    return root, _current.set(root)
+
+
+def end_trace(root: _NoopSpan, token, error: Optional[BaseException | str] = None) -> None:
+    try:
+        _current.reset(token)
+    except ValueError:                      # 다른 컨텍스트에서 종료 (스트리밍 응답 등)
+        _current.set(None)
+    if not isinstance(root, Span):
+        return
+    if error is not None:
+        root.error(error)
+    root.end()
+    trace = root.trace
+    if trace.dropped:
+        root.tags["trace.dropped_spans"] = str(trace.dropped)
+    exporter = _exporter()
+    if exporter is not None:
+        exporter.export([s.to_zipkin() for s in trace.spans])
+
+
+@contextmanager
+def start_trace(name: str, **kwargs: Any) -> Iterator[_NoopSpan]:
+    """CLI/스크립트용 루트 span (with 문)."""
+    root, token = begin_trace(name, **kwargs)
+    err: Optional[BaseException] = None
+    try:
+        yield root
+    except BaseException as e:
+        err = e
+        raise
+    finally:
+        end_trace(root, token, err)
+
+
+@contextmanager
+def span(name: str, **attrs: Any) -> Iterator[_NoopSpan]:
+    """현재 span 아래 자식 span. 트레이스 밖/샘플링 제외면 NOOP_SPAN."""
+    parent = _current.get()
+    if parent is None:
+        yield NOOP_SPAN
+        return
+    child = Span(parent.trace, name, parent.id)
+    child.set(**attrs)
+    token = _current.set(child)
+    try:
+        yield child
+    except BaseException as e:
+        child.error(e)
+        raise
+    finally:
+        child.end()
+        _current.reset(token)
+
+
+def traced(name: Optional[str] = None) -> Callable[[F], F]:
+    """함수 전체를 span으로 감싸는 데코레이터. 속성은 함수 안에서 set_attrs(...)로."""
+
+    def deco(fn: F) -> F:
+        span_name = name or f"{fn.__module__.rsplit('.', 1)[-1]}.{fn.__name__}"
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if _current.get() is None:
+                return fn(*args, **kwargs)
+            with span(span_name):
+                return fn(*args, **kwargs)
+
+        return wrapper  # type: ignore[return-value]
+
+    return deco
+
+
+# =========================
+# 내보내기 (Zipkin v2 JSON)
+# =========================
+class FileExporter:
+    """트레이스 1개 = span 배열 1줄. O_APPEND 한 번의 write라 워커 여러 개가 같은 파일에 써도 줄이 섞이지 않음."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[dict]) -> None:
+        line = json.dumps(spans, ensure_ascii=False, separators=(",", ":")) + "\n"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode("utf-8"))
+            finally:
+                os.close(fd)
+        except OSError as e:
+            log.warning("트레이스 파일 기록 실패: %s", e)
+
+
+class HttpExporter:
+    """Zipkin v2 /api/v2/spans 로 POST. 응답 경로를 막지 않도록 백그라운드 스레드에서 묶어 보냄. 실패분은 버림."""
+
+    def __init__(self, url: str, timeout: float = 2.0):
+        self.url = url
+        self.timeout = timeout
+        self._queue: "queue.Queue[List[dict]]" = queue.Queue(maxsize=HTTP_QUEUE)
+        self._thread: Optional[threading.Thread] = None
+        self._pid = 0
+        self._guard = threading.Lock()
+
+    def export(self, spans: List[dict]) -> None:
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(spans)
+        except queue.Full:
+            pass
+
+    def _ensure_thread(self) -> None:
+        # fork된 워커에는 스레드가 없으므로 워커마다 새로 띄움
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._guard:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._thread = threading.Thread(target=self._run, name="trace-export", daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = self._queue.get()
+            for _ in range(HTTP_BATCH - 1):
+                try:
+                    batch = batch + self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            req = urllib.request.Request(
+                self.url,
+                data=json.dumps(batch, ensure_ascii=False).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+                method="POST",
+            )
+            try:
+                urllib.request.urlopen(req, timeout=self.timeout).close()
+            except Exception as e:
+                log.warning("트레이스 전송 실패 (%d spans 버림): %s", len(batch), e)
+
+
+_exporter_obj: Any = None
+_exporter_target: Optional[str] = None
+
+
+def _exporter():
+    global _exporter_obj, _exporter_target
+    if _exporter_target != TRACE_EXPORT:
+        _exporter_target = TRACE_EXPORT
+        if not TRACE_EXPORT:
+            _exporter_obj = None
+        elif TRACE_EXPORT.startswith(("http://", "https://")):
+            _exporter_obj = HttpExporter(TRACE_EXPORT)
+        else:
+            _exporter_obj = FileExporter(TRACE_EXPORT)
+    return _exporter_obj
+
+
+def configure(export: Optional[str] = None, sample: Optional[float] = None) -> None:
+    """환경변수 대신 코드에서 설정 (도구/부하 테스트용)."""
+    global TRACE_EXPORT, TRACE_SAMPLE
+    if export is not None:
+        TRACE_EXPORT = export.strip()
+    if sample is not None:
+        TRACE_SAMPLE = float(sample)
@@ -0,0 +1,213 @@
+# services/uploads.py
+from __future__ import annotations
+import hashlib
+import json
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import IO, List, Optional, Tuple
+
+from services.atomic import path_lock, write_bytes_atomic
+
+# 재개 가능한 분할 업로드.
+# - POST로 업로드 세션 생성 → 조각(Content-Range)을 순서 무관/병렬로 PUT
+# - 조각은 받는 즉시 SHA-256 계산(클라이언트 값과 대조) 후 파일의 해당 offset에 기록
+# - 받은 구간 목록은 meta.json에 기록 (워커 간 공유, lock 파일로 직렬화)
+# - 모든 구간이 모이면 전체 SHA-256을 확정하고 complete 처리
+
+UPLOAD_CHUNK = 4 * 1024 * 1024          # 클라이언트 권장 조각 크기
+UPLOAD_MAX_SIZE = 200 * 1024 * 1024     # 파일 1개 최대 크기
+UPLOAD_TTL = 24 * 60 * 60               # 미완료/완료 세션 보관 시간(초)
+COPY_CHUNK = 1024 * 1024
+
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+_CONTENT_RANGE_RE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+
+
+class UploadError(ValueError):
+    def __init__(self, message: str, status: int = 400):
+        super().__init__(message)
+        self.status = status
+
+
+def parse_content_range(header: Optional[str]) -> Tuple[int, int, int]:
+    """'bytes start-end/total' → (start, end(포함), total)"""
+    m = _CONTENT_RANGE_RE.match((header or "").strip())
+    if not m:
+        raise UploadError("Content-Range 헤더가 필요합니다 (bytes start-end/total).")
+    start, end, total = (int(x) for x in m.groups())
+    if start > end or end >= total:
+        raise UploadError(f"잘못된 Content-Range: {header}", 416)
+    return start, end, total
+
+
+def _merge_ranges(ranges: List[List[int]], start: int, stop: int) -> List[List[int]]:
+    out: List[List[int]] = []
+    for s, e in sorted(ranges + [[start, stop]]):
+        if out and s <= out[-1][1]:
+            out[-1][1] = max(out[-1][1], e)
+        else:
+            out.append([s, e])
+    return out
+
+
+class UploadStore:
+    def __init__(self, root: Path | str):
+        self.root = Path(root)
+
+    # --- 경로 ---
+    def _dir(self, upload_id: str) -> Path:
+        if not _ID_RE.match(upload_id or ""):
+            raise UploadError("잘못된 업로드 ID입니다.", 404)
+        return self.root / upload_id
+
+    def _meta_path(self, upload_id: str) -> Path:
+        return self._dir(upload_id) / "meta.json"
+
+    def _data_path(self, meta: dict) -> Path:
+        # openpyxl은 확장자로 형식을 판단하므로 원본 확장자를 유지
+        return self._dir(meta["id"]) / ("data" + Path(meta["filename"]).suffix.lower())
+
+    def _lock(self, upload_id: str):
+        return path_lock(self._dir(upload_id) / ".lock")
+
+    def _load(self, upload_id: str) -> dict:
+        try:
+            return json.loads(self._meta_path(upload_id).read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            raise UploadError("업로드를 찾을 수 없습니다 (만료되었거나 없는 ID).", 404)
+
+    def _save(self, meta: dict) -> None:
+        write_bytes_atomic(self._meta_path(meta["id"]), json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    # --- 세션 ---
+    def create(self, filename: str, size: int, sha256: Optional[str] = None) -> dict:
+        if size <= 0 or size > UPLOAD_MAX_SIZE:
+            raise UploadError(f"파일 크기가 허용 범위를 벗어났습니다: {size}", 413)
+        self.cleanup()
+        upload_id = uuid.uuid4().hex
+        d = self._dir(upload_id)
+        d.mkdir(parents=True)
+        meta = {
+            "id": upload_id,
+            "filename": filename,
+            "size": size,
+            "sha256": (sha256 or "").lower() or None,
+            "created": time.time(),
+            "received": [],
+            "complete": False,
+            "digest": None,
+        }
+        with open(self._data_path(meta), "wb") as f:
+            f.truncate(size)
+        self._save(meta)
+        return self.status(upload_id, meta)
+
+    def status(self, upload_id: str, meta: Optional[dict] = None) -> dict:
+        meta = meta or self._load(upload_id)
+        received = meta["received"]
+        offset = received[0][1] if received and received[0][0] == 0 else 0
+        return {
+            "id": meta["id"],
+            "filename": meta["filename"],
+            "size": meta["size"],
+            "received": received,
+            "offset": offset,                 # 앞에서부터 연속으로 받은 바이트 수 (재개 지점)
+            "complete": meta["complete"],
+            "digest": meta["digest"],
+            "chunk_size": UPLOAD_CHUNK,
+        }
+
+    def write_chunk(
+        self,
+        upload_id: str,
+        content_range: str,
+        stream: IO[bytes],
+        chunk_sha256: Optional[str] = None,
+    ) -> Tuple[dict, bool]:
+        """
+        조각 기록. 반환: (status, 이번 조각으로 완료되었는지)
+        같은 구간을 다시 보내도 안전 (덮어쓰기).
+        """
+        meta = self._load(upload_id)
+        start, end, total = parse_content_range(content_range)
+        if total != meta["size"]:
+            raise UploadError(f"전체 크기가 다릅니다: {total} != {meta['size']}", 416)
+        if meta["complete"]:
+            return self.status(upload_id, meta), False
+
+        # 1) 받는 즉시 해시하면서 해당 offset에 기록
+        expected = end - start + 1
+        h = hashlib.sha256()
+        written = 0
+        fd = os.open(str(self._data_path(meta)), os.O_WRONLY)
+        try:
+            while written < expected:
+                buf = stream.read(min(COPY_CHUNK, expected - written))
+                if not buf:
+                    break
+                h.update(buf)
+                os.pwrite(fd, buf, start + written)
+                written += len(buf)
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+        if written != expected:
+            raise UploadError(f"조각 길이가 다릅니다: {written} != {expected}")
+        if chunk_sha256 and h.hexdigest() != chunk_sha256.lower():
+            raise UploadError("조각 SHA-256이 일치하지 않습니다. 다시 보내주세요.", 422)
+
+        # 2) 받은 구간 갱신 (다른 워커의 동시 갱신과 직렬화)
+        with self._lock(upload_id):
+            meta = self._load(upload_id)
+            meta["received"] = _merge_ranges(meta["received"], start, end + 1)
+            completed_now = False
+            if not meta["complete"] and meta["received"] == [[0, meta["size"]]]:
+                meta["digest"] = self._file_digest(meta)
+                if meta["sha256"] and meta["digest"] != meta["sha256"]:
+                    # 전체 해시 불일치 → 처음부터 다시 받도록 초기화
+                    meta["received"] = []
+                    self._save(meta)
+                    raise UploadError("파일 SHA-256이 일치하지 않습니다. 다시 업로드해주세요.", 422)
+                meta["complete"] = completed_now = True
+            self._save(meta)
+        return self.status(upload_id, meta), completed_now
+
+    def _file_digest(self, meta: dict) -> str:
+        h = hashlib.sha256()
+        with open(self._data_path(meta), "rb") as f:
+            for buf in iter(lambda: f.read(COPY_CHUNK), b""):
+                h.update(buf)
+        return h.hexdigest()
+
+    # --- 완료된 파일 ---
+    def completed(self, upload_id: str) -> Tuple[str, Path]:
+        """(원본 파일명, 데이터 경로). 미완료면 UploadError."""
+        meta = self._load(upload_id)
+        if not meta["complete"]:
+            raise UploadError(f"업로드가 끝나지 않았습니다: {meta['filename']}", 409)
+        return meta["filename"], self._data_path(meta)
+
+    def save_partial(self, upload_id: str, partial: dict) -> None:
+        write_bytes_atomic(self._dir(upload_id) / "partial.json", json.dumps(partial, ensure_ascii=False).encode("utf-8"))
+
+    def load_partial(self, upload_id: str) -> Optional[dict]:
+        try:
+            return json.loads((self._dir(upload_id) / "partial.json").read_text(encoding="utf-8"))
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def cleanup(self, max_age: int = UPLOAD_TTL) -> None:
+        if not self.root.is_dir():
+            return
+        cutoff = time.time() - max_age
+        for d in self.root.iterdir():
+            try:
+                if d.is_dir() and _ID_RE.match(d.name) and d.stat().st_mtime < cutoff:
+                    shutil.rmtree(d, ignore_errors=True)
+            except OSError:
+                continue
@@ -0,0 +1,441 @@
+# services/writebehind.py
+from __future__ import annotations
+import atexit
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from contextlib import ExitStack, contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from typing import IO, Dict, Iterator, List, Optional
+
+from services.atomic import PENDING_LOCK_NAME, LOCK_NAME, hold_lock, path_lock, release_lock, write_bytes_atomic
+from services.output_index import record_outputs
+from services.storage import COPY_CHUNK, ObjectInfo, Storage, month_prefix
+from services.tracing import span
+
+# 산출물 write-behind 저장소.
+# 정산월 잠금(lock) 안에서 쓴 산출물은 메모리에만 올려 두고 바로 응답에 사용하고,
+# 잠금을 나갈 때 백그라운드 writer 스레드가 실제 저장소(로컬/NFS/S3)에 저장 + 인덱스 기록.
+#
+# 워커 간 일관성:
+#   - 세션(정산월 잠금 1회)은 YYYY/MM/.pending.lock 을 잡고 시작해서, writer가 저장을 끝낸 뒤에 풂
+#   - 다른 워커의 Storage.lock / wait_pending 은 이 잠금이 풀릴 때까지 기다림
+#     → 같은 정산월 업무실적(ACEN/전달 업무실적 읽기)은 항상 저장이 끝난 파일을 봄
+#   - 같은 프로세스에서는 저장 전이라도 메모리 사본을 그대로 읽음
+#
+# 내구성 / 실패 처리:
+#   - 잠금을 나갈 때(응답 전에) 산출물을 journal_dir에 (메타 json + 데이터) fsync 기록, 저장이 끝나면 지움
+#     → 워커가 SIGKILL/OOM 등으로 죽어도 저장 안 된 산출물은 저널에 남음
+#   - 죽은 워커의 저널 항목은 다른 워커가 이어받아 저장. 같은 정산월 잠금/wait_pending 진입 시에는 먼저 저장
+#     (다음 달 업무실적이 전달 파일 없이 빈 템플릿에서 다시 시작하지 않도록)
+#   - 몇 번 바로 재시도 후에도 실패하면 잠금을 풀고, 저널 항목을 백오프로 계속 재시도
+
+log = logging.getLogger(__name__)
+
+WRITE_ATTEMPTS = 3                 # 바로 재시도 횟수 (0.2s, 0.4s 간격)
+RETRY_BASE = 5.0                   # 저널 재시도 백오프 시작 (초), 최대 RETRY_MAX
+RETRY_MAX = 300.0
+JOURNAL_LOCK_NAME = ".journal.lock"
+MAX_PENDING_BYTES = int(os.environ.get("KT_WRITE_BEHIND_MAX_BYTES") or 256 * 1024 * 1024)
+
+
+@dataclass
+class _Pending:
+    key: str
+    data: bytes
+    mtime: float = field(default_factory=time.time)
+    jid: Optional[str] = None                                 # 저널 항목 ID (저장 전까지 남아 있음)
+
+    def info(self) -> ObjectInfo:
+        return ObjectInfo(self.key, len(self.data), self.mtime, f"wb-{int(self.mtime * 1e6):x}-{len(self.data):x}")
+
+
+@dataclass
+class _Session:
+    when: datetime
+    fd: int                                                   # .pending.lock (writer가 저장 후 해제)
+    writes: List[_Pending] = field(default_factory=list)
+
+
+class WriteBehindStorage(Storage):
+    """
+    inner 저장소를 감싸는 write-behind 계층. 잠금 밖에서의 쓰기는 그대로 동기 저장.
+    synchronous=True면 잠금을 나갈 때 호출 스레드에서 바로 저장 (KT_WRITE_BEHIND=0).
+    """
+
+    def __init__(self, inner: Storage, journal_dir: Path | str, *, synchronous: bool = False):
+        self.inner = inner
+        self.journal_dir = Path(journal_dir)
+        self.synchronous = synchronous
+        self._pending: Dict[str, _Pending] = {}
+        self._pending_bytes = 0
+        self._guard = threading.Lock()
+        self._local = threading.local()
+        self._queue: "queue.Queue[_Session]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_pid = 0
+        self._inflight: set = set()                           # 이 워커가 아직 저장 중인 저널 ID (재시도 대상 아님)
+        atexit.register(self.flush, 30.0)
+
+    def __repr__(self) -> str:
+        return f"WriteBehindStorage({self.inner!r})"
+
+    # ---------- 세션 ----------
+    def _sessions(self) -> Dict[str, _Session]:
+        s = getattr(self._local, "sessions", None)
+        if s is None:
+            s = self._local.sessions = {}
+        return s
+
+    def lock_path(self, when: datetime, name: str = LOCK_NAME) -> Path:
+        return self.inner.lock_path(when, name)
+
+    @contextmanager
+    def lock(self, when: Optional[datetime] = None):
+        when = when or datetime.now()
+        sessions = self._sessions()
+        prefix = month_prefix(when)
+        if prefix in sessions:                                 # 같은 스레드 중첩 진입
+            yield
+            return
+        with ExitStack() as stack:
+            with span("storage.lock_wait", month=f"{when:%Y-%m}"):
+                stack.enter_context(path_lock(self.lock_path(when)))
+                # 앞선 세션(이 워커/다른 워커)의 저장이 끝나야 진입
+                session = _Session(when, hold_lock(self.lock_path(when, PENDING_LOCK_NAME)))
+                pending = ExitStack()
+                pending.callback(release_lock, session.fd)    # 세션을 _commit에 넘기기 전에 실패하면 바로 해제
+                stack.enter_context(pending)
+                self._replay_month(when)                      # 죽은 워커가 남긴 이 달 산출물 먼저 저장
+            sessions[prefix] = session
+            try:
+                yield
+            finally:
+                del sessions[prefix]
+                pending.pop_all()                             # 이제부터 해제는 _commit/_persist 담당
+                self._commit(session)
+
+    def wait_pending(self, when: datetime) -> None:
+        if month_prefix(when) in self._sessions():
+            return
+        self.inner.wait_pending(when)
+        self._replay_month(when)
+
+    def _commit(self, session: _Session) -> None:
+        if not session.writes:
+            release_lock(session.fd)
+            return
+        with self._guard:
+            backlog = self._pending_bytes
+        if self.synchronous or backlog > MAX_PENDING_BYTES:
+            self._persist(session)                            # 밀린 양이 많으면 호출 스레드에서 직접 저장
+            return
+        # 응답 전에 저널에 남김 (저장 전에 워커가 죽어도 다른 워커가 이어서 저장)
+        try:
+            for entry in session.writes:
+                self._journal(entry)
+        except Exception:
+            log.exception("write-behind 저널 기록 실패, 바로 저장합니다")
+            self._persist(session)
+            return
+        self._ensure_writer()
+        self._queue.put(session)
+
+    # ---------- 쓰기 ----------
+    @contextmanager
+    def open_write(self, key: str):
+        session = self._sessions().get(key.rsplit("/", 1)[0] + "/")
+        if session is None:
+            with self.inner.open_write(key) as f:
+                yield f
+            return
+        buf = BytesIO()
+        yield buf
+        entry = _Pending(key, buf.getvalue())
+        with self._guard:
+            old = self._pending.get(key)
+            if old is not None:
+                self._pending_bytes -= len(old.data)
+            self._pending[key] = entry
+            self._pending_bytes += len(entry.data)
+        session.writes.append(entry)
+
+    # ---------- 읽기 (저장 전 메모리 사본 우선) ----------
+    def _get(self, key: str) -> Optional[_Pending]:
+        with self._guard:
+            return self._pending.get(key)
+
+    def open_read(self, key: str, seekable: bool = False) -> IO[bytes]:
+        entry = self._get(key)
+        if entry is not None:
+            return BytesIO(entry.data)
+        return self.inner.open_read(key, seekable=seekable)
+
+    def iter_range(self, key: str, start: int, length: int, chunk: int = COPY_CHUNK) -> Iterator[bytes]:
+        entry = self._get(key)
+        if entry is None:
+            yield from self.inner.iter_range(key, start, length, chunk)
+            return
+        view = memoryview(entry.data)[start:start + length]
+        for i in range(0, len(view), chunk):
+            yield bytes(view[i:i + chunk])
+
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        entry = self._get(key)
+        return entry.info() if entry is not None else self.inner.stat(key)
+
+    def list(self, prefix: str = "") -> List[ObjectInfo]:
+        with self._guard:
+            pending = {k: e.info() for k, e in self._pending.items() if k.startswith(prefix)}
+        out = [o for o in self.inner.list(prefix) if o.key not in pending]
+        return out + list(pending.values())
+
+    def subdirs(self, prefix: str = "") -> List[str]:
+        out = set(self.inner.subdirs(prefix))
+        with self._guard:
+            for k in self._pending:
+                rest = k[len(prefix):].split("/") if k.startswith(prefix) else []
+                if len(rest) > 1:
+                    out.add(rest[0])
+        return sorted(out)
+
+    def delete(self, key: str) -> None:
+        self._drop(self._get(key))
+        self.inner.delete(key)
+
+    def local_path(self, key: str) -> Optional[Path]:
+        if self._get(key) is not None:
+            return None                                       # 아직 디스크에 없음 → open()으로 메모리에서
+        return self.inner.local_path(key)
+
+    def _drop(self, entry: Optional[_Pending]) -> None:
+        if entry is None:
+            return
+        with self._guard:
+            if self._pending.get(entry.key) is entry:
+                del self._pending[entry.key]
+                self._pending_bytes -= len(entry.data)
+
+    # ---------- writer ----------
+    def _ensure_writer(self) -> None:
+        # gunicorn --preload 등으로 fork된 뒤에는 스레드가 없으므로 워커마다 새로 띄움
+        if self._writer is not None and self._writer.is_alive() and self._writer_pid == os.getpid():
+            return
+        with self._guard:
+            if self._writer is not None and self._writer.is_alive() and self._writer_pid == os.getpid():
+                return
+            self._writer_pid = os.getpid()
+            self._writer = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._writer.start()
+
+    def _run(self) -> None:
+        next_retry = 0.0
+        while True:
+            try:
+                session = self._queue.get(timeout=RETRY_BASE)
+            except queue.Empty:
+                session = None
+            if session is not None:
+                try:
+                    self._persist(session)
+                except Exception:
+                    log.exception("write-behind 세션 저장 실패")   # writer 스레드는 계속 (다음 세션 처리)
+                finally:
+                    self._queue.task_done()
+            if time.time() >= next_retry:
+                next_retry = time.time() + RETRY_BASE
+                try:
+                    self.retry_journal()
+                except Exception:
+                    log.exception("write-behind 저널 재시도 실패")
+
+    def _persist(self, session: _Session) -> None:
+        saved: List[ObjectInfo] = []
+        try:
+            for entry in session.writes:
+                try:
+                    saved.append(self._write_with_retry(entry))
+                except Exception as e:
+                    log.error("산출물 저장 실패, 저널에서 재시도: %s (%s)", entry.key, e)
+                    self._journal_failure(entry, e)
+                    continue
+                self._drop(entry)
+                self._unjournal(entry.jid)
+            if saved:
+                try:
+                    record_outputs(self.inner, saved)
+                except Exception:
+                    log.exception("산출물 인덱스 기록 실패")
+        finally:
+            release_lock(session.fd)
+
+    def _write_with_retry(self, entry: _Pending) -> ObjectInfo:
+        for attempt in range(WRITE_ATTEMPTS):
+            try:
+                self.inner.write_bytes(entry.key, entry.data)
+                break
+            except Exception:
+                if attempt == WRITE_ATTEMPTS - 1:
+                    raise
+                time.sleep(0.2 * 2 ** attempt)
+        return self.inner.stat(entry.key) or entry.info()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """큐에 쌓인 세션을 모두 저장할 때까지 대기 (저널로 넘어간 항목은 제외). 다 비우면 True."""
+        deadline = None if timeout is None else time.time() + timeout
+        while self._queue.unfinished_tasks:
+            if self._writer is None or not self._writer.is_alive():
+                return False
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(0.02)
+        return True
+
+    # ---------- 저널 (저장 전 산출물 / 저장 실패분 영속 재시도) ----------
+    def _journal(self, entry: _Pending) -> None:
+        jid = uuid.uuid4().hex
+        write_bytes_atomic(self.journal_dir / f"{jid}.bin", entry.data)
+        self._write_meta(jid, {
+            "key": entry.key,
+            "created": entry.mtime,
+            "attempts": 0,
+            "next_retry": time.time(),                        # 주인 워커가 죽으면 바로 이어받음
+            "pid": os.getpid(),
+        })
+        entry.jid = jid
+        with self._guard:
+            self._inflight.add(jid)
+
+    def _journal_failure(self, entry: _Pending, error: Exception) -> None:
+        """저장 실패한 쓰기를 저널 재시도로 넘김. 저널에도 못 남기면 메모리 사본만 버리고 로그 (다른 쓰기는 계속)"""
+        try:
+            if entry.jid is None:
+                self._journal(entry)
+            self._journal_failed(entry.jid, error)
+        except Exception:
+            log.exception("저널 기록도 실패, 산출물을 저장하지 못했습니다: %s", entry.key)
+            self._drop(entry)
+        finally:
+            with self._guard:
+                self._inflight.discard(entry.jid)
+        if self.synchronous:
+            self._drop(entry)                                 # 동기 모드는 메모리 사본을 남기지 않음 (저널에서 재시도)
+
+    def _journal_failed(self, jid: str, error: Exception) -> None:
+        meta = self._read_meta(jid) or {}
+        attempts = meta.get("attempts", 0) + WRITE_ATTEMPTS
+        meta.update(
+            attempts=attempts,
+            next_retry=time.time() + min(RETRY_MAX, RETRY_BASE * 2 ** (attempts // WRITE_ATTEMPTS - 1)),
+            error=str(error),
+            pid=os.getpid(),
+        )
+        self._write_meta(jid, meta)
+
+    def _unjournal(self, jid: Optional[str]) -> None:
+        if jid is None:
+            return
+        for suffix in (".json", ".bin"):                      # 메타 먼저 지워 다른 워커가 항목을 보지 않게
+            try:
+                (self.journal_dir / f"{jid}{suffix}").unlink()
+            except FileNotFoundError:
+                pass
+        with self._guard:
+            self._inflight.discard(jid)
+
+    def _write_meta(self, jid: str, meta: dict) -> None:
+        write_bytes_atomic(self.journal_dir / f"{jid}.json", json.dumps(meta, ensure_ascii=False).encode("utf-8"))
+
+    def _read_meta(self, jid: str) -> Optional[dict]:
+        try:
+            return json.loads((self.journal_dir / f"{jid}.json").read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+
+    def journal_entries(self) -> List[dict]:
+        if not self.journal_dir.is_dir():
+            return []
+        out = []
+        for p in sorted(self.journal_dir.glob("*.json")):
+            try:
+                meta = json.loads(p.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            meta["id"] = p.stem
+            out.append(meta)
+        return out
+
+    def _replay_month(self, when: datetime) -> None:
+        """이 정산월의 주인 없는(죽은 워커) 저널 항목을 재시도 시점과 관계없이 지금 저장."""
+        prefix = month_prefix(when)
+        if any(m["key"].startswith(prefix) for m in self.journal_entries()):
+            self.retry_journal(prefix=prefix, force=True)
+
+    def retry_journal(self, prefix: Optional[str] = None, force: bool = False) -> int:
+        """
+        재시도 시점이 된 저널 항목 저장. 저장 중인 항목(이 워커)과 주인 워커가 살아 있는 항목은 건너뜀.
+        prefix: 이 키 접두어(정산월)만, force: 재시도 시점 무시. 저장한 개수 반환.
+        """
+        done = 0
+        for meta in self.journal_entries():
+            if prefix is not None and not meta["key"].startswith(prefix):
+                continue
+            with self._guard:
+                inflight = meta["id"] in self._inflight
+            if inflight or (meta.get("pid") != os.getpid() and _pid_alive(meta.get("pid"))):
+                continue
+            if not force and meta.get("next_retry", 0) > time.time():
+                continue
+            # 저널 전체 잠금 하나로 직렬화 (항목별 잠금 파일은 지운 뒤 다른 inode를 잠그는 경쟁이 생김)
+            with path_lock(self.journal_dir / JOURNAL_LOCK_NAME):
+                jid, key, created = meta["id"], meta["key"], meta["created"]
+                bin_path = self.journal_dir / f"{jid}.bin"
+                if not bin_path.exists():
+                    continue                                   # 다른 워커가 먼저 처리
+                # 정산월 잠금은 잡지 않음 (writer 스레드가 큐의 세션을 기다리는 교착 방지).
+                # 대신 저장소/메모리에 더 새 버전이 있으면 덮어쓰지 않음.
+                current = self.inner.stat(key)
+                newer = self._get(key)
+                if (current is None or current.mtime < created) and (newer is None or newer.mtime <= created):
+                    try:
+                        info = self._write_with_retry(_Pending(key, bin_path.read_bytes(), created))
+                        record_outputs(self.inner, [info])
+                    except Exception as e:
+                        self._journal_failed(jid, e)
+                        log.warning("저널 재시도 실패: %s (%s)", key, e)
+                        continue
+                # 저장 완료 또는 더 새 파일이 이미 있음 → 메모리 사본/저널 정리
+                if newer is not None and newer.mtime == created:
+                    self._drop(newer)
+                self._unjournal(jid)
+                done += 1
+        return done
+
+    def recover(self) -> int:
+        """
+        시작 시 호출: 죽은 워커가 남긴 저널 항목을 바로 재시도.
+        아직 저장 못 한 항목은 writer 스레드가 이어서 재시도.
+        """
+        if not self.journal_entries():
+            return 0
+        self._ensure_writer()
+        return self.retry_journal()
+
+
+def _pid_alive(pid) -> bool:
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True                                           # 권한 없음 → 살아 있음
+    return True
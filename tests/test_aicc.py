@@ -0,0 +1,19 @@
+# tests/test_aicc.py
+from __future__ import annotations
+from datetime import datetime
+from decimal import Decimal
+
+from services.aicc import FilePartial
+
+
+def test_partial_round_trip():
+    part = FilePartial(datetime(2025, 7, 1), 3, [["A사", "모집수수료", 3000], ["B사", "개발비용", Decimal("1.5")]])
+    assert FilePartial.from_json(part.to_json()).groups == part.groups
+    assert FilePartial.from_columns(memoryview(part.to_columns())).groups == part.groups
+
+
+def test_partial_with_non_json_keys_is_not_cached():
+    for key in (datetime(2025, 7, 1), Decimal("1.5")):
+        part = FilePartial(None, 1, [[key, "모집수수료", 3000]])
+        assert part.to_json() is None
+        assert part.to_columns() is None
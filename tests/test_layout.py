@@ -0,0 +1,37 @@
+# tests/test_layout.py
+from __future__ import annotations
+
+from openpyxl import Workbook
+
+from services.layout import _shift_formula, ensure_capacity
+
+
+def test_shift_same_sheet_refs():
+    assert _shift_formula("=SUM(K11:K25)", 26, 3, 25) == "=SUM(K11:K28)"
+    assert _shift_formula("=K30*2", 26, 3, 25) == "=K33*2"
+    assert _shift_formula("=K11", 26, 3, 25) == "=K11"
+
+
+def test_other_sheet_refs_are_kept():
+    assert _shift_formula("=Sheet2!A40+K30", 26, 3, 25, "Sheet1") == "=Sheet2!A40+K33"
+    assert _shift_formula("='Other Sheet'!K30", 26, 3, 25, "Sheet1") == "='Other Sheet'!K30"
+    assert _shift_formula("=Sheet2!A40", 26, 3, 25) == "=Sheet2!A40"
+    # 같은 시트 이름을 붙인 참조는 이동
+    assert _shift_formula("='Sheet1'!K30+Sheet1!K11:K25", 26, 3, 25, "Sheet1") == "='Sheet1'!K33+Sheet1!K11:K28"
+
+
+def test_string_literals_are_kept():
+    assert _shift_formula('=IF(K30>0,"K30 초과","")', 26, 3, 25) == '=IF(K33>0,"K30 초과","")'
+    assert _shift_formula('="say ""A40"""&A40', 26, 3, 25) == '="say ""A40"""&A43'
+
+
+def test_ensure_capacity_keeps_other_sheet_refs():
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "매출결의서"
+    other = wb.create_sheet("Other")
+    other["K30"] = 1
+    ws["A26"] = "합계"
+    ws["K26"] = "=SUM(K11:K25)+'Other'!K30"
+    assert ensure_capacity(ws, 11, 25, 18) == 28
+    assert ws["K29"].value == "=SUM(K11:K28)+'Other'!K30"
@@ -0,0 +1,30 @@
+# tests/test_money.py
+from __future__ import annotations
+from datetime import date, datetime, time
+from decimal import Decimal
+
+import pytest
+
+from services.money import parse_amount, parse_amounts, parse_won, try_parse_amount, try_parse_amounts
+
+
+@pytest.mark.parametrize("val", [datetime(2025, 7, 1), date(2025, 7, 1), time(9, 30)])
+def test_date_cells_are_not_amounts(val):
+    # 날짜 서식 셀: try_* 는 None(ACEN은 건너뜀), parse_* 는 0(AICC 기존 동작)
+    assert try_parse_amount(val) is None
+    assert try_parse_amounts([1000, val]) == [1000, None]
+    assert parse_amount(val) == 0
+    assert parse_won(val) == 0
+    assert parse_amounts([1000, val]) == [1000, 0]
+
+
+def test_parse_amounts_still_rejects_text():
+    with pytest.raises(ValueError):
+        parse_amounts([1000, "abc"])
+
+
+def test_exact_amounts():
+    assert try_parse_amount("1,234") == 1234
+    assert try_parse_amount(1234.5) == Decimal("1234.5")
+    assert try_parse_amount("") is None
+    assert parse_amount(None) == 0
@@ -0,0 +1,413 @@
+# tools/loadtest.py
+"""
+로컬 부하 테스트: gunicorn으로 app을 띄우고 /run/acen, /run/aicc 업로드를 동시에 재생.
+
+    python tools/loadtest.py --workers 4 --concurrency 8 --requests 40 --aicc-rows 5000
+
+- 입력 워크북(ACEN/AICC)은 지정한 크기로 생성 (--months 개의 정산월에 나눠 배분)
+- 템플릿은 --templates 로 지정하지 않으면 같은 레이아웃의 최소 템플릿을 생성
+- 산출물/업로드는 임시 디렉토리에만 씀 (KT_OUTPUT_STORAGE / KT_UPLOAD_DIR)
+- 결과: 처리량(req/s), p50/p95/p99 지연, 오류율, 워커별 최대 RSS
+  (--url 로 이미 떠 있는 서버를 쓰면 gunicorn 기동/RSS 측정은 생략)
+"""
+from __future__ import annotations
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime
+from io import BytesIO
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from dateutil.relativedelta import relativedelta
+from openpyxl import Workbook
+
+# (옵션) 있으면 RSS 측정에 사용, 없으면 /proc 직접 읽음 (Linux)
+try:
+    import psutil  # type: ignore
+except Exception:
+    psutil = None
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+ACEN_VENDORS = ["남이섬", "엠지브이보안", "즐거운세상", "더늘푸른", "웰스라이프"]
+AICC_VENDORS = ["(주)오토피온", "(주)캐럿솔루션즈", "주식회사 브리지텍", "익산시청", "유성구청", "(주)엠지브이보안시스템"]
+SUM_NAMES = ["오토피온", "캐럿솔루션즈", "브리지텍", "익산시청", "유성구청", "엠지브이보안시스템",
+             "남이섬", "더늘푸른", "웰스라이프"]
+
+
+# =========================
+# 입력/템플릿 생성
+# =========================
+def _xlsx_bytes(wb: Workbook) -> bytes:
+    bio = BytesIO()
+    wb.save(bio)
+    return bio.getvalue()
+
+
+def make_acen(month: datetime, rows: int, rnd: random.Random) -> bytes:
+    """A2 = 원본 월(정산월 - 1개월), P = 업체, BI = 금액"""
+    wb = Workbook()
+    ws = wb.active
+    ws["A2"] = (month - relativedelta(months=1)).strftime("%Y-%m")
+    for r in range(3, 3 + rows):
+        ws[f"P{r}"] = rnd.choice(ACEN_VENDORS)
+        ws[f"BI{r}"] = rnd.choice([1000, 2500, 3300, 12345, 98000])
+    return _xlsx_bytes(wb)
+
+
+def make_aicc(month: datetime, rows: int, rnd: random.Random) -> bytes:
+    """A4 = 정산월(YYYYMM), 7행부터 B/G/H/M"""
+    wb = Workbook()
+    ws = wb.active
+    ws["A4"] = month.strftime("%Y%m")
+    for r in range(7, 7 + rows):
+        g = rnd.randint(1, 500)
+        ws[f"B{r}"] = rnd.choice(AICC_VENDORS)
+        ws[f"G{r}"] = g
+        ws[f"H{r}"] = g * 3 if rnd.random() < 0.5 else rnd.choice([20000, 1500000, 35000])
+        ws[f"M{r}"] = rnd.choice(["IB 상담", "OB 발신", "챗봇"])
+    return _xlsx_bytes(wb)
+
+
+def make_templates(out: Path) -> Path:
+    """매출결의서(11~25행 + 26행 합계) / 업무실적(B5~ 이름, L~W 월) 최소 템플릿"""
+    out.mkdir(parents=True, exist_ok=True)
+    for name in ["AICC 매출결의서.xlsx", "Acen 매출결의서.xlsx"]:
+        wb = Workbook()
+        ws = wb.active
+        ws["A10"], ws["D10"], ws["K10"] = "No", "내용", "금액"
+        ws["A26"], ws["K26"] = "합계", "=SUM(K11:K25)"
+        wb.save(out / name)
+    wb = Workbook()
+    ws = wb.active
+    for i, col in enumerate("LMNOPQRSTUVW", start=1):
+        ws[f"{col}4"] = f"{i}월"
+    for r, name in enumerate(SUM_NAMES, start=5):
+        ws[f"B{r}"] = name
+    ws["B25"] = "합계"
+    wb.save(out / "업무실적.xlsx")
+    return out
+
+
+# =========================
+# HTTP
+# =========================
+def _multipart(fields: Sequence[Tuple[str, str]], files: Sequence[Tuple[str, str, bytes]]) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    parts: List[bytes] = []
+    for name, value in fields:
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for name, filename, data in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: application/octet-stream\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+@dataclass
+class Sample:
+    kind: str
+    status: int
+    latency: float          # 초
+    size: int               # 응답 바이트
+    error: str = ""
+
+    @property
+    def ok(self) -> bool:
+        # 실패 시 앱은 flash + 302(홈)로 응답하므로 200 + 본문만 성공으로 셈
+        return self.status == 200 and not self.error
+
+
+def post(url: str, path: str, body: bytes, content_type: str, kind: str, timeout: float) -> Sample:
+    u = urlparse(url)
+    t0 = time.perf_counter()
+    conn = http.client.HTTPConnection(u.hostname, u.port or 80, timeout=timeout)
+    try:
+        conn.request("POST", path, body=body, headers={"Content-Type": content_type})
+        res = conn.getresponse()
+        data = res.read()
+        ctype = res.getheader("Content-Type", "")
+        error = "" if res.status == 200 and "text/html" not in ctype else f"HTTP {res.status} {res.getheader('Location', '')}"
+        return Sample(kind, res.status, time.perf_counter() - t0, len(data), error)
+    except (OSError, http.client.HTTPException) as e:
+        return Sample(kind, 0, time.perf_counter() - t0, 0, f"{type(e).__name__}: {e}")
+    finally:
+        conn.close()
+
+
+def build_requests(args, rnd: random.Random) -> List[Tuple[str, bytes, str, str]]:
+    """[(kind, body, content_type, path)] — 정산월을 돌아가며 배정"""
+    base = datetime(2025, 1, 1)
+    months = [base + relativedelta(months=i) for i in range(args.months)]
+    acen = {m: make_acen(m, args.acen_rows, rnd) for m in months}
+    aicc = {m: [make_aicc(m, args.aicc_rows, rnd) for _ in range(args.aicc_files)] for m in months}
+
+    mix = [k for k, w in (("acen", args.acen_weight), ("aicc", args.aicc_weight)) for _ in range(w)]
+    out = []
+    for i in range(args.requests):
+        kind = mix[i % len(mix)]
+        m = months[i % len(months)]
+        if kind == "acen":
+            body, ctype = _multipart([("report_day", "5")], [("acen_file", "acen.xlsx", acen[m])])
+            out.append((kind, body, ctype, "/run/acen"))
+        else:
+            files = [("aicc_files", f"aicc{j}.xlsx", d) for j, d in enumerate(aicc[m])]
+            body, ctype = _multipart([("report_day", "15")], files)
+            out.append((kind, body, ctype, "/run/aicc"))
+    return out
+
+
+# =========================
+# gunicorn / RSS
+# =========================
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_gunicorn(args, workdir: Path, templates: Path) -> Tuple[subprocess.Popen, str]:
+    port = _free_port()
+    env = dict(os.environ)
+    env.update({
+        "KT_TEMPLATES_DIR": str(templates),
+        "KT_OUTPUT_STORAGE": str(workdir / "output"),
+        "KT_UPLOAD_DIR": str(workdir / "uploads"),
+        "KT_SHARED_CACHE_DIR": str(workdir / "cache"),      # 실행마다 빈 공유 캐시에서 시작
+    })
+    if args.no_shared_cache:
+        env["KT_SHARED_CACHE"] = "0"
+    cmd = [
+        sys.executable, "-m", "gunicorn",
+        "-w", str(args.workers), "-k", args.worker_class, "--threads", str(args.threads),
+        "-b", f"127.0.0.1:{port}", "--timeout", str(int(args.timeout)),
+        "--log-level", "warning", "app:app",
+    ]
+    # 서버 표준출력([WARN] 등)은 결과 표와 섞이지 않도록 작업 디렉토리 로그로
+    with open(workdir / "server.log", "wb") as log:
+        proc = subprocess.Popen(cmd, cwd=REPO_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"gunicorn 종료됨 (exit {proc.returncode}), 로그: {workdir / 'server.log'}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/")
+            if conn.getresponse().status == 200:
+                return proc, url
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("gunicorn 기동 대기 시간 초과")
+
+
+def _children(pid: int) -> List[int]:
+    if psutil is not None:
+        try:
+            return [c.pid for c in psutil.Process(pid).children()]
+        except psutil.Error:
+            return []
+    out = []
+    for p in Path("/proc").iterdir():
+        if not p.name.isdigit():
+            continue
+        try:
+            stat = (p / "stat").read_text()
+        except OSError:
+            continue
+        # "pid (comm) state ppid ..." — comm에 공백/괄호가 있을 수 있으므로 마지막 ')' 기준
+        if int(stat.rsplit(")", 1)[1].split()[1]) == pid:
+            out.append(int(p.name))
+    return out
+
+
+def _rss(pid: int) -> Optional[int]:
+    if psutil is not None:
+        try:
+            return psutil.Process(pid).memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        for line in Path(f"/proc/{pid}/status").read_text().splitlines():
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) * 1024
+    except OSError:
+        return None
+    return None
+
+
+class RssSampler(threading.Thread):
+    """master + 워커 프로세스의 RSS를 주기적으로 읽어 pid별 최대값 기록"""
+
+    def __init__(self, master_pid: int, interval: float = 0.25):
+        super().__init__(daemon=True)
+        self.master_pid = master_pid
+        self.interval = interval
+        self.peak: Dict[int, int] = {}
+        self._halt = threading.Event()
+
+    def run(self) -> None:
+        while not self._halt.is_set():
+            for pid in [self.master_pid, *_children(self.master_pid)]:
+                rss = _rss(pid)
+                if rss is not None:
+                    self.peak[pid] = max(self.peak.get(pid, 0), rss)
+            self._halt.wait(self.interval)
+
+    def stop(self) -> None:
+        self._halt.set()
+        self.join()
+
+
+# =========================
+# 집계/출력
+# =========================
+def percentile(sorted_values: Sequence[float], q: float) -> float:
+    """nearest-rank 백분위"""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, int(round(q / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[k]
+
+
+def summarize(samples: Sequence[Sample], wall: float) -> Dict[str, dict]:
+    groups: Dict[str, List[Sample]] = defaultdict(list)
+    for s in samples:
+        groups[s.kind].append(s)
+        groups["all"].append(s)
+    out = {}
+    for kind, ss in groups.items():
+        lat = sorted(s.latency for s in ss if s.ok)
+        errors = [s for s in ss if not s.ok]
+        out[kind] = {
+            "requests": len(ss),
+            "errors": len(errors),
+            "error_rate": round(len(errors) / len(ss), 4),
+            "throughput_rps": round(len(ss) / wall, 3) if wall else 0.0,
+            "p50_ms": round(percentile(lat, 50) * 1000, 1),
+            "p95_ms": round(percentile(lat, 95) * 1000, 1),
+            "p99_ms": round(percentile(lat, 99) * 1000, 1),
+            "max_ms": round(lat[-1] * 1000, 1) if lat else 0.0,
+            "sample_errors": sorted({s.error for s in errors})[:5],
+        }
+    return out
+
+
+def print_report(report: dict) -> None:
+    cfg = report["config"]
+    print(f"\n== {cfg['requests']} requests, concurrency {cfg['concurrency']}, "
+          f"workers {cfg['workers']} ({cfg['worker_class']} x{cfg['threads']}), wall {report['wall_s']}s ==")
+    print(f"{'kind':<6} {'n':>5} {'err%':>6} {'req/s':>7} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8} {'maxms':>8}")
+    for kind, s in report["results"].items():
+        print(f"{kind:<6} {s['requests']:>5} {s['error_rate'] * 100:>5.1f}% {s['throughput_rps']:>7.2f} "
+              f"{s['p50_ms']:>8.1f} {s['p95_ms']:>8.1f} {s['p99_ms']:>8.1f} {s['max_ms']:>8.1f}")
+        for e in s["sample_errors"]:
+            print(f"       ! {e}")
+    if report["rss_mb"]:
+        print("peak RSS (MB): " + ", ".join(f"{k}={v}" for k, v in report["rss_mb"].items()))
+
+
+# =========================
+# main
+# =========================
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="KT 업무실적 자동화 로컬 부하 테스트")
+    ap.add_argument("--url", help="이미 떠 있는 서버 주소 (지정 시 gunicorn을 띄우지 않음)")
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--worker-class", default="gthread")
+    ap.add_argument("--threads", type=int, default=4)
+    ap.add_argument("--concurrency", type=int, default=8, help="동시 요청 수")
+    ap.add_argument("--requests", type=int, default=40, help="총 요청 수 (워밍업 제외)")
+    ap.add_argument("--warmup", type=int, default=2, help="측정 전 순차 요청 수")
+    ap.add_argument("--acen-weight", type=int, default=1)
+    ap.add_argument("--aicc-weight", type=int, default=3)
+    ap.add_argument("--acen-rows", type=int, default=500)
+    ap.add_argument("--aicc-rows", type=int, default=2000, help="AICC 파일 1개당 행 수")
+    ap.add_argument("--aicc-files", type=int, default=3, help="AICC 요청 1건당 파일 수")
+    ap.add_argument("--months", type=int, default=3, help="요청을 나눠 담을 정산월 수 (1이면 월 잠금 경합 최대)")
+    ap.add_argument("--no-shared-cache", action="store_true", help="공유 캐시(템플릿/파싱 결과) 끄고 측정")
+    ap.add_argument("--templates", type=Path, help="xlsx 템플릿 디렉토리 (기본: 최소 템플릿 생성)")
+    ap.add_argument("--timeout", type=float, default=300.0)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--json", type=Path, help="결과를 JSON으로 저장")
+    ap.add_argument("--keep", action="store_true", help="임시 디렉토리(산출물) 유지")
+    return ap.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    rnd = random.Random(args.seed)
+    workdir = Path(tempfile.mkdtemp(prefix="kt-loadtest-"))
+    proc = sampler = None
+    try:
+        t0 = time.perf_counter()
+        reqs = build_requests(args, rnd)
+        print(f"입력 생성: {len(reqs)}건, {sum(len(b) for _, b, _, _ in reqs) / 1e6:.1f} MB, "
+              f"{time.perf_counter() - t0:.1f}s  (작업 디렉토리 {workdir})")
+
+        if args.url:
+            url = args.url.rstrip("/")
+        else:
+            templates = args.templates or make_templates(workdir / "templates")
+            proc, url = start_gunicorn(args, workdir, templates)
+            sampler = RssSampler(proc.pid)
+            sampler.start()
+
+        for kind, body, ctype, path in reqs[: args.warmup]:
+            post(url, path, body, ctype, kind, args.timeout)
+
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as ex:
+            samples = list(ex.map(lambda r: post(url, r[3], r[1], r[2], r[0], args.timeout), reqs))
+        wall = time.perf_counter() - t0
+
+        rss_mb: Dict[str, float] = {}
+        if sampler is not None:
+            sampler.stop()
+            for pid, peak in sorted(sampler.peak.items()):
+                label = "master" if pid == proc.pid else f"worker-{pid}"
+                rss_mb[label] = round(peak / 1024 / 1024, 1)
+
+        report = {
+            "config": {k: (str(v) if isinstance(v, Path) else v) for k, v in vars(args).items()},
+            "wall_s": round(wall, 2),
+            "results": summarize(samples, wall),
+            "rss_mb": rss_mb,
+        }
+        print_report(report)
+        if args.json:
+            args.json.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        return 0 if report["results"]["all"]["errors"] == 0 else 1
+    finally:
+        if proc is not None:
+            proc.terminate()
+            try:
+                proc.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+        if sampler is not None and sampler.is_alive():
+            sampler.stop()
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,196 @@
+# tools/reader_conformance.py
+"""
+엑셀 리더 백엔드 일치 검사: 같은 입력에서 모든 백엔드가 같은 행/정산월/합계를 내는지 확인.
+
+    python tools/reader_conformance.py                      # 경계 사례 워크북을 생성해서 검사
+    python tools/reader_conformance.py data/*.xlsx          # 실제 ACEN/AICC 파일로 검사
+    python tools/reader_conformance.py --readers openpyxl,calamine
+
+- 비교 항목: 원본 셀 값(AICC B~M / ACEN P~BI), A2/A4 정산월,
+  AICC 집계(aggregate_bghm_stream) / ACEN 업체별 공급가(extract_p_bi_mapped_only)
+- 기준은 첫 번째 백엔드. pandas가 있으면 기존 구현(pd.read_excel, openpyxl 엔진)의 셀 값도 기준으로 대조
+- 하나라도 다르면 exit 1
+"""
+from __future__ import annotations
+import argparse
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from openpyxl import Workbook
+from openpyxl.utils import column_index_from_string
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.acen import _read_a2_month, extract_p_bi_mapped_only  # noqa: E402
+from services.aicc import _norm, aggregate_bghm_stream, open_bghm  # noqa: E402
+from services.preflight import sniff_workbook  # noqa: E402
+from services.readers import available_readers, open_sheet  # noqa: E402
+from services import shared_cache  # noqa: E402
+
+try:
+    import pandas as pd  # type: ignore
+except Exception:
+    pd = None
+
+GRID_COLS = {"aicc": ("B", "M"), "acen": ("P", "BI")}
+
+
+# =========================
+# 경계 사례 입력
+# =========================
+def make_cases(out: Path) -> List[Path]:
+    """
+    - AICC: A4 숫자(YYYYMM)/문자열/날짜, 빈 행·빈 셀, '1,500' 문자열 금액, 소수 금액, 앞쪽 빈 열
+    - ACEN: A2 날짜 셀, 업체명 앞뒤 공백, 0/음수/빈 금액, 문자열 금액
+    """
+    out.mkdir(parents=True, exist_ok=True)
+    paths = []
+    a4_values = [202509, "2025-09", datetime(2025, 9, 1)]
+    for k, a4 in enumerate(a4_values):
+        wb = Workbook()
+        ws = wb.active
+        ws["A4"] = a4
+        rows = [
+            ("(주)오토피온", 100, 300, "IB 상담"),
+            ("(주)캐럿솔루션즈", 10, "1,500,000", "OB 발신"),
+            (None, 1, 2, "IB"),                       # B 없음 → 제외
+            ("익산시청", 3, 30000.5, "챗봇"),
+            ("  유성구청 ", 7, 21, "챗봇 OB"),
+            ("주식회사 브리지텍", "", 5, "IB"),        # G 빈 문자열 → 제외
+        ]
+        r = 7
+        for i, (b, g, h, m) in enumerate(rows * 20):
+            if i % 9 == 4:
+                r += 1                                 # 중간 빈 행
+            ws[f"B{r}"], ws[f"G{r}"], ws[f"H{r}"], ws[f"M{r}"] = b, g, h, m
+            r += 1
+        p = out / f"aicc_case{k}.xlsx"
+        wb.save(p)
+        paths.append(p)
+
+    wb = Workbook()
+    ws = wb.active
+    ws["A2"] = datetime(2025, 8, 1)
+    ws["A2"].number_format = "yyyy-mm"
+    vendors = [" 남이섬 ", "엠지브이보안", "즐거운세상", "더늘푸른", "기타"]
+    amounts = [1000, "3,300", 0, -500, None, 12345, 2500.5]
+    for i in range(200):
+        ws[f"P{i + 3}"] = vendors[i % len(vendors)]
+        ws[f"BI{i + 3}"] = amounts[i % len(amounts)]
+    p = out / "acen_case.xlsx"
+    wb.save(p)
+    paths.append(p)
+    return paths
+
+
+# =========================
+# 백엔드별 결과
+# =========================
+def _grid(path: Path, kind: str, reader: str) -> List[Tuple[Any, ...]]:
+    lo, hi = (column_index_from_string(c) for c in GRID_COLS[kind])
+    with open_sheet(path, reader) as sheet:
+        rows = [tuple(_norm(v) for v in row) for row in sheet.iter_rows(min_row=1, min_col=lo, max_col=hi)]
+    while rows and all(v is None for v in rows[-1]):
+        rows.pop()                                      # 끝쪽 빈 행은 백엔드마다 다를 수 있음
+    return rows
+
+
+def _pandas_grid(path: Path, kind: str) -> Optional[List[Tuple[Any, ...]]]:
+    if pd is None:
+        return None
+    lo, hi = (column_index_from_string(c) for c in GRID_COLS[kind])
+    df = pd.read_excel(path, sheet_name=0, header=None, engine="openpyxl")
+    rows = []
+    for rec in df.itertuples(index=False):
+        vals = list(rec)[lo - 1:hi]
+        vals += [None] * (hi - lo + 1 - len(vals))
+        rows.append(tuple(_norm(v) for v in vals))
+    while rows and all(v is None for v in rows[-1]):
+        rows.pop()
+    return rows
+
+
+def run_backend(path: Path, kind: str, reader: str) -> Dict[str, Any]:
+    if kind == "aicc":
+        month, rows = open_bghm(path, reader=reader)
+        agg = aggregate_bghm_stream([path], reader=reader)
+        return {
+            "grid": _grid(path, kind, reader),
+            "month": month,
+            "rows": sum(1 for _ in rows),
+            "mapped": agg.mapped,
+            "total": sum(t for _, t, _ in agg.mapped),
+        }
+    mapped = extract_p_bi_mapped_only(path.read_bytes(), reader=reader)
+    return {
+        "grid": _grid(path, kind, reader),
+        "month": _read_a2_month(str(path), reader=reader),
+        "mapped": mapped,
+        "total": sum(mapped.values()),
+    }
+
+
+def _first_diff(a: List[Tuple], b: List[Tuple]) -> str:
+    for i, (x, y) in enumerate(zip(a, b), start=1):
+        if x != y:
+            return f"{i}행: {x!r} != {y!r}"
+    return f"행 수 {len(a)} != {len(b)}"
+
+
+def check_file(path: Path, readers: List[str]) -> List[str]:
+    kind = sniff_workbook(path, path.name).kind
+    if kind not in GRID_COLS:
+        return [f"{path.name}: ACEN/AICC 형식이 아니어서 건너뜀"]
+    results = {r: run_backend(path, kind, r) for r in readers}
+    base_name, base = readers[0], results[readers[0]]
+    problems = []
+    for name in readers[1:]:
+        other = results[name]
+        for key in base:
+            if base[key] != other[key]:
+                detail = _first_diff(base[key], other[key]) if key == "grid" else f"{base[key]!r} != {other[key]!r}"
+                problems.append(f"{path.name} [{kind}] {key}: {base_name} vs {name}: {detail}")
+    ref = _pandas_grid(path, kind)
+    if ref is not None and ref != base["grid"]:
+        problems.append(f"{path.name} [{kind}] grid: pandas vs {base_name}: {_first_diff(ref, base['grid'])}")
+    for name in readers:
+        if results[name]["month"] is None:
+            problems.append(f"{path.name} [{kind}] month: {name}: 정산월을 읽지 못함 (None)")
+    month = f"{base['month']:%Y-%m}" if base["month"] else "None"
+    print(f"{path.name:<24} {kind:<5} month={month} total={base['total']:,} "
+          f"{'OK' if not problems else 'MISMATCH'}")
+    return problems
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="엑셀 리더 백엔드 일치 검사")
+    ap.add_argument("files", nargs="*", type=Path)
+    ap.add_argument("--readers", help="쉼표 구분, 첫 번째가 기준 (기본: 설치된 전체, 예: openpyxl,calamine)")
+    args = ap.parse_args(argv)
+    shared_cache.configure(enabled=False)      # 캐시된 집계가 아니라 백엔드마다 실제로 읽은 결과를 비교
+
+    readers = args.readers.split(",") if args.readers else available_readers()
+    missing = [r for r in readers if r not in available_readers()]
+    if missing:
+        print(f"설치되지 않았거나 알 수 없는 백엔드: {', '.join(missing)} (사용 가능: {', '.join(available_readers())})")
+        return 2
+    print(f"backends: {', '.join(readers)}" + (" + pandas(기준)" if pd is not None else ""))
+    if len(readers) < 2 and pd is None:
+        print("비교할 백엔드가 하나뿐입니다 (python-calamine 또는 pandas 설치 필요).")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = args.files or make_cases(Path(tmp))
+        problems = []
+        for path in files:
+            problems.extend(check_file(Path(path), readers))
+
+    for p in problems:
+        print("  ! " + p)
+    return 1 if any("건너뜀" not in p for p in problems) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())